@@ -0,0 +1,32 @@
+"""Add composite indexes for conversation lists and message pages
+
+Revision ID: chat_indexes_001
+Revises: conversation_listing_001
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'chat_indexes_001'
+down_revision = 'conversation_listing_001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Context window, message pages and summaries read one conversation in time order
+    op.create_index('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at'])
+    # Conversation list: a user's active conversations, newest first
+    op.create_index('ix_conversations_user_active_updated', 'conversations', ['user_id', 'is_active', 'updated_at'])
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # Whole-second CURRENT_TIMESTAMP defaults -> the microsecond format the app
+        # writes, so message cursors compare equal timestamps as equal
+        op.execute(
+            "UPDATE messages SET created_at = created_at || '.000000' WHERE LENGTH(created_at) = 19"
+        )
+
+def downgrade() -> None:
+    op.drop_index('ix_conversations_user_active_updated', table_name='conversations')
+    op.drop_index('ix_messages_conversation_created', table_name='messages')
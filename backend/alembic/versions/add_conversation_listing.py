@@ -0,0 +1,47 @@
+"""Add denormalized listing columns to conversations
+
+Revision ID: conversation_listing_001
+Revises: conversation_summary_001
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'conversation_listing_001'
+down_revision = 'conversation_summary_001'
+branch_labels = None
+depends_on = None
+
+# Same shape as chat_service.message_preview (first 100 characters + "...");
+# a question and its answer stored in the same second resolve to the answer
+BACKFILL_SQL = """
+UPDATE conversations SET
+    message_count = (SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id),
+    last_message_preview = (
+        SELECT CASE WHEN LENGTH(content) > 100 THEN SUBSTR(content, 1, 100) || '...' ELSE content END
+        FROM messages WHERE messages.conversation_id = conversations.id
+        ORDER BY created_at DESC, CASE WHEN role = 'assistant' THEN 0 ELSE 1 END LIMIT 1
+    )
+"""
+
+def upgrade() -> None:
+    # Listing data maintained on message insert (replaces per-conversation message queries)
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_message_preview', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(BACKFILL_SQL)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # CURRENT_TIMESTAMP defaults stored whole seconds; give them the microsecond
+        # format the app writes so keyset cursors compare equal timestamps as equal
+        op.execute(
+            "UPDATE conversations SET updated_at = updated_at || '.000000' WHERE LENGTH(updated_at) = 19"
+        )
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_column('message_count')
+        batch_op.drop_column('last_message_preview')
@@ -0,0 +1,26 @@
+"""Add rolling context summary to conversations
+
+Revision ID: conversation_summary_001
+Revises: google_oauth_001
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'conversation_summary_001'
+down_revision = 'google_oauth_001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    # Rolling summary of older turns + how many messages it already covers
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('context_summary', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('summarized_message_count', sa.Integer(), nullable=False, server_default='0'))
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_column('summarized_message_count')
+        batch_op.drop_column('context_summary')
@@ -0,0 +1,23 @@
+"""Add is_truncated flag to messages (answers cut short by a client disconnect)
+
+Revision ID: message_truncated_001
+Revises: chat_indexes_001
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'message_truncated_001'
+down_revision = 'chat_indexes_001'
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('is_truncated', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+def downgrade() -> None:
+    with op.batch_alter_table('messages', schema=None) as batch_op:
+        batch_op.drop_column('is_truncated')
@@ -1,21 +1,29 @@
 # backend/app/api/chat.py - CLEAN REWRITE - ZERO TECH DEBT
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Form, Query, Header
+from typing import List, Optional, Dict, Any, Tuple, Callable, Awaitable
+from fastapi import APIRouter, Depends, HTTPException, status, Form, Query, Header, Request
 from fastapi.responses import StreamingResponse, JSONResponse
 from sqlalchemy.orm import Session
+from contextlib import aclosing
+import asyncio
 import json
+import time
 import uuid
 from datetime import datetime
 
 from app.database import get_database
 from app.dependencies.simple_auth import get_current_active_user, get_optional_current_user
-from app.services.chat_service import ChatService
+from app.services.chat_service import ChatService, message_queue
 from app.services.cooldown_service import CooldownService
 from app.services.guest_service import GuestService
-from app.services.user_service import UserService
 from app.models.user import User
 from app.models.conversation import Conversation, Message
 from rag_engine import get_rag_engine
+from app.core.tracing import observe, span, start_trace
+from app.core.db_executor import run_db
+from app.core.quota_engine import QuotaDecision
+from app.core.pagination import decode_cursor, encode_cursor, page_size
+from app.core.sse_framer import SSEFramer, coalesce, stream_totals
+from app.core.stream_cancellation import DisconnectWatch, cancellation_stats
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -57,11 +65,68 @@ def _serialize_user_data(current_user: Optional[User]) -> Optional[Dict[str, Any
         'questions_remaining': int(_calculate_questions_remaining(current_user))
     }
 
+# ===== DATABASE PHASES =====
+# Synchronous Session work for the chat path; called through run_db so it runs
+# off the event loop. Each returns plain data - ORM attributes are expired by
+# the commits and would lazy-load if touched back on the loop.
+
+def _open_user_turn(db: Session, user_id: str, conversation_id: Optional[str], message_content: str) -> Dict[str, Any]:
+    """Load or create the conversation, store the user message and read the context"""
+    if conversation_id:
+        conversation = db.query(Conversation).filter(
+            Conversation.id == conversation_id,
+            Conversation.user_id == user_id
+        ).first()
+        if not conversation:
+            raise Exception("Conversation not found")
+    else:
+        conversation = ChatService.create_conversation(
+            db, user_id,
+            title=message_content[:50] + "..." if len(message_content) > 50 else message_content
+        )
+        conversation_id = conversation.id
+    
+    # Read before the commit below expires the row
+    message_count, context_summary = conversation.message_count, conversation.context_summary
+    summarized_count = conversation.summarized_message_count or 0
+    user_message = ChatService.add_message(db, conversation_id, "user", message_content)
+    recent = ChatService.get_conversation_context(db, conversation_id, 10, message_count=message_count + 1)
+    
+    return {
+        'conversation_id': conversation_id,
+        'user_message': {
+            'id': user_message.id,
+            'content': message_content,
+            'timestamp': user_message.created_at.isoformat()
+        },
+        # Messages the summary does not cover yet (the recent window is a cache hit in the common follow-up case)
+        'context': ChatService.history_after_summary(recent, message_count + 1, summarized_count),
+        'summary': context_summary
+    }
+
+def _claim_user_question(db: Session, user: User) -> Tuple[QuotaDecision, Dict[str, Any]]:
+    """
+    Claim the question (one UPDATE ... RETURNING) and snapshot the user for the
+    completion frame - the claim already holds the new counters, so the answer
+    needs no usage write or refresh later.
+    """
+    user_data = _serialize_user_data(user)
+    quota = CooldownService.claim_question(db, user)
+    user_data.update({
+        'questions_used_current_cycle': quota.used,
+        'cycle_reset_time': quota.reset_at.isoformat() if quota.reset_at else None,
+        'questions_remaining': _questions_remaining(user_data['subscription_tier'], quota.used)
+    })
+    return quota, user_data
+
 def _calculate_questions_remaining(user: User) -> int:
     """Calculate remaining questions for user based on subscription."""
-    if user.subscription_tier == "free":
-        return max(0, 20 - user.questions_used_current_cycle)
-    elif user.subscription_tier == "pro":
+    return _questions_remaining(user.subscription_tier, user.questions_used_current_cycle)
+
+def _questions_remaining(subscription_tier: str, questions_used: int) -> int:
+    if subscription_tier == "free":
+        return max(0, 20 - questions_used)
+    elif subscription_tier == "pro":
         return 999999
     else:  # enterprise
         return 999999
@@ -70,10 +135,12 @@ def _calculate_questions_remaining(user: User) -> int:
 
 @router.post("/message")
 async def send_unified_chat_message(
+    request: Request,
     message: str = Form(..., description="User message"),
     conversation_id: Optional[str] = Form(None, description="Existing conversation ID (optional)"),
     session_id: Optional[str] = Form(None, description="Guest session ID (for guests only)"),
     enable_trust_trail: bool = Form(False, description="Enable multi-agent trust trail for transparency"),
+    include_trace: bool = Form(False, description="Attach per-stage timings to the completion frame"),
     accept: str = Header("application/json", description="Response format: application/json or text/event-stream"),
     db: Session = Depends(get_database),
     current_user: Optional[User] = Depends(get_optional_current_user)
@@ -120,25 +187,22 @@ async def send_unified_chat_message(
             # Authenticated user flow
             user_type = "authenticated"
             
-            # Check cooldown for authenticated users
-            can_ask, cooldown_message, reset_time = CooldownService.can_ask_question(db, current_user)
-            if not can_ask:
+            # Check cooldown and use question for authenticated users (one atomic quota operation)
+            quota, user_data = await run_db(_claim_user_question, db, current_user)
+            if not quota.allowed:
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     detail={
-                        "message": cooldown_message,
-                        "reset_time": reset_time.isoformat() if reset_time else None,
+                        "message": quota.message,
+                        "reset_time": quota.reset_at.isoformat() if quota.reset_at else None,
                         "user_type": user_type
                     }
                 )
-            
-            # Use question for authenticated user
-            if not CooldownService.use_question(db, current_user):
-                raise HTTPException(status_code=500, detail="Failed to process question")
                 
         else:
             # Guest user flow
             user_type = "guest"
+            user_data = None
             
             if not session_id:
                 raise HTTPException(
@@ -146,28 +210,25 @@ async def send_unified_chat_message(
                     detail="Session ID required for guest users"
                 )
             
-            # Check cooldown for guest users
-            can_ask, cooldown_message, reset_time = GuestService.can_guest_ask_question(session_id)
-            if not can_ask:
+            # Check cooldown and use question for guest users (shared across workers)
+            quota = GuestService.claim_guest_question(session_id)
+            if not quota.allowed:
                 raise HTTPException(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     detail={
-                        "message": cooldown_message,
-                        "reset_time": reset_time.isoformat() if reset_time else None,
+                        "message": quota.message,
+                        "reset_time": quota.reset_at.isoformat() if quota.reset_at else None,
                         "user_type": user_type
                     }
                 )
-            
-            # Use question for guest user
-            if not GuestService.use_guest_question(session_id):
-                raise HTTPException(status_code=500, detail="Failed to process question")
         
         # ===== CONTENT NEGOTIATION =====
         if "text/event-stream" in accept:
             # STREAMING MODE
             return StreamingResponse(
                 _generate_streaming_response(
-                    db, current_user, session_id, conversation_id, message, user_type
+                    db, current_user, session_id, conversation_id, message, user_type, include_trace, user_data,
+                    is_disconnected=request.is_disconnected
                 ),
                 media_type="text/event-stream",
                 headers={
@@ -189,13 +250,9 @@ async def send_unified_chat_message(
     except Exception as e:
         # Rollback question usage on error
         if current_user:
-            current_user.questions_used_current_cycle -= 1
-            if current_user.questions_used_current_cycle <= 0:
-                current_user.cycle_reset_time = None
-            db.commit()
+            await run_db(CooldownService.refund_question, db, current_user)
         elif session_id:
-            guest_session = GuestService.get_guest_session(session_id)
-            guest_session["questions_used"] -= 1
+            GuestService.refund_guest_question(session_id)
         
         print(f"❌ Error processing message: {str(e)}")
         import traceback
@@ -207,160 +264,224 @@ async def send_unified_chat_message(
 
 # ===== STREAMING RESPONSE GENERATOR =====
 
+def _save_answer(
+    current_user: Optional[User],
+    conversation_id: Optional[str],
+    session_id: Optional[str],
+    content: str,
+    processing_time: int,
+    is_truncated: bool = False
+) -> Dict[str, Any]:
+    """Store the assistant answer (conversation or guest session) and return it in API shape"""
+    if current_user:
+        # Written behind the complete frame
+        return ChatService.queue_assistant_message(conversation_id, content, processing_time, is_truncated)
+    
+    # Save to session (re-read - the store may be shared with other workers)
+    GuestService.add_message_to_history(session_id, "assistant", content, is_truncated)
+    ChatService.schedule_summary_refresh(guest_session=GuestService.get_guest_session(session_id))
+    
+    # Create mock AI message
+    ai_message = _serialize_ai_message(type('obj', (object,), {
+        'id': f"guest_ai_{int(datetime.utcnow().timestamp())}",
+        'content': content,
+        'created_at': datetime.utcnow(),
+        'processing_time_ms': str(processing_time)
+    })())
+    ai_message['is_truncated'] = is_truncated
+    return ai_message
+
+def _save_truncated_answer(
+    current_user: Optional[User],
+    conversation_id: Optional[str],
+    session_id: Optional[str],
+    partial: str,
+    start_time: datetime
+) -> None:
+    """Client left mid-answer: keep what was generated (flagged) and count what stopping saved"""
+    saved = cancellation_stats.record_cancelled(len(partial))
+    print(f"🛑 Client disconnected after {len(partial)} characters - generation stopped "
+          f"(~{saved['tokens']} tokens, ~{saved['seconds']:.1f}s saved)")
+    if partial:
+        processing_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        _save_answer(current_user, conversation_id, session_id, partial, processing_time, is_truncated=True)
+
 async def _generate_streaming_response(
     db: Session,
     current_user: Optional[User],
     session_id: Optional[str],
     conversation_id: Optional[str],
     message_content: str,
-    user_type: str
+    user_type: str,
+    include_trace: bool = False,
+    user_data: Optional[Dict[str, Any]] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
 ):
-    """Generate real-time streaming response with conversation memory"""
+    """
+    Generate real-time streaming response with conversation memory
+    
+    If the client disconnects mid-answer the engine stream is closed (which
+    closes the provider stream) and the partial answer is saved as truncated.
+    """
     response_id = str(uuid.uuid4())
     start_time = datetime.utcnow()
+    trace = start_trace("chat.message")
+    framer = SSEFramer()
+    watch = DisconnectWatch(is_disconnected)
+    full_response = ""
+    answering = False
+    first_chunk_at = None
     
     try:
         # ===== CONVERSATION SETUP =====
+        setup_span = span("conversation_setup").start()
         if current_user:
-            # Authenticated user: Database conversations
+            # Authenticated user: Database conversations (off the event loop)
             if conversation_id:
-                conversation = db.query(Conversation).filter(
-                    Conversation.id == conversation_id,
-                    Conversation.user_id == current_user.id
-                ).first()
-                if not conversation:
-                    raise Exception("Conversation not found")
-            else:
-                # Create new conversation
-                conversation = ChatService.create_conversation(
-                    db, current_user.id,
-                    title=message_content[:50] + "..." if len(message_content) > 50 else message_content
-                )
-                conversation_id = conversation.id
-            
-            # Add user message to database
-            user_message = ChatService.add_message(
-                db, conversation_id, "user", message_content
-            )
-            
-            # Get conversation context
-            context = ChatService.get_conversation_context(db, conversation_id, 10)
+                # The previous answer may still be in the write-behind queue
+                await message_queue.settle(conversation_id)
+            turn = await run_db(_open_user_turn, db, current_user.id, conversation_id, message_content)
+            conversation_id = turn['conversation_id']
+            user_message = turn['user_message']
+            context = turn['context']
+            conversation_summary = turn['summary']
             
         else:
             # Guest user: Session-based conversations
+            # Add user message to session history (trimmed and saved to the session store)
+            GuestService.add_message_to_history(session_id, "user", message_content)
             session = GuestService.get_guest_session(session_id)
             
-            # Add conversation_history if it doesn't exist
-            if "conversation_history" not in session:
-                session["conversation_history"] = []
-            
-            # Add user message to session history
-            session["conversation_history"].append({
-                "role": "user",
-                "content": message_content,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            # Keep only last 20 messages to prevent memory bloat
-            if len(session["conversation_history"]) > 20:
-                session["conversation_history"] = session["conversation_history"][-20:]
-            
-            # Get context from session (last 10 messages, excluding current)
+            # Messages the summary does not cover yet (excluding current)
             history = session["conversation_history"]
-            recent_messages = history[-11:-1] if len(history) > 10 else history[:-1]  # Exclude current message
-            context = [{"role": msg["role"], "content": msg["content"]} for msg in recent_messages]
+            context = ChatService.history_after_summary(history, len(history), session.get("summarized_count", 0))
+            conversation_summary = session.get("context_summary")
             
-            # Create mock user message for response
-            user_message = type('obj', (object,), {
+            user_message = {
                 'id': f"guest_msg_{int(datetime.utcnow().timestamp())}",
                 'content': message_content,
-                'created_at': datetime.utcnow()
-            })()
+                'timestamp': datetime.utcnow().isoformat()
+            }
+        
+        setup_span.end()
         
         # ===== SEND INITIAL METADATA =====
         metadata_payload = {
             'type': 'metadata', 
             'id': response_id, 
             'conversation_id': conversation_id, 
-            'user_message': {
-                'id': user_message.id, 
-                'content': message_content, 
-                'timestamp': user_message.created_at.isoformat()
-            }
+            'user_message': user_message
         }
-        yield f"data: {json.dumps(metadata_payload)}\n\n"
+        yield framer.event(metadata_payload)
         
         # ===== AI RESPONSE GENERATION =====
-        full_response = ""
-        chunk_count = 0
-        
         # Get RAG engine and process
         rag_instance = get_rag_engine()
         
         print(f"🔄 Processing with RAG engine - context: {len(context)} messages")
-        async for chunk in rag_instance.ask_question_with_context_streaming(message_content, context):
-            if chunk and chunk.strip():
-                full_response += chunk
-                chunk_count += 1
+        # Side-channel events from the engine (invalid citations, article lookups) go out as their own frames
+        pending_events = []
+        citation_warnings = 0
+        skipped_stages = []
+        
+        answer_span = span("rag_answer").start()
+        answering = True
+        # Deltas are coalesced into chunk frames (None = the buffered window expired).
+        # Leaving the block closes the engine stream, down to the provider's HTTP stream.
+        frames = coalesce(rag_instance.ask_question_with_context_streaming(
+            message_content, context, conversation_summary, on_event=pending_events.append
+        ), framer)
+        async with aclosing(frames):
+            async for chunk in frames:
+                if await watch.gone():
+                    break
+                if chunk is None:
+                    frame = framer.flush()
+                    if frame:
+                        yield frame
+                    continue
+                if chunk.strip():
+                    if framer.deltas == 0:
+                        first_chunk_at = time.perf_counter()
+                        observe("first_chunk", first_chunk_at - trace.started, trace.started)
+                    full_response += chunk
+                    frame = framer.add(chunk)
+                    if frame:
+                        yield frame
                 
-                chunk_data = {
-                    'type': 'chunk',
-                    'content': chunk,
-                    'chunk_id': chunk_count
-                }
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+                if pending_events:
+                    # Events refer to text already produced - send that text first
+                    frame = framer.flush()
+                    if frame:
+                        yield frame
+                while pending_events:
+                    event = pending_events.pop(0)
+                    citation_warnings += event.get('type') == 'citation_warning'
+                    if event.get('type') == 'stage_skipped':
+                        skipped_stages.append(event['stage'])
+                    yield framer.event(event)
+        answering = False
+        
+        if watch.disconnected:
+            answer_span.end(chunks=framer.chunk_frames, deltas=framer.deltas, disconnected=True)
+            _save_truncated_answer(current_user, conversation_id, session_id, full_response, start_time)
+            return
+        if first_chunk_at is not None:
+            cancellation_stats.record_completed(len(full_response), time.perf_counter() - first_chunk_at)
+        
+        frame = framer.flush()
+        if frame:
+            yield frame
+        for event in pending_events:
+            citation_warnings += event.get('type') == 'citation_warning'
+            if event.get('type') == 'stage_skipped':
+                skipped_stages.append(event['stage'])
+            yield framer.event(event)
+        
+        answer_span.end(chunks=framer.chunk_frames, deltas=framer.deltas)
         
         # ===== SAVE AI RESPONSE =====
         processing_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
+        persist_span = span("persist_answer").start()
         
-        if current_user:
-            # Save to database
-            ai_message = ChatService.add_message(
-                db, conversation_id, "assistant", full_response,
-                processing_time_ms=str(processing_time)
-            )
-            
-            # Increment user question usage
-            UserService.increment_question_usage(db, current_user.id)
-            
-            # Refresh user data
-            db.refresh(current_user)
-            
-        else:
-            # Save to session
-            session["conversation_history"].append({
-                "role": "assistant",
-                "content": full_response,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            # Create mock AI message
-            ai_message = type('obj', (object,), {
-                'id': f"guest_ai_{int(datetime.utcnow().timestamp())}",
-                'content': full_response,
-                'created_at': datetime.utcnow(),
-                'processing_time_ms': str(processing_time)
-            })()
+        ai_message = _save_answer(current_user, conversation_id, session_id, full_response, processing_time)
+        # The question was counted when it was claimed
+        updated_user = user_data if current_user else None
 
+        persist_span.end()
+        observe("chat_request", time.perf_counter() - trace.started, trace.started)
+        
         # ===== COMPLETION METADATA =====
         completion_data = {
             'type': 'complete',
             'id': str(response_id),
             'conversation_id': str(conversation_id) if conversation_id else None,
-            'ai_message': _serialize_ai_message(ai_message),
-            'updated_user': _serialize_user_data(current_user),
+            'ai_message': ai_message,
+            'updated_user': updated_user,
             'session_id': str(session_id) if session_id and not current_user else None,
             'user_type': str(user_type),
             'processing_time_ms': int(processing_time),
-            'total_chunks': int(chunk_count),
-            'processing_mode': 'standard'
+            'total_chunks': int(framer.chunk_frames),
+            'citation_warnings': int(citation_warnings),
+            'skipped_stages': skipped_stages,
+            'processing_mode': 'standard',
+            # Frames and bytes sent before this frame
+            'stream': framer.stats()
         }
+        if include_trace:
+            completion_data['trace'] = trace.to_dict()
         
-        yield f"data: {json.dumps(completion_data)}\n\n"
-        yield "data: [DONE]\n\n"
+        yield framer.event(completion_data)
+        yield framer.done()
         
-        print(f"✅ Streaming completed: {chunk_count} chunks, {len(full_response)} characters")
+        print(f"✅ Streaming completed: {framer.chunk_frames} frames from {framer.deltas} deltas, "
+              f"{len(full_response)} characters, {framer.bytes} bytes")
         
+    except (asyncio.CancelledError, GeneratorExit):
+        # Starlette cancelled the response on disconnect, or the response was closed
+        if answering:
+            _save_truncated_answer(current_user, conversation_id, session_id, full_response, start_time)
+        raise
     except Exception as e:
         print(f"❌ Streaming error: {e}")
         import traceback
@@ -371,8 +492,10 @@ async def _generate_streaming_response(
             'id': response_id,
             'processing_mode': 'error'
         }
-        yield f"data: {json.dumps(error_data)}\n\n"
-        yield "data: [DONE]\n\n"
+        yield framer.event(error_data)
+        yield framer.done()
+    finally:
+        stream_totals.add(framer.stats())
 
 # ===== JSON RESPONSE GENERATOR =====
 
@@ -422,37 +545,46 @@ async def _generate_json_response(
 
 # ===== CONVERSATION MANAGEMENT ENDPOINTS =====
 
+def _list_conversations(
+    db: Session, user_id: str, limit: int, before: Optional[Tuple[datetime, str]], offset: int
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """One page of the conversation list (one query) and the cursor of the next page"""
+    conversations = ChatService.get_user_conversations(db, user_id, limit + 1, before=before, offset=offset)
+    page = conversations[:limit]
+    next_cursor = encode_cursor(page[-1].updated_at, page[-1].id) if len(conversations) > limit else None
+    return [{
+        "id": conv.id,
+        "title": conv.title,
+        "created_at": conv.created_at.isoformat(),
+        "updated_at": conv.updated_at.isoformat(),
+        "last_message_preview": conv.last_message_preview,
+        "message_count": conv.message_count
+    } for conv in page], next_cursor
+
 @router.get("/conversations")
 async def get_user_conversations(
     limit: int = 20,
     offset: int = 0,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: Session = Depends(get_database),
     current_user: User = Depends(get_current_active_user)
 ):
-    """Get user's conversation list with pagination."""
-    conversations = ChatService.get_user_conversations(db, current_user.id, limit)
+    """Get user's conversation list with keyset pagination (`offset` is kept for older clients)."""
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    conversation_list = []
-    for conv in conversations:
-        messages = ChatService.get_conversation_messages(db, conv.id, limit=1)
-        last_message = messages[-1] if messages else None
-        
-        conversation_list.append({
-            "id": conv.id,
-            "title": conv.title,
-            "created_at": conv.created_at.isoformat(),
-            "updated_at": conv.updated_at.isoformat(),
-            "last_message_preview": (
-                last_message.content[:100] + "..." 
-                if last_message and len(last_message.content) > 100 
-                else last_message.content if last_message else None
-            ),
-            "message_count": len(ChatService.get_conversation_messages(db, conv.id))
-        })
+    await message_queue.settle_all()
+    conversation_list, next_cursor = await run_db(
+        _list_conversations, db, current_user.id, page_size(limit), before, offset
+    )
     
     return {
         "conversations": conversation_list,
         "total": len(conversation_list),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
         "current_user": {
             "id": current_user.id,
             "email": current_user.email,
@@ -462,43 +594,70 @@ async def get_user_conversations(
         }
     }
 
-@router.get("/conversations/{conversation_id}/messages")
-async def get_conversation_messages(
-    conversation_id: str,
-    limit: int = 50,
-    db: Session = Depends(get_database),
-    current_user: User = Depends(get_current_active_user)
-):
-    """Get messages from a specific conversation."""
+def _message_page(
+    db: Session, user_id: str, conversation_id: str, limit: int, before: Optional[str], after: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """One page of a conversation's messages, or None if the user does not own it"""
     conversation = db.query(Conversation).filter(
         Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
+        Conversation.user_id == user_id
     ).first()
-    
     if not conversation:
-        raise HTTPException(status_code=404, detail="Conversation not found")
+        return None
     
-    messages = ChatService.get_conversation_messages(db, conversation_id, limit)
+    # One extra row tells whether another page exists in the paging direction
+    messages = ChatService.get_conversation_messages(db, conversation_id, limit + 1, before=before, after=after)
+    if after:
+        has_newer, has_older = len(messages) > limit, True
+        messages = messages[:limit]
+    else:
+        has_older, has_newer = len(messages) > limit, before is not None
+        messages = messages[-limit:]
     
-    message_list = []
-    for msg in messages:
-        message_list.append({
+    return {
+        "conversation_id": conversation_id,
+        "conversation_title": conversation.title,
+        "messages": [{
             "id": msg.id,
             "role": msg.role,
             "content": msg.content,
             "timestamp": msg.created_at.isoformat(),
             "confidence_score": msg.confidence_score,
             "processing_time_ms": msg.processing_time_ms,
-            "sources": json.loads(msg.sources) if msg.sources else []
-        })
-    
-    return {
-        "conversation_id": conversation_id,
-        "conversation_title": conversation.title,
-        "messages": message_list,
-        "total_messages": len(message_list)
+            "sources": json.loads(msg.sources) if msg.sources else [],
+            "is_truncated": bool(msg.is_truncated)
+        } for msg in messages],
+        "total_messages": len(messages),
+        "message_count": conversation.message_count,
+        "has_older": has_older,
+        "has_newer": has_newer
     }
 
+@router.get("/conversations/{conversation_id}/messages")
+async def get_conversation_messages(
+    conversation_id: str,
+    limit: int = 50,
+    before: Optional[str] = Query(None, description="Message id: return the page of older messages"),
+    after: Optional[str] = Query(None, description="Message id: return the page of newer messages"),
+    db: Session = Depends(get_database),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Get messages from a specific conversation (newest page by default, chronological order)."""
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    
+    await message_queue.settle(conversation_id)
+    try:
+        page = await run_db(
+            _message_page, db, current_user.id, conversation_id, page_size(limit, default=50), before, after
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid message cursor")
+    
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return page
+
 @router.put("/conversations/{conversation_id}/title")
 async def update_conversation_title(
     conversation_id: str,
@@ -573,15 +732,14 @@ async def get_chat_status(
             "user_type": "authenticated"
         }
     elif session_id:
-        session = GuestService.get_guest_session(session_id)
-        can_ask, message, reset_time = GuestService.can_guest_ask_question(session_id)
+        quota = GuestService.guest_quota(session_id)
         
         return {
-            "questions_available": CooldownService.GUEST_QUESTION_LIMIT - session["questions_used"],
-            "questions_used": session["questions_used"],
-            "max_questions": CooldownService.GUEST_QUESTION_LIMIT,
-            "can_ask_question": can_ask,
-            "reset_time": reset_time.isoformat() if reset_time else None,
+            "questions_available": quota.remaining,
+            "questions_used": quota.used,
+            "max_questions": quota.limit,
+            "can_ask_question": quota.allowed,
+            "reset_time": quota.reset_at.isoformat() if quota.reset_at else None,
             "user_type": "guest"
         }
     else:
@@ -0,0 +1,46 @@
+"""
+Statutes Router - retrieval-only article lookup
+Returns the text of an explicitly referenced article straight from the
+article index (no classification, no embeddings, no LLM call).
+"""
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from rag_engine import get_rag_engine
+
+router = APIRouter(tags=["Statutes"])
+
+
+@router.get("/statutes/article")
+async def get_article(
+    q: Optional[str] = Query(None, description="سؤال يحتوي على مرجع صريح، مثل: المادة 77 من نظام العمل"),
+    law: Optional[str] = Query(None, description="اسم النظام"),
+    article: Optional[int] = Query(None, ge=1, description="رقم المادة")
+):
+    """Article text by explicit reference (`q`) or by law name + article number"""
+    if not q and not (law and article):
+        raise HTTPException(status_code=400, detail="Provide q, or both law and article")
+
+    engine = get_rag_engine()
+    result = await engine.lookup_article(q) if q else await engine.resolve_article(law, article)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Article not found in the article index")
+
+    return {
+        "law_title": result["law_title"],
+        "article_number": result["article_number"],
+        "chunk_id": result["chunk_id"],
+        "text": result["text"],
+        "lookup_ms": result["lookup_ms"]
+    }
+
+
+@router.get("/statutes/index")
+async def get_article_index_stats():
+    """Indexed laws and article counts"""
+    index = await get_rag_engine().get_article_index()
+    return {
+        "articles": len(index),
+        "laws": [{"law": law, "articles": count} for law, count in index.laws()]
+    }
@@ -0,0 +1,215 @@
+"""
+Streaming Citation Post-Processor
+Strips memo citations and rewrites weak citations to real statute titles
+while the answer is being streamed. All patterns are compiled once at import
+into two combined alternations (rewrite + cleanup); text is released as soon
+as no citation can still be forming in it, so time-to-first-token is unchanged.
+"""
+
+import re
+import logging
+from typing import List, Optional, Sequence
+
+from app.retrieval.document_features import classify_doc_kind
+
+logger = logging.getLogger(__name__)
+
+# Words that can open a citation we rewrite or strip. Text from the earliest
+# unsettled trigger onwards is held back until the citation is complete.
+TRIGGER_WORDS = [
+    "وفقاً", "ووفقاً", "استناداً", "بناءً", "حسب", "طبقاً", "بموجب",
+    "بالإشارة", "كما",
+]
+
+# A quoted memo title - bare mentions ("مذكرة دفاع", "المرجع رقم 5") are ordinary prose
+_MEMO_TAIL = r'["\']مذكرة[^"\'\n]*["\']'
+
+# Memo citations (trigger + quoted memo title) are removed outright (memos are background, never citable)
+MEMO_PATTERNS = [
+    r'وفقاً\s*لـ\s*' + _MEMO_TAIL,
+    r'استناداً\s*إلى\s*' + _MEMO_TAIL,
+    r'بناءً\s*على\s*' + _MEMO_TAIL,
+    r'حسب\s*' + _MEMO_TAIL,
+    r'طبقاً\s*لـ\s*' + _MEMO_TAIL,
+    r'بموجب\s*' + _MEMO_TAIL,
+    r'بالإشارة\s*إلى\s*["\'][*]*مذكرة[^"\'\n]*[*]*["\']',
+    r'كما\s*جاء\s*في\s*' + _MEMO_TAIL,
+    r'ووفقاً\s*لما\s*ورد\s*في\s*' + _MEMO_TAIL,
+]
+
+# Quoted citation to an arbitrary source -> real statute title (first occurrence of each)
+WEAK_CITATIONS = {
+    "weak0": (r'وفقاً لـ"[^"\n]*"', 'وفقاً لـ"{}"', 0),
+    "weak1": (r'استناداً إلى "[^"\n]*"', 'استناداً إلى "{}"', 1),
+    "weak2": (r'بناءً على "[^"\n]*"', 'بناءً على "{}"', 2),
+    "weak3": (r'حسب "[^"\n]*"', 'حسب "{}"', 0),
+}
+
+# Unnamed article references -> named statute. A numbered article ("بموجب
+# المادة 77") is left alone - the number would end up attributed to the title.
+GENERIC_CITATIONS = {
+    "generic0": (r'وفقاً للمادة الثالثة(?!\s*من\s*")', 'وفقاً لـ"{}"'),
+    "generic1": (r'استناداً للمادة(?!\s*(?:\d|من\s*"))', 'استناداً إلى "{}"'),
+    "generic3": (r'بموجب المادة(?!\s*(?:\d|من\s*"))', 'بموجب "{}"'),
+}
+
+# Memo alternatives come first so a memo citation is removed, not rewritten
+REWRITE_PATTERN = re.compile(
+    "|".join(
+        [f"(?P<memo{i}>{p})" for i, p in enumerate(MEMO_PATTERNS)]
+        + [f"(?P<{name}>{p})" for name, (p, _, _) in WEAK_CITATIONS.items()]
+        + [f"(?P<{name}>{p})" for name, (p, _) in GENERIC_CITATIONS.items()]
+    ),
+    re.IGNORECASE,
+)
+
+# Repairs left behind by removals (punctuation only - markdown layout is preserved)
+CLEANUP_PATTERN = re.compile(
+    r'(?P<comma>،[ \t]*،)|(?P<period>[،.][ \t]*\.)|(?P<colon>:[ \t]*،)|(?P<leading>^[ \t]*[،.])',
+    re.MULTILINE,
+)
+CLEANUP_REPLACEMENTS = {"comma": "،", "period": ".", "colon": ":", "leading": ""}
+
+TRIGGER_PATTERN = re.compile("|".join(sorted(TRIGGER_WORDS, key=len, reverse=True)))
+TRAILING_PUNCTUATION = " \t\r\n،.:"
+TRIGGER_PREFIXES = frozenset(word[:i] for word in TRIGGER_WORDS for i in range(1, len(word) + 1))
+
+# Sentinel standing in for already-emitted text so `^` only matches real line starts
+_NOT_LINE_START = "\x00"
+
+
+def statute_titles_from(documents: Sequence) -> List[str]:
+    """Titles of retrieved documents that are citable statutes"""
+    titles = []
+    for doc in documents or []:
+        kind = getattr(doc, "doc_kind", None) or classify_doc_kind(doc.title)
+        if kind == "statute" and doc.title not in titles:
+            titles.append(doc.title)
+    return titles
+
+
+class StreamingCitationFixer:
+    """
+    Incremental citation fixer for a single streamed answer
+
+    feed() returns the text that is safe to send now; flush() returns the rest
+    at end of stream. A citation is "settled" once a newline, an unquoted
+    period, or `max_lookback` characters follow its trigger word.
+    """
+
+    def __init__(self, statute_titles: Sequence[str] = (), max_lookback: int = 200):
+        self.statute_titles = list(statute_titles)
+        self.max_lookback = max_lookback
+        self._buffer = ""
+        self._at_line_start = True
+        self._used_weak: set = set()
+        self.memo_removed = 0
+        self.rewritten = 0
+
+    @property
+    def pending(self) -> int:
+        """Characters received but not yet released"""
+        return len(self._buffer)
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed text; return the processed prefix that can be emitted"""
+        if not chunk:
+            return ""
+        self._buffer += chunk
+        cut = self._safe_cut()
+        if cut <= 0:
+            return ""
+        return self._emit(cut)
+
+    def flush(self) -> str:
+        """End of stream: process and return everything still held back"""
+        if not self._buffer:
+            return ""
+        output = self._emit(len(self._buffer))
+        if self.memo_removed or self.rewritten:
+            logger.info(f"🔧 Citation fixer: {self.memo_removed} memo citations removed, {self.rewritten} rewritten")
+        return output
+
+    def _safe_cut(self) -> int:
+        """Index up to which no citation can still be forming"""
+        buffer = self._buffer
+        cut = len(buffer)
+
+        spans = []  # (start, settled at) of the settled triggers before
+        for match in TRIGGER_PATTERN.finditer(buffer):
+            settled_at = self._settled_at(buffer, match.start())
+            if settled_at is None:
+                # A trigger inside an earlier citation (وفقاً لـ"مذكرة...) must not
+                # split it: hold back from the earliest trigger whose span reaches it
+                cut = min([start for start, end in spans if end > match.start()] + [match.start()])
+                break
+            spans.append((match.start(), settled_at))
+
+        # A partial trigger word at the very end (e.g. "وفق") must wait for the next chunk
+        word_start = max(buffer.rfind(" "), buffer.rfind("\n")) + 1
+        for offset in range(word_start, min(len(buffer), cut)):
+            if buffer[offset:] in TRIGGER_PREFIXES:
+                cut = offset
+                break
+
+        # Keep trailing punctuation so cleanup can merge it with what a removal leaves behind
+        return len(buffer[:cut].rstrip(TRAILING_PUNCTUATION))
+
+    def _settled_at(self, buffer: str, start: int) -> Optional[int]:
+        """Where the citation opened at `start` is settled (None while it can still grow)"""
+        tail = buffer[start:]
+        ends = [self.max_lookback] if len(tail) >= self.max_lookback else []
+        newline = tail.find("\n")
+        if newline != -1:
+            ends.append(newline)
+        period = tail.find(".")
+        if period != -1 and tail.count('"', 0, period) % 2 == 0:
+            ends.append(period)
+        return start + min(ends) if ends else None
+
+    def _emit(self, cut: int) -> str:
+        segment, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        prefix = "" if self._at_line_start else _NOT_LINE_START
+
+        text = REWRITE_PATTERN.sub(self._rewrite, prefix + segment)
+        text = CLEANUP_PATTERN.sub(lambda m: CLEANUP_REPLACEMENTS[m.lastgroup], text)
+        text = text[len(prefix):]
+
+        # A removal can leave punctuation that must merge with what comes next
+        if self._buffer:
+            kept = len(text.rstrip(TRAILING_PUNCTUATION))
+            text, self._buffer = text[:kept], text[kept:] + self._buffer
+
+        if text:
+            self._at_line_start = text.endswith("\n")
+        return text
+
+    def _rewrite(self, match: re.Match) -> str:
+        name = match.lastgroup
+        if name.startswith("memo"):
+            self.memo_removed += 1
+            return ""
+        if not self.statute_titles:
+            return match.group(0)
+
+        if name in WEAK_CITATIONS:
+            if name in self._used_weak:
+                return match.group(0)
+            self._used_weak.add(name)
+            _, template, index = WEAK_CITATIONS[name]
+            title = self.statute_titles[index] if index < len(self.statute_titles) else self.statute_titles[0]
+        else:
+            _, template = GENERIC_CITATIONS[name]
+            title = self.statute_titles[0]
+
+        self.rewritten += 1
+        return template.format(title)
+
+    def fix(self, text: str) -> str:
+        """Process a complete text in one go (same result as feed + flush)"""
+        return self.feed(text) + self.flush()
+
+
+def fix_citations(text: str, documents: Sequence) -> str:
+    """Non-streaming convenience wrapper"""
+    return StreamingCitationFixer(statute_titles_from(documents)).fix(text)
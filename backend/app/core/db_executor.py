@@ -0,0 +1,55 @@
+"""
+Database Offload - synchronous SQLAlchemy work off the event loop
+Async endpoints must not call the Session directly: every query or commit
+blocks the loop and stalls every other stream in the worker. `run_db` runs a
+function in a worker thread behind a capacity limiter. SQLite uses a single
+StaticPool connection, so its limiter has one token and DB work is
+serialized instead of interleaving on that connection.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from functools import partial
+from typing import Any, Callable, Optional, TypeVar
+
+import anyio
+from anyio import to_thread
+
+from app.core.config import settings
+from app.core.tracing import observe
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Worker threads for database work (SQLite: one shared connection)
+DEFAULT_DB_THREADS = 1 if settings.database_url.startswith("sqlite") else 8
+
+_limiter: Optional[anyio.CapacityLimiter] = None
+_limiter_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def db_limiter() -> anyio.CapacityLimiter:
+    """One limiter per event loop - a CapacityLimiter binds to the loop it waits on"""
+    global _limiter, _limiter_loop
+    loop = asyncio.get_running_loop()
+    if _limiter is None or _limiter_loop is not loop:
+        _limiter = anyio.CapacityLimiter(int(os.getenv("DB_THREADS", DEFAULT_DB_THREADS)))
+        _limiter_loop = loop
+    return _limiter
+
+
+async def run_db(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run `func(*args, **kwargs)` in a database worker thread
+
+    Group the statements of one request phase into a single function so the
+    request pays one thread hop, and return plain data rather than ORM objects
+    that would lazy-load (and block) when touched back on the loop.
+    """
+    started = time.perf_counter()
+    result = await to_thread.run_sync(partial(func, *args, **kwargs), limiter=db_limiter())
+    observe("db", time.perf_counter() - started, started, op=getattr(func, "__name__", "db"))
+    return result
@@ -0,0 +1,104 @@
+"""
+Request Deadline - per-request latency budget
+Optional pipeline stages (query decomposition, multi-objective scoring,
+article navigation) declare their expected cost. Once the remaining budget
+cannot cover a stage plus the reserve kept for answer generation, the stage
+is skipped and the pipeline falls back to plain vector top-k. Started stages
+are cancelled when they run past the budget.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Expected cost per optional stage, in seconds
+STAGE_COSTS = {
+    "decomposition": 1.5,
+    "scoring": 0.05,
+    "article_navigation": 2.0,
+}
+
+DEFAULT_BUDGET_SECONDS = 8.0
+# Kept back for prompt assembly and time to first token
+DEFAULT_GENERATION_RESERVE_SECONDS = 2.0
+
+
+class Deadline:
+    """Monotonic request deadline that records which optional stages it skipped"""
+
+    def __init__(
+        self,
+        budget_seconds: float = DEFAULT_BUDGET_SECONDS,
+        reserve_seconds: float = DEFAULT_GENERATION_RESERVE_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.budget_seconds = budget_seconds
+        self.reserve_seconds = reserve_seconds
+        self._clock = clock
+        self._expires_at = clock() + budget_seconds
+        self.skipped_stages: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_env(cls) -> "Deadline":
+        """Budget from REQUEST_LATENCY_BUDGET / REQUEST_GENERATION_RESERVE (seconds)"""
+        return cls(
+            float(os.getenv("REQUEST_LATENCY_BUDGET", DEFAULT_BUDGET_SECONDS)),
+            float(os.getenv("REQUEST_GENERATION_RESERVE", DEFAULT_GENERATION_RESERVE_SECONDS))
+        )
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (never negative)"""
+        return max(0.0, self._expires_at - self._clock())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def stage_budget(self) -> float:
+        """Time an optional stage may take without eating into the generation reserve"""
+        return max(0.0, self.remaining() - self.reserve_seconds)
+
+    def allows(self, stage: str, expected_cost: Optional[float] = None) -> bool:
+        """True if the stage fits in the budget; otherwise records it as skipped"""
+        cost = STAGE_COSTS.get(stage, 0.0) if expected_cost is None else expected_cost
+        if self.stage_budget() >= cost:
+            return True
+        self.skip(stage, "budget")
+        return False
+
+    def skip(self, stage: str, reason: str) -> None:
+        """Record a skipped stage (once per stage - navigation is checked per chunk)"""
+        if any(entry["stage"] == stage for entry in self.skipped_stages):
+            return
+        self.skipped_stages.append({
+            "stage": stage,
+            "reason": reason,
+            "remaining_ms": int(self.remaining() * 1000)
+        })
+        logger.info(f"⏱️ Skipping {stage} ({reason}, {self.remaining():.2f}s left)")
+
+    async def run_optional(
+        self,
+        stage: str,
+        factory: Callable[[], Awaitable[T]],
+        fallback: T,
+        expected_cost: Optional[float] = None
+    ) -> T:
+        """Run an optional stage within the budget; return `fallback` if skipped or cancelled"""
+        if not self.allows(stage, expected_cost):
+            return fallback
+        try:
+            return await asyncio.wait_for(factory(), timeout=self.stage_budget())
+        except asyncio.TimeoutError:
+            self.skip(stage, "timeout")
+            return fallback
+
+    def skipped_names(self) -> List[str]:
+        """Skipped stage names, in skip order"""
+        return [entry["stage"] for entry in self.skipped_stages]
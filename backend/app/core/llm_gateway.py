@@ -0,0 +1,492 @@
+"""
+LLM Gateway - single entry point for every AI call
+Per-model concurrency caps, RPM/TPM token buckets, jittered retries,
+optional hedged requests and per-call latency/token metrics.
+
+The gateway mirrors the AsyncOpenAI surface used in this codebase
+(`client.chat.completions.create`, `client.embeddings.create`), so existing
+components keep their code and simply receive the gateway as their client.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Same rough estimate as DocumentService.estimate_tokens
+CHARS_PER_TOKEN = 1.8
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Rough token estimate for messages / embedding input"""
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return int(len(payload) / CHARS_PER_TOKEN)
+    if isinstance(payload, dict):
+        return estimate_tokens(payload.get("content"))
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload)
+    return 0
+
+
+@dataclass
+class ModelLimits:
+    """Capacity limits for one model"""
+    max_concurrency: int = 16
+    requests_per_minute: int = 500
+    tokens_per_minute: int = 200000
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously per minute
+
+    `acquire` waits until the amount is available. `debit` charges usage that is
+    only known afterwards (streamed completions) and may drive the level negative,
+    which delays subsequent callers instead of rejecting them.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(per_minute, 1))
+        self.level = self.capacity
+        self.refill_per_second = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Wait for `amount` tokens. Returns seconds spent waiting."""
+        amount = min(float(amount), self.capacity)
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return waited
+                delay = (amount - self.level) / self.refill_per_second
+                waited += delay
+                await asyncio.sleep(delay)
+
+    def debit(self, amount: float) -> None:
+        """Charge usage after the fact"""
+        self._refill()
+        self.level -= float(amount)
+
+
+@dataclass
+class ModelMetrics:
+    """Rolling per-model call statistics"""
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    hedged: int = 0
+    hedges_skipped: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    throttled_seconds: float = 0.0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    first_token_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    stream_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=500))
+
+    @staticmethod
+    def _percentile(samples: Deque[float], pct: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def p95_latency_ms(self) -> Optional[float]:
+        return self._percentile(self.latencies_ms, 95)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedges_skipped": self.hedges_skipped,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "latency_p50_ms": self._percentile(self.latencies_ms, 50),
+            "latency_p95_ms": self._percentile(self.latencies_ms, 95),
+            "first_token_p50_ms": self._percentile(self.first_token_ms, 50),
+            "first_token_p95_ms": self._percentile(self.first_token_ms, 95),
+            "stream_p50_ms": self._percentile(self.stream_ms, 50),
+            "stream_p95_ms": self._percentile(self.stream_ms, 95),
+        }
+
+
+class _ModelState:
+    """Semaphore + buckets + metrics for one model"""
+
+    def __init__(self, limits: ModelLimits):
+        self.limits = limits
+        self.semaphore = asyncio.Semaphore(limits.max_concurrency)
+        self.request_bucket = TokenBucket(limits.requests_per_minute)
+        self.token_bucket = TokenBucket(limits.tokens_per_minute)
+        self.metrics = ModelMetrics()
+
+
+class GatewayStream:
+    """
+    Streaming completion wrapper
+
+    Holds the model's concurrency slot until the stream is exhausted or closed,
+    records time-to-first-token and debits the completion tokens afterwards.
+    """
+
+    def __init__(self, stream: Any, state: _ModelState, model: str, started: float, release):
+        self._stream = stream
+        self._iterator = stream.__aiter__()
+        self._state = state
+        self._model = model
+        self._started = started
+        self._release = release
+        self._first_token_at: Optional[float] = None
+        self._completion_chars = 0
+        self._finished = False
+
+    def __aiter__(self) -> "GatewayStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        try:
+            chunk = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._finish()
+            raise
+        except Exception:
+            self._finish(failed=True)
+            raise
+
+        if self._first_token_at is None:
+            self._first_token_at = time.monotonic()
+            self._state.metrics.first_token_ms.append((self._first_token_at - self._started) * 1000)
+
+        try:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            self._completion_chars += len(delta or "")
+        except (AttributeError, IndexError):
+            pass
+
+        return chunk
+
+    async def aclose(self) -> None:
+        """Close the upstream HTTP stream and free the concurrency slot"""
+        try:
+            close = getattr(self._stream, "close", None) or getattr(getattr(self._stream, "response", None), "aclose", None)
+            if close:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+        finally:
+            self._finish()
+
+    def _finish(self, failed: bool = False) -> None:
+        if self._finished:
+            return
+        self._finished = True
+
+        completion_tokens = int(self._completion_chars / CHARS_PER_TOKEN)
+        metrics = self._state.metrics
+        metrics.completion_tokens += completion_tokens
+        metrics.stream_ms.append((time.monotonic() - self._started) * 1000)
+        if failed:
+            metrics.errors += 1
+        self._state.token_bucket.debit(completion_tokens)
+        self._release()
+
+        logger.info(
+            f"📡 LLM stream {self._model}: {metrics.stream_ms[-1]:.0f}ms, "
+            f"~{completion_tokens} completion tokens{' (failed)' if failed else ''}"
+        )
+
+    def __del__(self):
+        # Safety net for consumers that stop iterating without closing
+        if not self._finished:
+            self._finish()
+
+
+class _Completions:
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    async def create(self, **kwargs) -> Any:
+        return await self._gateway.chat_completion(**kwargs)
+
+
+class _Chat:
+    def __init__(self, gateway: "LLMGateway"):
+        self.completions = _Completions(gateway)
+
+
+class _Embeddings:
+    def __init__(self, gateway: "LLMGateway"):
+        self._gateway = gateway
+
+    async def create(self, **kwargs) -> Any:
+        return await self._gateway.embedding(**kwargs)
+
+
+class LLMGateway:
+    """
+    Shared async gateway in front of an OpenAI-compatible client
+
+    - Per-model concurrency semaphores
+    - Requests-per-minute and tokens-per-minute token buckets
+    - Jittered exponential retry for idempotent calls (non-streaming calls and
+      stream establishment - nothing has been sent to the user yet)
+    - Optional hedged request once a call exceeds the model's observed p95
+    - Per-call latency / token metrics (`get_metrics`)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        default_limits: Optional[ModelLimits] = None,
+        model_limits: Optional[Dict[str, ModelLimits]] = None,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge_enabled: bool = False,
+        hedge_min_samples: int = 20
+    ):
+        self.client = client
+        self.default_limits = default_limits or ModelLimits()
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_samples = hedge_min_samples
+        self._models: Dict[str, _ModelState] = {}
+
+        # AsyncOpenAI-compatible surface
+        self.chat = _Chat(self)
+        self.embeddings = _Embeddings(self)
+
+        logger.info(
+            f"🚦 LLM gateway initialized: concurrency={self.default_limits.max_concurrency}, "
+            f"rpm={self.default_limits.requests_per_minute}, tpm={self.default_limits.tokens_per_minute}, "
+            f"retries={max_retries}, hedging={'on' if hedge_enabled else 'off'}"
+        )
+
+    @classmethod
+    def from_env(cls, client: Any) -> "LLMGateway":
+        """
+        Build a gateway from environment variables
+
+        LLM_MAX_CONCURRENCY, LLM_RPM, LLM_TPM, LLM_MAX_RETRIES, LLM_HEDGE_ENABLED
+        LLM_MODEL_LIMITS - JSON overrides, e.g. {"gpt-4o": {"max_concurrency": 8, "tokens_per_minute": 30000}}
+        """
+        default_limits = ModelLimits(
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+            requests_per_minute=int(os.getenv("LLM_RPM", "500")),
+            tokens_per_minute=int(os.getenv("LLM_TPM", "200000")),
+        )
+
+        model_limits = {}
+        try:
+            for model, overrides in json.loads(os.getenv("LLM_MODEL_LIMITS", "{}")).items():
+                model_limits[model] = ModelLimits(**{**default_limits.__dict__, **overrides})
+        except (ValueError, TypeError) as e:
+            logger.warning(f"⚠️ Ignoring invalid LLM_MODEL_LIMITS: {e}")
+
+        return cls(
+            client,
+            default_limits=default_limits,
+            model_limits=model_limits,
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            hedge_enabled=os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true",
+        )
+
+    # ==================== PUBLIC API ====================
+
+    async def chat_completion(self, max_retries: Optional[int] = None, **kwargs) -> Any:
+        """
+        chat.completions.create through the gateway
+
+        `max_retries` overrides the gateway default for this call (e.g. 0 when the
+        caller has its own failover).
+        """
+        model = kwargs.get("model", "default")
+        prompt_tokens = estimate_tokens(kwargs.get("messages"))
+
+        if kwargs.get("stream"):
+            return await self._open_stream(model, prompt_tokens, kwargs, max_retries)
+
+        return await self._call(model, prompt_tokens, lambda: self.client.chat.completions.create(**kwargs), max_retries)
+
+    async def embedding(self, **kwargs) -> Any:
+        """embeddings.create through the gateway"""
+        model = kwargs.get("model", "default")
+        prompt_tokens = estimate_tokens(kwargs.get("input"))
+        return await self._call(model, prompt_tokens, lambda: self.client.embeddings.create(**kwargs))
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-model metrics snapshot"""
+        return {model: state.metrics.snapshot() for model, state in self._models.items()}
+
+    # ==================== INTERNALS ====================
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState(self.model_limits.get(model, self.default_limits))
+        return self._models[model]
+
+    async def _admit(self, state: _ModelState, prompt_tokens: int) -> None:
+        """Rate-limit admission (request + prompt token budget)"""
+        waited = await state.request_bucket.acquire(1)
+        waited += await state.token_bucket.acquire(prompt_tokens)
+        if waited:
+            state.metrics.throttled_seconds += waited
+            logger.info(f"🚦 LLM call throttled for {waited:.2f}s by rate limits")
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Jittered exponential backoff, honoring Retry-After when present"""
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        return max(delay, retry_after or 0.0)
+
+    async def _with_retries(self, state: _ModelState, model: str, attempt_call, max_retries: Optional[int] = None) -> Any:
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            try:
+                return await attempt_call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= max_retries:
+                    state.metrics.errors += 1
+                    logger.error(f"❌ LLM call to {model} failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                state.metrics.retries += 1
+                logger.warning(f"🔁 LLM call to {model} failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+            except Exception:
+                state.metrics.errors += 1
+                raise
+
+    async def _call(self, model: str, prompt_tokens: int, factory, max_retries: Optional[int] = None) -> Any:
+        """Idempotent request/response call"""
+        state = self._state(model)
+        state.metrics.calls += 1
+        started = time.monotonic()
+
+        async def attempt_call():
+            await self._admit(state, prompt_tokens)
+            async with state.semaphore:
+                return await self._maybe_hedged(state, model, prompt_tokens, factory)
+
+        response = await self._with_retries(state, model, attempt_call, max_retries)
+
+        latency_ms = (time.monotonic() - started) * 1000
+        state.metrics.latencies_ms.append(latency_ms)
+        usage = getattr(response, "usage", None)
+        actual_prompt = getattr(usage, "prompt_tokens", None) or prompt_tokens
+        completion = getattr(usage, "completion_tokens", None) or 0
+        state.metrics.prompt_tokens += actual_prompt
+        state.metrics.completion_tokens += completion
+        state.token_bucket.debit(completion)
+
+        logger.info(f"📡 LLM call {model}: {latency_ms:.0f}ms, {actual_prompt}+{completion} tokens")
+        return response
+
+    async def _maybe_hedged(self, state: _ModelState, model: str, prompt_tokens: int, factory) -> Any:
+        """
+        Fire a second identical request if the first exceeds the observed p95
+        The hedge takes its own concurrency slot; with none free it is skipped.
+        """
+        p95 = state.metrics.p95_latency_ms()
+        if not self.hedge_enabled or p95 is None or len(state.metrics.latencies_ms) < self.hedge_min_samples:
+            return await factory()
+
+        primary = asyncio.ensure_future(factory())
+        done, _ = await asyncio.wait({primary}, timeout=p95 / 1000)
+        if done:
+            return primary.result()
+
+        if state.semaphore.locked():
+            # Saturated model: a hedge would only add load (or queue behind other callers)
+            state.metrics.hedges_skipped += 1
+            return await primary
+
+        await state.semaphore.acquire()  # a slot is free - returns immediately
+
+        async def hedged_call():
+            try:
+                # Hedge counts against the rate budget like any other request
+                await self._admit(state, prompt_tokens)
+                return await factory()
+            finally:
+                state.semaphore.release()
+
+        state.metrics.hedged += 1
+        logger.info(f"🏃 Hedging {model} call after {p95:.0f}ms (p95)")
+        hedge = asyncio.ensure_future(hedged_call())
+
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _open_stream(self, model: str, prompt_tokens: int, kwargs: Dict[str, Any], max_retries: Optional[int] = None) -> GatewayStream:
+        """Open a streaming completion - retried only until the stream is established"""
+        state = self._state(model)
+        state.metrics.calls += 1
+        started = time.monotonic()
+
+        async def attempt_call():
+            await self._admit(state, prompt_tokens)
+            await state.semaphore.acquire()
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except BaseException:
+                state.semaphore.release()
+                raise
+
+        stream = await self._with_retries(state, model, attempt_call, max_retries)
+        state.metrics.prompt_tokens += prompt_tokens
+        return GatewayStream(stream, state, model, started, state.semaphore.release)
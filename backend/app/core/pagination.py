@@ -0,0 +1,32 @@
+"""
+Keyset Pagination - opaque cursors for newest-first listings
+A cursor carries the sort key of the last row served (timestamp, with the id
+as tie-breaker), so the next page is one range scan on the index however deep
+the client has paged; OFFSET re-reads every skipped row on each request.
+"""
+
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: datetime, row_id: str) -> str:
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """(timestamp, id) from a cursor; ValueError if it was not issued by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        timestamp, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def page_size(limit: Optional[int], default: int = 20) -> int:
+    """Clamp a client-supplied page size to 1..MAX_PAGE_SIZE"""
+    return max(1, min(limit or default, MAX_PAGE_SIZE))
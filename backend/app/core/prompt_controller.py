@@ -308,61 +308,65 @@ class LegalDomainClassifier:
         return LegalDomain.GENERAL
 
 
+# All article citation forms in one precompiled pattern:
+# المادة (12) | المادة 12 | مادة (12) | مادة 12 | المادة رقم 12 | وفق المادة رقم 12 | استناداً للمادة 12
+ARTICLE_CITATION_PATTERN = re.compile(
+    r'(?:وفق\s*المادة\s*رقم|استناداً\s*للمادة|المادة\s*رقم|المادة|مادة)\s*(?:\(\s*([0-9٠-٩]+)\s*\)|([0-9٠-٩]+))'
+)
+ARABIC_INDIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789')
+
+
+def extract_article_citations(text: str) -> List[str]:
+    """Normalized article citations ("المادة (12)") in order of first appearance"""
+    citations = []
+    for match in ARTICLE_CITATION_PATTERN.finditer(text or ""):
+        citation = normalize_article_citation(match)
+        if citation not in citations:
+            citations.append(citation)
+    return citations
+
+
+def normalize_article_citation(match: re.Match) -> str:
+    number = (match.group(1) or match.group(2)).translate(ARABIC_INDIC_DIGITS)
+    return f"المادة ({int(number)})"
+
+
 class CitationValidator:
     """Enhanced citation extraction and validation"""
     
-    def __init__(self):
-        self.citation_patterns = [
-            r'المادة\s*\((\d+)\)',           # المادة (12)
-            r'المادة\s*(\d+)',              # المادة 12
-            r'مادة\s*\((\d+)\)',            # مادة (12)
-            r'مادة\s*(\d+)',               # مادة 12
-            r'المادة\s*رقم\s*(\d+)',        # المادة رقم 12
-            r'وفق\s*المادة\s*رقم\s*(\d+)',  # وفق المادة رقم 12
-            r'استناداً\s*للمادة\s*(\d+)',   # استناداً للمادة 12
-        ]
-    
     def extract_citations(self, text: str) -> List[str]:
         """Extract all legal citations from text with enhanced patterns"""
-        citations = []
-        
-        for pattern in self.citation_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                # Normalize citation format
-                normalized = f"المادة ({match})"
-                if normalized not in citations:
-                    citations.append(normalized)
+        return extract_article_citations(text)
+    
+    def available_citations(self, available_documents: List[Any]) -> set:
+        """
+        Union of the article citations of the retrieved documents
         
-        return citations
+        Uses the per-chunk `article_citations` precomputed at ingestion; only
+        chunks indexed before that existed are scanned here.
+        """
+        available = set()
+        for doc in available_documents or []:
+            precomputed = getattr(doc, 'article_citations', None)
+            if precomputed is not None:
+                available.update(precomputed)
+            elif getattr(doc, 'content', None):
+                available.update(self.extract_citations(doc.content))
+        return available
     
     def validate_citations(self, response: str, available_documents: List[Any]) -> Tuple[bool, List[str]]:
         """Validate that response only uses available citations"""
         warnings = []
+        response_citations = self.extract_citations(response)
         
         if not available_documents:
-            response_citations = self.extract_citations(response)
             if response_citations:
                 warnings.append(f"Response contains citations but no documents provided: {response_citations}")
                 return False, warnings
             return True, warnings
         
-        # Extract citations from response and documents
-        response_citations = self.extract_citations(response)
-        available_citations = []
-        
-        for doc in available_documents:
-            try:
-                if hasattr(doc, 'content') and doc.content:
-                    available_citations.extend(self.extract_citations(doc.content))
-            except Exception as e:
-                warnings.append(f"Error processing document: {str(e)}")
-        
-        # Validate each citation
-        invalid_citations = []
-        for citation in response_citations:
-            if citation not in available_citations:
-                invalid_citations.append(citation)
+        available_citations = self.available_citations(available_documents)
+        invalid_citations = [citation for citation in response_citations if citation not in available_citations]
         
         if invalid_citations:
             warnings.append(f"Invalid citations found: {invalid_citations}")
@@ -371,6 +375,64 @@ class CitationValidator:
         return True, warnings
 
 
+class StreamingCitationValidator:
+    """
+    Checks article citations as they appear in a streamed answer
+    
+    feed() returns one event per new citation that is not among the retrieved
+    documents' articles. A short tail is kept between chunks so a citation split
+    across tokens ("المادة 1" + "2") is seen whole.
+    """
+    
+    LOOKBACK = 40
+    
+    def __init__(self, available_citations: set):
+        self.available = set(available_citations)
+        self._buffer = ""
+        self._offset = 0          # position of _buffer[0] in the full answer
+        self._seen = set()
+        self.checked = 0
+        self.invalid = 0
+    
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Scan new text; return invalid-citation events for completed citations"""
+        self._buffer += chunk or ""
+        return self._scan(final=False)
+    
+    def flush(self) -> List[Dict[str, Any]]:
+        """End of stream: check whatever is still buffered"""
+        events = self._scan(final=True)
+        self._buffer = ""
+        return events
+    
+    def _scan(self, final: bool) -> List[Dict[str, Any]]:
+        events = []
+        consumed = 0
+        
+        for match in ARTICLE_CITATION_PATTERN.finditer(self._buffer):
+            if not final and match.end() == len(self._buffer):
+                break  # the number may continue in the next chunk
+            consumed = match.end()
+            citation = normalize_article_citation(match)
+            if citation in self._seen:
+                continue
+            self._seen.add(citation)
+            self.checked += 1
+            if citation not in self.available:
+                self.invalid += 1
+                events.append({
+                    'type': 'citation_warning',
+                    'citation': citation,
+                    'reason': 'not_in_sources',
+                    'position': self._offset + match.start()
+                })
+        
+        keep = max(consumed, len(self._buffer) - self.LOOKBACK)
+        self._buffer = self._buffer[keep:]
+        self._offset += keep
+        return events
+
+
 @dataclass
 class ConversationContext:
     """Dynamic conversation context - no hardcoded patterns"""
@@ -1810,7 +1872,9 @@ class PromptComposer:
             
             for i, doc in enumerate(retrieved_documents, 1):
                 if hasattr(doc, 'title') and hasattr(doc, 'content'):
-                    citations = self.citation_validator.extract_citations(doc.content)
+                    citations = getattr(doc, 'article_citations', None)
+                    if citations is None:
+                        citations = self.citation_validator.extract_citations(doc.content)
                     available_citations.extend(citations)
                     
                     formatted_docs.append(f"📄 **المرجع {i}: {doc.title}**")
@@ -0,0 +1,204 @@
+"""
+Provider Router - ordered failover for streaming completions
+Routes streaming answers across OpenAI-compatible providers (OpenAI, DeepSeek)
+with health-based ordering. Failover happens only before the first token,
+so the user never sees a partial answer from two different models.
+Closing the stream early (client disconnected) closes the upstream HTTP
+response, so the provider stops generating tokens nobody reads.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import anyio
+import openai
+
+from app.core.llm_gateway import LLMGateway
+
+logger = logging.getLogger(__name__)
+
+# Errors that justify trying the next provider (nothing streamed yet)
+FAILOVER_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    asyncio.TimeoutError,
+)
+
+
+class FirstTokenTimeout(asyncio.TimeoutError):
+    """Provider did not produce a first token in time"""
+
+
+@dataclass
+class LLMProvider:
+    """One OpenAI-compatible provider behind its own gateway"""
+    name: str
+    gateway: LLMGateway
+    chat_model: str
+    classification_model: str
+    # Completion token limit of chat_model; larger max_tokens requests are clamped
+    max_output_tokens: Optional[int] = None
+
+    # Health state
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    last_error: Optional[str] = None
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        return (now or time.monotonic()) >= self.cooldown_until
+
+
+class ProviderRouter:
+    """
+    Ordered provider failover for streaming completions
+
+    - Providers are tried in configured order, healthy ones first
+    - A provider that fails (429/5xx/connection error before streaming, or no
+      first token within `first_token_timeout`) goes into an exponential cooldown
+    - Providers in cooldown are still used as a last resort
+    """
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        first_token_timeout: float = 15.0,
+        base_cooldown: float = 10.0,
+        max_cooldown: float = 300.0
+    ):
+        if not providers:
+            raise ValueError("ProviderRouter requires at least one provider")
+
+        self.providers = providers
+        self.first_token_timeout = first_token_timeout
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.failovers = 0
+
+        logger.info(
+            f"🔀 Provider router: {' → '.join(p.name for p in providers)} "
+            f"(first token timeout {first_token_timeout}s)"
+        )
+
+    @classmethod
+    def from_env(cls, providers: List[LLMProvider]) -> "ProviderRouter":
+        """LLM_FIRST_TOKEN_TIMEOUT, LLM_PROVIDER_COOLDOWN, LLM_PROVIDER_MAX_COOLDOWN"""
+        return cls(
+            providers,
+            first_token_timeout=float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "15")),
+            base_cooldown=float(os.getenv("LLM_PROVIDER_COOLDOWN", "10")),
+            max_cooldown=float(os.getenv("LLM_PROVIDER_MAX_COOLDOWN", "300")),
+        )
+
+    @property
+    def primary(self) -> LLMProvider:
+        return self.providers[0]
+
+    def ordered_providers(self) -> List[LLMProvider]:
+        """Healthy providers in configured order, then cooling-down ones (soonest first)"""
+        now = time.monotonic()
+        healthy = [p for p in self.providers if p.is_healthy(now)]
+        cooling = sorted((p for p in self.providers if not p.is_healthy(now)), key=lambda p: p.cooldown_until)
+        return healthy + cooling
+
+    def record_failure(self, provider: LLMProvider, error: BaseException) -> None:
+        provider.consecutive_failures += 1
+        cooldown = min(self.max_cooldown, self.base_cooldown * (2 ** (provider.consecutive_failures - 1)))
+        provider.cooldown_until = time.monotonic() + cooldown
+        provider.last_error = f"{type(error).__name__}: {error}"
+        logger.warning(f"⚠️ Provider {provider.name} failed ({provider.last_error}) - cooling down {cooldown:.0f}s")
+
+    def record_success(self, provider: LLMProvider) -> None:
+        if provider.consecutive_failures:
+            logger.info(f"✅ Provider {provider.name} recovered")
+        provider.consecutive_failures = 0
+        provider.cooldown_until = 0.0
+        provider.last_error = None
+
+    async def stream_chat(self, messages: List[Dict[str, str]], **kwargs) -> AsyncIterator[str]:
+        """
+        Stream content deltas from the first provider that starts answering
+
+        Raises the last provider error if every provider fails before streaming.
+        """
+        last_error: Optional[BaseException] = None
+
+        for attempt, provider in enumerate(self.ordered_providers()):
+            if attempt:
+                self.failovers += 1
+                logger.info(f"🔀 Failing over to {provider.name}")
+
+            stream = None
+            try:
+                # Fail fast: provider-level retries would delay failover
+                stream, first_content = await asyncio.wait_for(
+                    self._open(provider, messages, kwargs),
+                    timeout=self.first_token_timeout
+                )
+            except asyncio.TimeoutError as e:
+                last_error = FirstTokenTimeout(f"no first token from {provider.name} within {self.first_token_timeout}s")
+                self.record_failure(provider, last_error)
+                continue
+            except FAILOVER_ERRORS as e:
+                last_error = e
+                self.record_failure(provider, e)
+                continue
+
+            self.record_success(provider)
+            try:
+                if first_content:
+                    yield first_content
+
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+            finally:
+                # Also on aclose()/cancellation: free the slot and drop the HTTP
+                # response now (shielded - a cancelled scope re-cancels every await)
+                with anyio.CancelScope(shield=True):
+                    await stream.aclose()
+            return
+
+        raise last_error or RuntimeError("No AI provider available")
+
+    async def _open(self, provider: LLMProvider, messages: List[Dict[str, str]], kwargs: Dict[str, Any]):
+        """Open the stream and wait for the first content delta"""
+        if provider.max_output_tokens and kwargs.get("max_tokens", 0) > provider.max_output_tokens:
+            # A model rejects max_tokens above its own limit (DeepSeek: 8192)
+            kwargs = {**kwargs, "max_tokens": provider.max_output_tokens}
+        stream = await provider.gateway.chat_completion(
+            model=provider.chat_model,
+            messages=messages,
+            stream=True,
+            max_retries=0,
+            **kwargs
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return stream, chunk.choices[0].delta.content
+            return stream, ""
+        except BaseException:
+            # Includes cancellation by the first-token timeout
+            await stream.aclose()
+            raise
+
+    def get_status(self) -> Dict[str, Any]:
+        """Provider health snapshot"""
+        now = time.monotonic()
+        return {
+            "failovers": self.failovers,
+            "providers": [{
+                "name": p.name,
+                "model": p.chat_model,
+                "healthy": p.is_healthy(now),
+                "consecutive_failures": p.consecutive_failures,
+                "cooldown_remaining_s": round(max(0.0, p.cooldown_until - now), 1),
+                "last_error": p.last_error,
+            } for p in self.providers]
+        }
@@ -0,0 +1,252 @@
+"""
+Quota Engine - atomic question quotas shared across workers
+A quota allows `limit` questions; the question that reaches the limit starts
+a cooldown, and once it ends the counter starts over. Guest counters also
+lapse after `idle_seconds` without activity (like the guest session itself).
+
+check-and-consume is a single round trip: SqliteQuotaEngine runs one
+INSERT ... ON CONFLICT DO UPDATE ... RETURNING, so concurrent workers can
+never both take the last question. MemoryQuotaEngine applies the same rules
+in-process for single-worker setups and tests.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class QuotaPolicy:
+    """Questions per cycle, cooldown once they are used up, optional idle expiry"""
+    limit: int
+    cooldown_seconds: float
+    idle_seconds: Optional[float] = None
+
+
+@dataclass
+class QuotaDecision:
+    allowed: bool
+    used: int
+    limit: int
+    reset_at: Optional[datetime] = None  # naive UTC, like the rest of the app
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.limit - self.used)
+
+    @property
+    def message(self) -> str:
+        if self.allowed:
+            return "OK"
+        if self.reset_at:
+            return f"Questions will refill at {self.reset_at.strftime('%I:%M %p')}"
+        return "Question limit reached"
+
+
+def _to_datetime(epoch: Optional[float]) -> Optional[datetime]:
+    return datetime.utcfromtimestamp(epoch) if epoch is not None else None
+
+
+class QuotaEngine(ABC):
+    """Contract for quota backends"""
+
+    backend = "abstract"
+
+    @abstractmethod
+    def consume(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        """Atomically take one question if the quota allows it"""
+
+    @abstractmethod
+    def peek(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        """Current state without consuming (`allowed` = a question is available)"""
+
+    @abstractmethod
+    def refund(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        """Give one question back (failed request); lifts a cooldown it started"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Delete counters that have lapsed"""
+
+
+class MemoryQuotaEngine(QuotaEngine):
+    """Per-process counters - consistent only within one worker"""
+
+    backend = "memory"
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = Lock()
+        # key -> (used, reset_at, expires_at)
+        self._counters: Dict[str, Tuple[int, Optional[float], Optional[float]]] = {}
+
+    def _current(self, key: str, now: float) -> Tuple[int, Optional[float], Optional[float]]:
+        used, reset_at, expires_at = self._counters.get(key, (0, None, None))
+        lapsed = (reset_at is not None and reset_at <= now) or (expires_at is not None and expires_at <= now)
+        return (0, None, None) if lapsed else (used, reset_at, expires_at)
+
+    def consume(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        now = self._clock()
+        with self._lock:
+            used, reset_at, expires_at = self._current(key, now)
+            allowed = used < policy.limit
+            if allowed:
+                used += 1
+                if used >= policy.limit:
+                    reset_at = now + policy.cooldown_seconds
+            if policy.idle_seconds is not None:
+                expires_at = max(now + policy.idle_seconds, reset_at or 0.0)
+            self._counters[key] = (used, reset_at, expires_at)
+        return QuotaDecision(allowed, used, policy.limit, _to_datetime(reset_at))
+
+    def peek(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        with self._lock:
+            used, reset_at, _ = self._current(key, self._clock())
+        return QuotaDecision(used < policy.limit, used, policy.limit, _to_datetime(reset_at))
+
+    def refund(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        with self._lock:
+            used, reset_at, expires_at = self._current(key, self._clock())
+            used = max(0, used - 1)
+            if used < policy.limit:
+                reset_at = None
+            self._counters[key] = (used, reset_at, expires_at)
+        return QuotaDecision(used < policy.limit, used, policy.limit, _to_datetime(reset_at))
+
+    def sweep(self) -> int:
+        now = self._clock()
+        with self._lock:
+            lapsed = [key for key in self._counters if self._current(key, now) == (0, None, None)]
+            for key in lapsed:
+                del self._counters[key]
+        return len(lapsed)
+
+
+# A counter starts over once its cooldown ended or it sat idle past expires_at
+_LAPSED = "((reset_at IS NOT NULL AND reset_at <= :now) OR (expires_at IS NOT NULL AND expires_at <= :now))"
+_NEW_USED = f"CASE WHEN {_LAPSED} THEN 1 WHEN used < :limit THEN used + 1 ELSE used END"
+_NEW_RESET = f"""CASE
+    WHEN {_LAPSED} THEN (CASE WHEN 1 >= :limit THEN :now + :cooldown END)
+    WHEN used < :limit AND used + 1 >= :limit THEN :now + :cooldown
+    ELSE reset_at END"""
+
+CONSUME_SQL = f"""
+INSERT INTO quota_counters (key, used, reset_at, expires_at, granted, updated_at)
+VALUES (
+    :key, 1,
+    CASE WHEN 1 >= :limit THEN :now + :cooldown END,
+    CASE WHEN :idle IS NOT NULL THEN MAX(:now + :idle, CASE WHEN 1 >= :limit THEN :now + :cooldown ELSE 0 END) END,
+    1, :now
+)
+ON CONFLICT(key) DO UPDATE SET
+    used = {_NEW_USED},
+    reset_at = {_NEW_RESET},
+    expires_at = CASE WHEN :idle IS NOT NULL THEN MAX(:now + :idle, COALESCE({_NEW_RESET}, 0)) END,
+    granted = CASE WHEN {_LAPSED} OR used < :limit THEN 1 ELSE 0 END,
+    updated_at = :now
+RETURNING used, reset_at, granted
+"""
+
+REFUND_SQL = """
+UPDATE quota_counters SET
+    used = MAX(used - 1, 0),
+    reset_at = CASE WHEN used - 1 < :limit THEN NULL ELSE reset_at END,
+    updated_at = :now
+WHERE key = :key
+RETURNING used, reset_at
+"""
+
+
+class SqliteQuotaEngine(QuotaEngine):
+    """Counters in one SQLite file shared by all workers"""
+
+    backend = "sqlite"
+
+    def __init__(self, db_path: str = "data/quotas.db", clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        # Wall clock - cooldowns are compared across processes
+        self._clock = clock
+        self._lock = Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS quota_counters (
+                key TEXT PRIMARY KEY,
+                used INTEGER NOT NULL,
+                reset_at REAL,
+                expires_at REAL,
+                granted INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        logger.info(f"Quota engine (sqlite) at {db_path}")
+
+    def _params(self, key: str, policy: QuotaPolicy) -> Dict:
+        return {
+            "key": key,
+            "limit": policy.limit,
+            "cooldown": policy.cooldown_seconds,
+            "idle": policy.idle_seconds,
+            "now": self._clock(),
+        }
+
+    def consume(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        with self._lock:
+            used, reset_at, granted = self._db.execute(CONSUME_SQL, self._params(key, policy)).fetchone()
+        return QuotaDecision(bool(granted), used, policy.limit, _to_datetime(reset_at))
+
+    def peek(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        params = self._params(key, policy)
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT used, reset_at, {_LAPSED} FROM quota_counters WHERE key = :key", params
+            ).fetchone()
+        if row is None or row[2]:
+            return QuotaDecision(True, 0, policy.limit)
+        used, reset_at, _ = row
+        return QuotaDecision(used < policy.limit, used, policy.limit, _to_datetime(reset_at))
+
+    def refund(self, key: str, policy: QuotaPolicy) -> QuotaDecision:
+        with self._lock:
+            row = self._db.execute(REFUND_SQL, self._params(key, policy)).fetchone()
+        if row is None:
+            return QuotaDecision(True, 0, policy.limit)
+        used, reset_at = row
+        return QuotaDecision(used < policy.limit, used, policy.limit, _to_datetime(reset_at))
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                f"DELETE FROM quota_counters WHERE {_LAPSED}", {"now": self._clock()}
+            ).rowcount
+
+
+def create_quota_engine(backend: str = "memory", db_path: str = "data/quotas.db") -> QuotaEngine:
+    """Engine for the configured backend (memory | sqlite)"""
+    if backend == "sqlite":
+        return SqliteQuotaEngine(db_path)
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown quota backend '{backend}', using memory")
+    return MemoryQuotaEngine()
+
+
+_engine: Optional[QuotaEngine] = None
+
+
+def get_quota_engine() -> QuotaEngine:
+    """Process-wide engine (QUOTA_STORE / QUOTA_DB_PATH in SessionConfig)"""
+    global _engine
+    if _engine is None:
+        from app.core.session_config import session_config
+        _engine = create_quota_engine(session_config.QUOTA_STORE, session_config.QUOTA_DB_PATH)
+    return _engine
@@ -0,0 +1,182 @@
+"""
+Request Coalescing - single-flight for identical in-flight questions
+Identical context-free questions asked at the same moment share one
+classification and one streamed generation. Late joiners replay the
+buffered prefix and then follow the live token stream.
+"""
+
+import re
+import asyncio
+import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARABIC_DIACRITICS = re.compile(r'[ؐ-ًؚ-ٰٟۖ-ۭـ]')
+PUNCTUATION = re.compile(r'[^\w\s]')
+WHITESPACE = re.compile(r'\s+')
+LETTER_VARIANTS = str.maketrans({'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ى': 'ي', 'ة': 'ه'})
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a question for coalescing (diacritics, letter variants, punctuation, spacing)"""
+    text = ARABIC_DIACRITICS.sub('', query or '')
+    text = text.translate(LETTER_VARIANTS)
+    text = PUNCTUATION.sub(' ', text)
+    return WHITESPACE.sub(' ', text).strip().lower()
+
+
+class SingleFlight:
+    """Share one awaitable result between concurrent callers with the same key"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so a failed flight with no followers does not warn
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+class GenerationCancelled(RuntimeError):
+    """The shared generation was cancelled before it finished"""
+
+
+class StreamBroadcaster:
+    """
+    Fan-out of one async text stream to many subscribers
+
+    A leader task drains the source into a buffer; every subscriber replays the
+    buffer from the start and then waits for new chunks. When the last
+    subscriber leaves before completion the leader is cancelled so the upstream
+    generation stops; a cancelled broadcaster takes no new subscribers, and
+    anyone still attached gets GenerationCancelled rather than a partial answer.
+    """
+
+    def __init__(self, source: AsyncIterator[str]):
+        self._source = source
+        self._buffer: List[str] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+        self._subscribers = 0
+        self._cancelled = False
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def joinable(self) -> bool:
+        """Still generating and not being cancelled"""
+        return not self._done and not self._cancelled
+
+    def on_finished(self, callback: Callable[[], None]) -> None:
+        """Run `callback` once the leader task has ended (completed, failed or cancelled)"""
+        self._task.add_done_callback(lambda _: callback())
+
+    async def _run(self) -> None:
+        try:
+            async for chunk in self._source:
+                async with self._changed:
+                    self._buffer.append(chunk)
+                    self._changed.notify_all()
+        except asyncio.CancelledError:
+            self._error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self._error = e
+        finally:
+            aclose = getattr(self._source, "aclose", None)
+            if aclose:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+            async with self._changed:
+                self._done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Replay the buffered prefix, then follow the live stream"""
+        self._subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with self._changed:
+                    while position >= len(self._buffer) and not self._done:
+                        await self._changed.wait()
+                    pending = self._buffer[position:]
+                    finished = self._done
+                position += len(pending)
+
+                for chunk in pending:
+                    yield chunk
+
+                if finished and position >= len(self._buffer):
+                    if isinstance(self._error, asyncio.CancelledError):
+                        raise GenerationCancelled("coalesced generation was cancelled")
+                    if self._error:
+                        raise self._error
+                    return
+        finally:
+            self._subscribers -= 1
+            if self._subscribers == 0 and not self._done:
+                logger.info("🛑 Last subscriber left - cancelling coalesced generation")
+                self._cancelled = True
+                self._task.cancel()
+
+
+class StreamCoalescer:
+    """Registry of in-flight broadcasters keyed by (normalized query, intent)"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, StreamBroadcaster] = {}
+        self.leaders = 0
+        self.joiners = 0
+
+    async def stream(self, key: Hashable, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        broadcaster = self._inflight.get(key)
+        if broadcaster is not None and broadcaster.joinable:
+            self.joiners += 1
+            logger.info(f"🔗 Coalesced identical in-flight question ({self.joiners} joined so far)")
+        else:
+            self.leaders += 1
+            broadcaster = StreamBroadcaster(factory())
+            self._inflight[key] = broadcaster
+            # Leaves the registry when its task ends - also when cancelled mid-stream
+            broadcaster.on_finished(lambda: self._forget(key, broadcaster))
+
+        # Closing this stream unsubscribes now (the last subscriber stops the leader)
+        async with aclosing(broadcaster.subscribe()) as chunks:
+            async for chunk in chunks:
+                yield chunk
+
+    def _forget(self, key: Hashable, broadcaster: StreamBroadcaster) -> None:
+        if self._inflight.get(key) is broadcaster:
+            del self._inflight[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": sum(1 for b in self._inflight.values() if b.joinable),
+            "leaders": self.leaders,
+            "joiners": self.joiners,
+        }
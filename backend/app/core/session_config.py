@@ -26,8 +26,25 @@ class SessionConfig:
     
     # Memory management (configurable)
     MAX_GUEST_SESSIONS: int = int(os.getenv('MAX_GUEST_SESSIONS', '10000'))
+    GUEST_SESSION_MAX_MB: int = int(os.getenv('GUEST_SESSION_MAX_MB', '64'))
     CLEANUP_INTERVAL_MINUTES: int = int(os.getenv('CLEANUP_INTERVAL_MINUTES', '30'))
     
+    # Guest session storage: memory (per worker) or sqlite (shared across workers)
+    GUEST_SESSION_STORE: str = os.getenv('GUEST_SESSION_STORE', 'memory')
+    GUEST_SESSION_DB_PATH: str = os.getenv('GUEST_SESSION_DB_PATH', 'data/sessions.db')
+    
+    # Guest question quotas: memory or sqlite (shared across workers)
+    QUOTA_STORE: str = os.getenv('QUOTA_STORE', os.getenv('GUEST_SESSION_STORE', 'memory'))
+    QUOTA_DB_PATH: str = os.getenv('QUOTA_DB_PATH', 'data/quotas.db')
+    
+    # Recent-message windows of signed-in conversations (same backends as guest sessions)
+    CONTEXT_WINDOW_MESSAGES: int = int(os.getenv('CONTEXT_WINDOW_MESSAGES', '10'))
+    CONTEXT_CACHE_STORE: str = os.getenv('CONTEXT_CACHE_STORE', os.getenv('GUEST_SESSION_STORE', 'memory'))
+    CONTEXT_CACHE_DB_PATH: str = os.getenv('CONTEXT_CACHE_DB_PATH', 'data/context_cache.db')
+    CONTEXT_CACHE_MAX_CONVERSATIONS: int = int(os.getenv('CONTEXT_CACHE_MAX_CONVERSATIONS', '5000'))
+    CONTEXT_CACHE_MAX_MB: int = int(os.getenv('CONTEXT_CACHE_MAX_MB', '64'))
+    CONTEXT_CACHE_TTL_MINUTES: int = int(os.getenv('CONTEXT_CACHE_TTL_MINUTES', '60'))
+    
     # Session ID configuration
     SESSION_ID_PREFIX: str = os.getenv('SESSION_ID_PREFIX', 'guest')
     
@@ -40,7 +57,11 @@ class SessionConfig:
             'user_question_limit': self.USER_QUESTION_LIMIT,
             'cooldown_duration_minutes': self.COOLDOWN_DURATION_MINUTES,
             'max_guest_sessions': self.MAX_GUEST_SESSIONS,
-            'cleanup_interval_minutes': self.CLEANUP_INTERVAL_MINUTES
+            'guest_session_max_mb': self.GUEST_SESSION_MAX_MB,
+            'cleanup_interval_minutes': self.CLEANUP_INTERVAL_MINUTES,
+            'guest_session_store': self.GUEST_SESSION_STORE,
+            'quota_store': self.QUOTA_STORE,
+            'context_cache_store': self.CONTEXT_CACHE_STORE
         }
 
 
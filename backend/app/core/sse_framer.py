@@ -0,0 +1,186 @@
+"""
+SSE Framer - coalesced chunk frames for the chat stream
+The engine yields one delta per model token; framing each one as its own
+`data:` frame (plus a json.dumps of a fresh dict) costs more in headers,
+syscalls and CPU than the text itself. SSEFramer buffers deltas and emits
+one chunk frame per SSE_COALESCE_MS window or SSE_COALESCE_MAX_BYTES of
+text, whichever comes first. The first delta goes out immediately so time
+to first token is unchanged.
+
+Chunk frames are built from a pre-serialized template - only the text is
+escaped - and non-ASCII stays raw UTF-8 (an Arabic letter is 2 bytes
+instead of a 6-byte \\uXXXX escape). The frame shape is unchanged:
+{"type": "chunk", "content": ..., "chunk_id": n}.
+
+`coalesce()` wraps the engine stream so a buffered window is flushed when it
+expires even if the model stalls before the next delta.
+"""
+
+import os
+import json
+import time
+import asyncio
+from json.encoder import encode_basestring
+from threading import Lock
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, TypeVar
+
+from app.core.tracing import emit
+
+T = TypeVar("T")
+
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "40"))
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "2048"))
+
+_CHUNK_FRAME = 'data: {"type": "chunk", "content": %s, "chunk_id": %d}\n\n'
+DONE_FRAME = "data: [DONE]\n\n"
+
+
+class StreamTotals:
+    """Frames and bytes sent by every stream in this process"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.counters = {"streams": 0, "frames": 0, "chunk_frames": 0, "deltas": 0, "bytes": 0}
+
+    def add(self, stats: Dict[str, int]) -> None:
+        with self._lock:
+            self.counters["streams"] += 1
+            for name in ("frames", "chunk_frames", "deltas", "bytes"):
+                self.counters[name] += stats[name]
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+
+stream_totals = StreamTotals()
+
+
+class SSEFramer:
+    """Frames one response stream and counts what it sent"""
+
+    def __init__(
+        self,
+        window_ms: float = SSE_COALESCE_MS,
+        max_bytes: int = SSE_COALESCE_MAX_BYTES,
+        clock: Callable[[], float] = time.perf_counter
+    ):
+        self.window = window_ms / 1000
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._since: Optional[float] = None
+        self.frames = 0
+        self.chunk_frames = 0
+        self.deltas = 0
+        self.bytes = 0
+
+    def event(self, payload: Dict[str, Any]) -> str:
+        """Any non-chunk frame (metadata, side-channel events, complete, error)"""
+        return self._count(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n")
+
+    def done(self) -> str:
+        return self._count(DONE_FRAME)
+
+    def add(self, delta: str) -> Optional[str]:
+        """Buffer a delta; returns a chunk frame when the window or byte budget is reached"""
+        self.deltas += 1
+        self._buffer.append(delta)
+        self._buffered_bytes += len(delta.encode("utf-8"))
+        now = self._clock()
+        if self._since is None:
+            self._since = now
+        if (
+            self.chunk_frames == 0
+            or self._buffered_bytes >= self.max_bytes
+            or now - self._since >= self.window
+        ):
+            return self.flush()
+        return None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the buffered window is due (None when nothing is buffered)"""
+        if self._since is None:
+            return None
+        return max(0.0, self._since + self.window - self._clock())
+
+    def flush(self) -> Optional[str]:
+        """Chunk frame for everything buffered (None if empty)"""
+        if not self._buffer:
+            return None
+        text = "".join(self._buffer)
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        self._since = None
+        self.chunk_frames += 1
+        return self._count(_CHUNK_FRAME % (encode_basestring(text), self.chunk_frames))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "frames": self.frames,
+            "chunk_frames": self.chunk_frames,
+            "deltas": self.deltas,
+            "bytes": self.bytes,
+        }
+
+    def _count(self, frame: str) -> str:
+        self.frames += 1
+        self.bytes += len(frame.encode("utf-8"))
+        return frame
+
+
+async def coalesce(source: AsyncIterator[T], framer: SSEFramer) -> AsyncIterator[Optional[T]]:
+    """
+    Items of `source`, plus None whenever the framer's buffered window expires
+    before the next item arrives (the caller then yields `framer.flush()`)
+
+    With nothing buffered the source is awaited directly; otherwise the next
+    item is awaited in a task bounded by the window.
+    """
+    iterator = source.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            timeout = framer.remaining()
+            if pending is None and timeout is None:
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                yield item
+                continue
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                yield None
+                continue
+            finished, pending = pending, None
+            try:
+                item = finished.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        # Closing early stops the source too (the engine closes its provider stream)
+        if pending is not None:
+            pending.cancel()
+        else:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose:
+                await aclose()
+
+
+def render_prometheus(totals: Dict[str, int]) -> str:
+    """Stream framing counters in Prometheus text format"""
+    return "".join([
+        emit("legal_chat_sse_streams_total", "counter", "Chat streams framed", [({}, totals["streams"])]),
+        emit("legal_chat_sse_frames_total", "counter", "SSE frames sent, by kind", [
+            ({"kind": "chunk"}, totals["chunk_frames"]),
+            ({"kind": "other"}, totals["frames"] - totals["chunk_frames"]),
+        ]),
+        emit("legal_chat_sse_deltas_total", "counter",
+             "Model deltas coalesced into chunk frames", [({}, totals["deltas"])]),
+        emit("legal_chat_sse_bytes_total", "counter", "SSE bytes sent (UTF-8)", [({}, totals["bytes"])]),
+    ])
@@ -0,0 +1,117 @@
+"""
+Stream Cancellation - stop generating when the SSE client goes away
+A closed tab used to leave the answer running to the end: the provider kept
+generating (up to max_tokens), the gateway slot stayed busy and the full
+message was written anyway. DisconnectWatch polls Starlette's
+`request.is_disconnected()` from the stream loop (throttled); the stream then
+closes the engine generator, which closes the provider HTTP stream.
+Starlette also cancels the response task on disconnect; both paths end in
+the same place.
+
+CancellationStats counts cancelled streams and estimates what stopping
+early saved: tokens against the running average answer length, seconds at
+the running average generation rate.
+"""
+
+import os
+import time
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.llm_gateway import CHARS_PER_TOKEN
+from app.core.tracing import emit
+
+DISCONNECT_POLL_MS = float(os.getenv("DISCONNECT_POLL_MS", "250"))
+
+# Priors until completed answers have been observed
+EXPECTED_ANSWER_CHARS = float(os.getenv("EXPECTED_ANSWER_CHARS", "4000"))
+EXPECTED_CHARS_PER_SECOND = float(os.getenv("EXPECTED_CHARS_PER_SECOND", "120"))
+EWMA_ALPHA = 0.1
+
+
+class DisconnectWatch:
+    """Throttled `is_disconnected()` checks for one stream"""
+
+    def __init__(
+        self,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+        interval_ms: float = DISCONNECT_POLL_MS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self._is_disconnected = is_disconnected
+        self.interval = interval_ms / 1000
+        self._clock = clock
+        self._next_check = 0.0
+        self.disconnected = False
+
+    async def gone(self) -> bool:
+        """True once the client has disconnected (polls at most once per interval)"""
+        if self.disconnected or self._is_disconnected is None:
+            return self.disconnected
+        now = self._clock()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.interval
+        self.disconnected = await self._is_disconnected()
+        return self.disconnected
+
+
+class CancellationStats:
+    """Cancelled streams and the generation they avoided, per process"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.answer_chars = EXPECTED_ANSWER_CHARS
+        self.chars_per_second = EXPECTED_CHARS_PER_SECOND
+        self.counters = {
+            "completed": 0,
+            "cancelled": 0,
+            "generated_tokens": 0,
+            "tokens_saved": 0,
+            "seconds_saved": 0.0,
+        }
+
+    def record_completed(self, chars: int, generation_seconds: float) -> None:
+        """A finished answer updates the averages the estimates use"""
+        with self._lock:
+            self.counters["completed"] += 1
+            self.answer_chars += EWMA_ALPHA * (chars - self.answer_chars)
+            if chars and generation_seconds > 0:
+                rate = chars / generation_seconds
+                self.chars_per_second += EWMA_ALPHA * (rate - self.chars_per_second)
+
+    def record_cancelled(self, chars: int) -> Dict[str, float]:
+        """Count a stream stopped after `chars` of answer; returns the estimated savings"""
+        with self._lock:
+            remaining_chars = max(0.0, self.answer_chars - chars)
+            saved = {
+                "tokens": int(remaining_chars / CHARS_PER_TOKEN),
+                "seconds": remaining_chars / self.chars_per_second,
+            }
+            self.counters["cancelled"] += 1
+            self.counters["generated_tokens"] += int(chars / CHARS_PER_TOKEN)
+            self.counters["tokens_saved"] += saved["tokens"]
+            self.counters["seconds_saved"] += saved["seconds"]
+        return saved
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.counters)
+
+
+cancellation_stats = CancellationStats()
+
+
+def render_prometheus(stats: Dict[str, float]) -> str:
+    """Cancellation counters in Prometheus text format"""
+    return "".join([
+        emit("legal_chat_streams_cancelled_total", "counter",
+             "Answer streams stopped because the client disconnected", [({}, stats["cancelled"])]),
+        emit("legal_chat_cancelled_tokens_total", "counter",
+             "Completion tokens, by what happened to them in cancelled streams", [
+                 ({"kind": "generated"}, stats["generated_tokens"]),
+                 ({"kind": "saved_estimate"}, stats["tokens_saved"]),
+             ]),
+        emit("legal_chat_cancelled_seconds_saved_total", "counter",
+             "Estimated generation time avoided by cancelling", [({}, f'{stats["seconds_saved"]:.3f}')]),
+    ])
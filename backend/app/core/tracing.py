@@ -0,0 +1,237 @@
+"""
+Lightweight Tracing - per-stage spans and latency histograms
+`span("stage")` times a block with the monotonic clock, records it in the
+current request's trace (a ContextVar, so it follows asyncio tasks created
+while the request runs) and feeds an in-process histogram per stage. The
+histograms are exported in Prometheus text format and summarized as
+p50/p95/p99.
+"""
+
+import time
+import bisect
+import asyncio
+import logging
+from collections import deque
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bucket upper bounds in seconds (LLM stages run into tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Recent samples kept per stage for quantiles
+QUANTILE_WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Event loop lag probe period
+EVENT_LOOP_PROBE_INTERVAL = 0.1
+
+METRIC_NAME = "legal_chat_stage_duration_seconds"
+QUANTILE_METRIC_NAME = "legal_chat_stage_latency_seconds"
+
+
+class StageHistogram:
+    """Cumulative Prometheus buckets plus a sliding window for quantiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window: int = QUANTILE_WINDOW):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """Stage name -> histogram (thread-safe; sync stages run in worker threads)"""
+
+    def __init__(self):
+        self._stages: Dict[str, StageHistogram] = {}
+        self._lock = Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = StageHistogram()
+            histogram.observe(seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage count, mean and p50/p95/p99 in milliseconds"""
+        with self._lock:
+            stages = dict(self._stages)
+        result = {}
+        for stage, histogram in sorted(stages.items()):
+            result[stage] = {
+                "count": histogram.count,
+                "mean_ms": round(histogram.total / histogram.count * 1000, 2) if histogram.count else None,
+                **{
+                    f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 2) if histogram.recent else None
+                    for q in QUANTILES
+                }
+            }
+        return result
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition (version 0.0.4)"""
+        with self._lock:
+            stages = sorted(self._stages.items())
+
+        lines = [
+            f"# HELP {METRIC_NAME} Chat pipeline stage duration",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for stage, histogram in stages:
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+
+        lines += [
+            f"# HELP {QUANTILE_METRIC_NAME} Chat pipeline stage latency over the last {QUANTILE_WINDOW} samples",
+            f"# TYPE {QUANTILE_METRIC_NAME} summary",
+        ]
+        for stage, histogram in stages:
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                if value is not None:
+                    lines.append(f'{QUANTILE_METRIC_NAME}{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{QUANTILE_METRIC_NAME}_sum{{stage="{stage}"}} {histogram.total:.6f}')
+            lines.append(f'{QUANTILE_METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+def _label_value(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def emit(name: str, metric_type: str, help_text: str, samples: Iterable[Tuple[Dict[str, Any], Any]]) -> str:
+    """
+    One metric family in Prometheus text format: HELP and TYPE lines, then a
+    line per (labels, value) sample. Values are written as given.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        label_text = ",".join(f'{key}="{_label_value(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if labels else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class Trace:
+    """Spans recorded for one request, with offsets from the request start"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def record(self, stage: str, started: float, duration: float, attributes: Dict[str, Any]) -> None:
+        self.spans.append({
+            "stage": stage,
+            "start_ms": round((started - self.started) * 1000, 2),
+            "duration_ms": round(duration * 1000, 2),
+            **({"attributes": attributes} if attributes else {})
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"])
+        }
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace(name: str) -> Trace:
+    """Begin a request trace; spans in this context (and tasks it spawns) join it"""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def observe(stage: str, seconds: float, started: Optional[float] = None, **attributes: Any) -> None:
+    """Record an already measured duration (e.g. time to first token)"""
+    metrics.observe(stage, seconds)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.record(stage, started if started is not None else time.perf_counter() - seconds, seconds, attributes)
+
+
+class span:
+    """
+    Time a block: `with span("retrieval"):` or `async with span("classification"):`
+
+    Only the trace lives in a ContextVar; spans themselves hold no context
+    tokens, so they are safe around `yield` in async generators.
+    """
+
+    def __init__(self, stage: str, **attributes: Any):
+        self.stage = stage
+        self.attributes = attributes
+        self.started = 0.0
+
+    def set(self, **attributes: Any) -> None:
+        """Attach attributes discovered inside the block (counts, cache hits...)"""
+        self.attributes.update(attributes)
+
+    def start(self) -> "span":
+        """Begin timing (for stages that do not fit a `with` block)"""
+        self.started = time.perf_counter()
+        return self
+
+    def end(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+        observe(self.stage, time.perf_counter() - self.started, self.started, **self.attributes)
+
+    def __enter__(self) -> "span":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        self.end()
+
+    async def __aenter__(self) -> "span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        self.__exit__(exc_type, exc, tb)
+
+
+async def monitor_event_loop_lag(interval: float = EVENT_LOOP_PROBE_INTERVAL) -> None:
+    """
+    Record how late the loop wakes a sleeping task as the `event_loop_lag` stage
+    Anything blocking the loop (sync DB calls, CPU work) shows up here.
+    """
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        metrics.observe("event_loop_lag", max(0.0, time.perf_counter() - started - interval))
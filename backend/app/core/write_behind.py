@@ -0,0 +1,187 @@
+"""
+Write-Behind Queue - batched background persistence
+The stream's `complete` frame should not wait for the database. Callers
+enqueue an item and get a future back; a worker task collects items for up
+to WRITE_BEHIND_MAX_DELAY_MS (or WRITE_BEHIND_BATCH_SIZE of them) and hands
+each batch to a synchronous `writer` in one run_db call, so one transaction
+covers many writes. Failed batches are retried with backoff; a batch that
+keeps failing is appended to a dead-letter JSONL file instead of being
+dropped. `close()` drains the queue on shutdown, and `settle(key)` lets a
+reader wait for the writes it depends on (the next turn of a conversation;
+`settle_all()` for the conversation list).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core.db_executor import run_db
+from app.core.tracing import emit, observe
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "50"))
+WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "20"))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+WRITE_BEHIND_DEAD_LETTER = os.getenv("WRITE_BEHIND_DEAD_LETTER", "data/write_behind_failed.jsonl")
+
+
+@dataclass
+class _Pending:
+    item: Any
+    key: Optional[str]
+    future: asyncio.Future
+
+
+class WriteBehindQueue:
+    """Batches items for a synchronous `writer(items)` that persists them in one transaction"""
+
+    def __init__(
+        self,
+        writer: Callable[[List[Any]], None],
+        name: str,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        max_delay: float = WRITE_BEHIND_MAX_DELAY_MS / 1000,
+        max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+        retry_delay: float = 0.1,
+        dead_letter_path: Optional[str] = WRITE_BEHIND_DEAD_LETTER
+    ):
+        self.writer = writer
+        self.name = name
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.dead_letter_path = dead_letter_path
+        self._pending: List[_Pending] = []
+        self._latest: Dict[str, asyncio.Future] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+        self.counters = {"enqueued": 0, "written": 0, "batches": 0, "retries": 0, "dead_lettered": 0}
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, item: Any, key: Optional[str] = None) -> asyncio.Future:
+        """Queue one item; the future resolves to True once written (False if dead-lettered)"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._pending.append(_Pending(item, key, future))
+        if key is not None:
+            self._latest[key] = future
+        self.counters["enqueued"] += 1
+        self._wakeup.set()
+        return future
+
+    async def settle(self, key: str) -> bool:
+        """Wait until everything queued under `key` so far has been written"""
+        future = self._latest.get(key)
+        if future is None:
+            return True
+        return await asyncio.shield(future)
+
+    async def settle_all(self) -> None:
+        """Wait until everything queued so far has been written"""
+        pending = [future for future in self._latest.values() if not future.done()]
+        pending += [p.future for p in self._pending if p.key is None]
+        if pending:
+            await asyncio.shield(asyncio.gather(*pending))
+
+    async def close(self) -> None:
+        """Write everything still queued, then stop the worker"""
+        if self._worker is None or self._worker.done():
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await self._worker
+        finally:
+            self._closing = False
+            self._worker = None
+        logger.info(f"💾 Write-behind queue '{self.name}' drained ({self.counters['written']} written)")
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._closing and len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.max_delay)  # let a batch form
+            while self._pending:
+                batch = self._pending[:self.batch_size]
+                del self._pending[:self.batch_size]
+                await self._write(batch)
+            if self._closing:
+                return
+
+    async def _write(self, batch: List[_Pending]) -> None:
+        items = [pending.item for pending in batch]
+        written = False
+        for attempt in range(1, self.max_attempts + 1):
+            started = time.perf_counter()
+            try:
+                await run_db(self.writer, items)
+                observe("write_behind_batch", time.perf_counter() - started, started, queue=self.name, size=len(items))
+                written = True
+                break
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    logger.error(f"❌ Write-behind '{self.name}' gave up on {len(items)} items: {e}")
+                    self._dead_letter(items, e)
+                    break
+                self.counters["retries"] += 1
+                logger.warning(f"⚠️ Write-behind '{self.name}' attempt {attempt} failed, retrying: {e}")
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+
+        if written:
+            self.counters["written"] += len(items)
+            self.counters["batches"] += 1
+        for pending in batch:
+            if not pending.future.done():
+                pending.future.set_result(written)
+            if pending.key is not None and self._latest.get(pending.key) is pending.future:
+                del self._latest[pending.key]
+
+    def _dead_letter(self, items: List[Any], error: Exception) -> None:
+        self.counters["dead_lettered"] += len(items)
+        if not self.dead_letter_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+            with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                for item in items:
+                    f.write(json.dumps({
+                        "queue": self.name,
+                        "failed_at": datetime.utcnow().isoformat(),
+                        "error": str(error),
+                        "item": item
+                    }, ensure_ascii=False, default=str) + "\n")
+        except OSError as e:
+            logger.error(f"❌ Could not write dead letters for '{self.name}': {e}")
+
+
+def render_prometheus(queues: List[WriteBehindQueue]) -> str:
+    """Queue depth and write counters in Prometheus text format"""
+    return "".join([
+        emit("legal_chat_write_behind_depth", "gauge", "Items waiting to be written",
+             [({"queue": queue.name}, queue.depth) for queue in queues]),
+        emit("legal_chat_write_behind_items_total", "counter", "Write-behind items by outcome", [
+            ({"queue": queue.name, "outcome": outcome}, queue.counters[outcome])
+            for queue in queues
+            for outcome in ("enqueued", "written", "dead_lettered")
+        ]),
+    ])
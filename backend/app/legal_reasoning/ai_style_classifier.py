@@ -152,7 +152,8 @@ class AIStyleClassifier:
         
         return styled_documents
     
-    def get_style_for_intent(self, intent: str) -> str:
+    @staticmethod
+    def get_style_for_intent(intent: str) -> str:
         """
         Map user intent to desired document style
         
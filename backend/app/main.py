@@ -11,8 +11,9 @@ load_dotenv()
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from datetime import datetime
+import asyncio
 import os
 from app.models import User, Consultation, Conversation, Message
 # Import routers
@@ -21,10 +22,19 @@ from app.api.google_auth import router as google_auth_router
 from app.api.chat import router as chat_router
 from app.api.export import router as export_router
 from app.api.ocr import router as ocr_router
+from app.api.statutes import router as statutes_router
 
 # Initialize database tables
 from app.database import engine, Base
 from app.core.config import settings
+from app.core.tracing import metrics, monitor_event_loop_lag
+from app.core.session_config import session_config
+from app.core.quota_engine import get_quota_engine
+from app.services.guest_service import GuestService
+from app.storage import session_store
+from app.core import write_behind, sse_framer, stream_cancellation
+from app.services.chat_service import message_queue
+from app.services import context_cache
 Base.metadata.create_all(bind=engine)
 print("✅ Database tables created!")
 
@@ -78,6 +88,54 @@ app.include_router(google_auth_router, prefix="/api/auth")
 app.include_router(chat_router, prefix="/api")
 app.include_router(export_router, prefix="/export")
 app.include_router(ocr_router, prefix="/api")
+app.include_router(statutes_router, prefix="/api")
+
+_background_tasks = []
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    """Event loop lag probe (`event_loop_lag` stage in /metrics), guest session and quota sweepers"""
+    _background_tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+    _background_tasks.append(asyncio.create_task(session_store.run_sweeper(
+        GuestService.store, session_config.CLEANUP_INTERVAL_MINUTES * 60
+    )))
+    _background_tasks.append(asyncio.create_task(session_store.run_sweeper(
+        get_quota_engine(), session_config.CLEANUP_INTERVAL_MINUTES * 60, label="quota counters"
+    )))
+
+
+@app.on_event("shutdown")
+async def flush_write_behind():
+    """Write assistant messages still queued behind finished streams"""
+    await message_queue.close()
+
+
+# Per-stage latency histograms (Prometheus text format)
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Chat pipeline stage histograms for Prometheus scraping"""
+    body = (
+        metrics.render_prometheus()
+        + session_store.render_prometheus(GuestService.store_stats())
+        + write_behind.render_prometheus([message_queue])
+        + context_cache.render_prometheus(context_cache.context_cache.stats())
+        + sse_framer.render_prometheus(sse_framer.stream_totals.snapshot())
+        + stream_cancellation.render_prometheus(stream_cancellation.cancellation_stats.snapshot())
+    )
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/summary")
+async def metrics_summary():
+    """p50/p95/p99 per chat pipeline stage, in milliseconds"""
+    return metrics.summary()
+
+
+@app.get("/metrics/sessions")
+async def session_metrics():
+    """Guest session store: sessions, bytes held, evictions by reason"""
+    return GuestService.store_stats()
 
 # 🔥 LEGACY API REDIRECT - Graceful transition
 @app.post("/api/ask")
@@ -157,6 +215,24 @@ async def health_check():
         ]
     }
 
+@app.get("/health/llm")
+async def llm_health():
+    """LLM gateway metrics: per-model calls, retries, throttling, latency and tokens"""
+    from rag_engine import get_rag_engine
+    engine = get_rag_engine()
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "routing": engine.provider_router.get_status(),
+        "coalescing": {
+            **engine.coalescer.get_stats(),
+            "shared_classifications": engine.single_flight.shared
+        },
+        "models": {
+            provider.name: provider.gateway.get_metrics()
+            for provider in engine.provider_router.providers
+        }
+    }
+
 # 🚨 Remove all legacy imports and endpoints
 # - No more simple_consultations router
 # - No more dual API system
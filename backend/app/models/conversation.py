@@ -3,8 +3,9 @@ Conversation model for chat history functionality.
 Following WhatsApp/ChatGPT conversation patterns.
 """
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, Boolean, func
+from sqlalchemy import Column, String, Text, Integer, DateTime, ForeignKey, Boolean, Index, false, func
 from sqlalchemy.orm import relationship
+from datetime import datetime
 import uuid
 
 from app.database import Base
@@ -17,6 +18,10 @@ class Conversation(Base):
     """
     
     __tablename__ = "conversations"
+    __table_args__ = (
+        # Conversation list: a user's active conversations, newest first
+        Index("ix_conversations_user_active_updated", "user_id", "is_active", "updated_at"),
+    )
     
     # Primary identifiers
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
@@ -26,9 +31,20 @@ class Conversation(Base):
     title = Column(String(200), nullable=True)  # Auto-generated from first message
     is_active = Column(Boolean, default=True, nullable=False)  # For archiving
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    # Rolling summary of older turns (keeps AI prompt size bounded)
+    context_summary = Column(Text, nullable=True)
+    summarized_message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # Listing data maintained by ChatService.add_message (no per-row message queries)
+    last_message_preview = Column(Text, nullable=True)
+    message_count = Column(Integer, default=0, server_default="0", nullable=False)
+    
+    # Timestamps (set in Python so every row has the same precision - list cursors compare them)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(),
+        onupdate=datetime.utcnow, nullable=False
+    )
     
     # Relationships
     user = relationship("User", back_populates="conversations")
@@ -45,6 +61,10 @@ class Message(Base):
     """
     
     __tablename__ = "messages"
+    __table_args__ = (
+        # Context window, message pages and summaries: one conversation in time order
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+    )
     
     # Primary identifiers
     id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
@@ -58,9 +78,10 @@ class Message(Base):
     confidence_score = Column(String(10), nullable=True)  # "high", "medium", "low"
     processing_time_ms = Column(String(10), nullable=True)
     sources = Column(Text, nullable=True)  # JSON string for now
+    is_truncated = Column(Boolean, default=False, server_default=false(), nullable=False)  # Client left mid-answer
     
-    # Timestamps
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Timestamps (set in Python - message cursors compare them, see Conversation)
+    created_at = Column(DateTime(timezone=True), default=datetime.utcnow, server_default=func.now(), nullable=False)
     
     # Relationships
     conversation = relationship("Conversation", back_populates="messages")
@@ -0,0 +1,108 @@
+"""
+Adaptive top_k - score-gap / elbow cutoff over ranked similarities
+Instead of a fixed number of chunks per category, retrieval keeps the ranked
+candidates up to the first clear drop in similarity, bounded by a per-category
+minimum and maximum. A question with one clearly relevant article carries one
+or two chunks into the prompt instead of fifteen.
+"""
+
+import logging
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# (min, max) chunks per intent category
+CATEGORY_TOP_K = {
+    "ACTIVE_DISPUTE": (3, 25),
+    "PLANNING_ACTION": (2, 20),
+    "GENERAL_QUESTION": (1, 15),
+}
+DEFAULT_TOP_K = (1, 15)
+
+# A gap counts when it is at least this large in absolute cosine terms...
+MIN_GAP = 0.02
+# ...and this many times the median gap of the window
+GAP_FACTOR = 3.0
+# Minimum normalized distance from the chord for an elbow to count
+MIN_ELBOW = 0.15
+
+
+@dataclass
+class CutoffStats:
+    """Why retrieval kept the number of chunks it did"""
+    category: str
+    candidates: int
+    kept: int
+    min_k: int
+    max_k: int
+    reason: str  # gap | elbow | max | all
+    top_score: Optional[float] = None
+    cutoff_score: Optional[float] = None
+    gap: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def category_limits(category: Optional[str]) -> Tuple[int, int]:
+    """(min, max) chunks for an intent category"""
+    return CATEGORY_TOP_K.get(category or "", DEFAULT_TOP_K)
+
+
+def adaptive_cutoff(scores: Sequence[float], min_k: int, max_k: int, category: str = "") -> Tuple[int, CutoffStats]:
+    """
+    Number of leading candidates to keep from similarity scores sorted best first
+
+    1. Largest gap between neighbours inside [min_k, max_k], if it stands out.
+    2. Otherwise the elbow (point furthest from the first-last chord).
+    3. Otherwise everything up to max_k.
+    """
+    values = np.asarray(scores, dtype=np.float64)[:max_k]
+    count = int(values.size)
+    min_k = max(1, min(min_k, count))
+    stats = CutoffStats(category=category, candidates=len(scores), kept=count, min_k=min_k, max_k=max_k, reason="all")
+    if count == 0:
+        stats.kept = 0
+        return 0, stats
+
+    stats.top_score = round(float(values[0]), 4)
+    if count <= min_k:
+        stats.cutoff_score = round(float(values[count - 1]), 4)
+        return count, stats
+
+    # Gap i sits between candidate i and i + 1; cutting there keeps i + 1 candidates
+    gaps = values[:-1] - values[1:]
+    window = gaps[min_k - 1:]
+    best = int(np.argmax(window))
+    largest = float(window[best])
+    if largest >= MIN_GAP and largest >= GAP_FACTOR * float(np.median(gaps)):
+        kept = min_k + best
+        stats.reason, stats.gap = "gap", round(largest, 4)
+    else:
+        kept = _elbow(values, min_k)
+        stats.reason = "elbow" if kept < count else ("max" if len(scores) > max_k else "all")
+
+    stats.kept = kept
+    stats.cutoff_score = round(float(values[kept - 1]), 4)
+    return kept, stats
+
+
+def _elbow(values: np.ndarray, min_k: int) -> int:
+    """Kneedle-style elbow on the descending curve; len(values) when there is none"""
+    count = values.size
+    spread = float(values[0] - values[-1])
+    if count < 3 or spread <= 1e-9:
+        return count
+
+    x = np.linspace(0.0, 1.0, count)
+    y = (values - values[-1]) / spread
+    # Chord from (0, 1) to (1, 0); points well below it mark the bend
+    distance = (1.0 - x) - y
+    distance[:min_k - 1] = -np.inf
+    knee = int(np.argmax(distance))
+    if distance[knee] < MIN_ELBOW:
+        return count
+    return max(min_k, knee + 1)
@@ -0,0 +1,224 @@
+"""
+Statute Article Index - direct "المادة N من نظام X" resolution
+Maps normalized law title -> article number -> (chunk id, character span),
+built from the article spans SmartLegalChunker records at ingestion. Explicit
+article references are answered with a dictionary lookup instead of
+classification, embedding and vector search.
+"""
+
+import re
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.request_coalescer import LETTER_VARIANTS, normalize_query
+
+logger = logging.getLogger(__name__)
+
+ARABIC_INDIC_DIGITS = str.maketrans('٠١٢٣٤٥٦٧٨٩', '0123456789')
+
+# Feminine ordinals used for article numbers (المادة الأولى ... التاسعة والتسعون)
+ORDINAL_UNITS = {
+    'الأولى': 1, 'الاولى': 1, 'الحادية': 1, 'الثانية': 2, 'الثالثة': 3, 'الرابعة': 4,
+    'الخامسة': 5, 'السادسة': 6, 'السابعة': 7, 'الثامنة': 8, 'التاسعة': 9, 'العاشرة': 10,
+}
+ORDINAL_TENS = {
+    'العشرون': 20, 'الثلاثون': 30, 'الأربعون': 40, 'الاربعون': 40, 'الخمسون': 50,
+    'الستون': 60, 'السبعون': 70, 'الثمانون': 80, 'التسعون': 90,
+}
+HUNDREDS = {'بعد المائة': 100, 'بعد المئة': 100, 'بعد المائتين': 200, 'بعد المئتين': 200}
+
+# Users often type ه for ة and ا for أ; accept both spellings
+ORDINAL_UNITS.update({word.translate(LETTER_VARIANTS): value for word, value in list(ORDINAL_UNITS.items())})
+ORDINAL_TENS.update({word.translate(LETTER_VARIANTS): value for word, value in list(ORDINAL_TENS.items())})
+HUNDREDS.update({phrase.translate(LETTER_VARIANTS): value for phrase, value in list(HUNDREDS.items())})
+
+_ORDINAL_WORD = '|'.join(sorted(list(ORDINAL_UNITS) + list(ORDINAL_TENS), key=len, reverse=True))
+ARTICLE_NUMBER = (
+    r'(?:\(\s*[0-9٠-٩]+\s*\)|[0-9٠-٩]+|'
+    rf'(?:{_ORDINAL_WORD})(?:\s*(?:عشرة|عشره|و(?:{_ORDINAL_WORD})))?'
+    r'(?:\s*بعد\s*(?:المائة|المئة|المائتين|المئتين|المائه|المئه))?)'
+)
+
+# "المادة 77 من نظام العمل" / "ما نص المادة السابعة والسبعون من نظام العمل؟"
+ARTICLE_REFERENCE_PATTERN = re.compile(
+    rf'(?:ال)?مادة\s*(?:رقم\s*)?(?P<number>{ARTICLE_NUMBER})\s*(?:من\s+)?'
+    r'(?P<law>(?:ال)?(?:نظام|لائحة|اللائحة|قانون)[^؟?\n.،,]*)'
+)
+
+# An article heading at the start of a line ("المادة الأولى:" / "المادة (12)")
+ARTICLE_HEADING_PATTERN = re.compile(rf'^[ \t]*المادة\s*(?P<number>{ARTICLE_NUMBER})', re.MULTILINE)
+
+# Words that do not help identify a law
+LAW_TITLE_STOPWORDS = {'السعودي', 'السعوديه', 'في', 'المملكه', 'العربيه', 'الجديد', 'الصادر'}
+
+# Phrasing that only asks for the article itself ("ما نص المادة ...؟", "اذكر المادة ...")
+LOOKUP_WORDS = {normalize_query(word) for word in (
+    'ما', 'هو', 'هي', 'نص', 'اذكر', 'اعرض', 'ماذا', 'تقول', 'تنص', 'عليه', 'اريد', 'ابي', 'اعطني',
+    'وش', 'ايش', 'عن', 'لي', 'من', 'رقم',
+)}
+
+
+@dataclass
+class ArticleReference:
+    """An explicit article reference parsed from a question"""
+    article_number: int
+    law_name: str
+    remainder: str = ''  # question text around the reference
+
+
+@dataclass
+class ArticleLocation:
+    """Where an article lives: chunk id plus character span inside the chunk"""
+    law_title: str
+    article_number: int
+    chunk_id: str
+    start: int
+    end: int
+
+
+def parse_article_number(text: str) -> Optional[int]:
+    """Article number from digits ("77", "(77)", "٧٧") or Arabic ordinals ("السابعة والسبعون")"""
+    if not text:
+        return None
+
+    digits = re.search(r'[0-9٠-٩]+', text)
+    if digits:
+        return int(digits.group(0).translate(ARABIC_INDIC_DIGITS))
+
+    text = re.sub(r'\s+', ' ', text).strip()
+    number = 0
+    for phrase, value in HUNDREDS.items():
+        if phrase in text:
+            number += value
+            text = text.replace(phrase, '')
+            break
+
+    units = tens = 0
+    teen = False
+    for word in text.split():
+        if word.startswith('و') and word[1:] in ORDINAL_TENS:
+            word = word[1:]
+        if word in ORDINAL_UNITS and not units:
+            units = ORDINAL_UNITS[word]
+        elif word in ORDINAL_TENS:
+            tens = ORDINAL_TENS[word]
+        elif word in ('عشرة', 'عشره'):
+            teen = True
+
+    if teen:
+        units += 10
+    if not units and not tens:
+        return number or None
+    return number + units + tens
+
+
+def normalize_law_title(title: str) -> str:
+    """Lookup key for a law title: normalized letters, no punctuation, no filler words"""
+    title = re.split(r'\s+-\s+', title or '', maxsplit=1)[0]  # drop chunk context suffixes
+    words = [word for word in normalize_query(title).split() if word not in LAW_TITLE_STOPWORDS]
+    return ' '.join(words)
+
+
+def parse_article_reference(query: str) -> Optional[ArticleReference]:
+    """Detect an explicit "المادة N من نظام X" reference in a question"""
+    match = ARTICLE_REFERENCE_PATTERN.search(query or '')
+    if not match:
+        return None
+
+    number = parse_article_number(match.group('number'))
+    law_name = match.group('law').strip()
+    if not number or not normalize_law_title(law_name):
+        return None
+    remainder = f"{query[:match.start()]} {query[match.end():]}".strip()
+    return ArticleReference(article_number=number, law_name=law_name, remainder=remainder)
+
+
+def parse_article_heading(text: str) -> Optional[int]:
+    """Article number from a heading at the start of the text ("المادة الثالثة بعد المائة: ...")"""
+    match = ARTICLE_HEADING_PATTERN.match(text or '')
+    return parse_article_number(match.group('number')) if match else None
+
+
+def find_article_spans(content: str) -> List[Dict[str, int]]:
+    """Article spans from headings, for text stored without passing through the chunker"""
+    headings = [
+        (match.start(), parse_article_number(match.group('number')))
+        for match in ARTICLE_HEADING_PATTERN.finditer(content or '')
+    ]
+
+    spans = []
+    for i, (start, number) in enumerate(headings):
+        if not number:
+            continue
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(content)
+        end = start + len(content[start:end].rstrip())
+        spans.append({'article_number': number, 'start': start, 'end': end})
+    return spans
+
+
+class ArticleIndex:
+    """In-memory law -> article -> location map, loaded from the article_index table"""
+
+    def __init__(self):
+        self._laws: Dict[str, Dict[int, ArticleLocation]] = {}
+        self.loaded_at: float = 0.0
+
+    def __len__(self) -> int:
+        return sum(len(articles) for articles in self._laws.values())
+
+    @property
+    def law_count(self) -> int:
+        return len(self._laws)
+
+    def add(self, location: ArticleLocation) -> None:
+        articles = self._laws.setdefault(normalize_law_title(location.law_title), {})
+        # First occurrence wins (later matches are usually cross-references or amendments)
+        articles.setdefault(location.article_number, location)
+
+    def load(self, locations: Iterable[ArticleLocation]) -> None:
+        self._laws = {}
+        for location in locations:
+            self.add(location)
+        self.loaded_at = time.monotonic()
+        logger.info(f"📖 Article index loaded: {len(self)} articles across {self.law_count} laws")
+
+    def resolve_law(self, law_name: str) -> Optional[str]:
+        """
+        Exact key first, then the shortest indexed law containing every query word.
+        Trailing words are dropped one at a time ("نظام العمل وما عقوبته") down to two.
+        """
+        key = normalize_law_title(law_name)
+        if key in self._laws:
+            return key
+
+        words = key.split()
+        for size in range(len(words), min(len(words), 2) - 1, -1):
+            wanted = set(words[:size])
+            candidates = [law for law in self._laws if wanted <= set(law.split())]
+            if candidates:
+                return min(candidates, key=len)
+        return None
+
+    def is_pure_lookup(self, reference: ArticleReference) -> bool:
+        """
+        True when the reference is essentially the whole question: nothing but
+        lookup phrasing around it and no words past the resolved law title.
+        "المادة 80 من نظام العمل كيف أرد عليه" asks something else.
+        """
+        law_key = self.resolve_law(reference.law_name)
+        if law_key is None:
+            return False
+        extra = set(normalize_law_title(reference.law_name).split()) - set(law_key.split())
+        extra |= set(normalize_query(reference.remainder).split())
+        return extra <= LOOKUP_WORDS
+
+    def lookup(self, law_name: str, article_number: int) -> Optional[ArticleLocation]:
+        law_key = self.resolve_law(law_name)
+        if law_key is None:
+            return None
+        return self._laws[law_key].get(article_number)
+
+    def laws(self) -> List[Tuple[str, int]]:
+        return [(law, len(articles)) for law, articles in sorted(self._laws.items())]
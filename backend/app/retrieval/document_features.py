@@ -0,0 +1,142 @@
+"""
+Static Document Features - computed once at ingestion
+Document kind (statute / case / memo), authority and writing style are
+properties of the document, not of the query. They are stored alongside the
+chunk so query-time selection is a cheap vectorized combination with the
+similarity score instead of an LLM round-trip.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.retrieval.elite_classifier import EliteLegalClassifier
+
+logger = logging.getLogger(__name__)
+
+STATUTE_TITLE_TERMS = ["نظام", "المادة", "لائحة", "مرسوم", "التعريفات", "قانون", "قرار وزاري"]
+CASE_TITLE_TERMS = ["دفع", "حجة", "رقم"]
+MEMO_TITLE_TERMS = ["مذكرة"]
+
+# Base citation value per kind: statutes are citable, memos and cases are background only
+KIND_CITATION_VALUE = {
+    "statute": 0.95,
+    "case": 0.1,
+    "memo": 0.1,
+    "other": 0.5,
+}
+
+# Style match when the document's style is not the one the intent asks for
+KIND_STYLE_BASELINE = {
+    "statute": 0.2,
+    "case": 0.6,
+    "memo": 0.6,
+    "other": 0.4,
+}
+
+# Composite weights (same balance the LLM scorer was asked to produce)
+SCORE_WEIGHTS = {
+    "relevance": 0.4,
+    "citation_value": 0.3,
+    "style_match": 0.3,
+}
+
+_classifier = EliteLegalClassifier()
+
+
+@dataclass
+class DocumentFeatures:
+    """Query-independent features stored per chunk"""
+    doc_kind: str
+    authority_score: float
+    citation_value: float
+    doc_style: Optional[str] = None
+
+
+def classify_doc_kind(title: str, content_type: str = "unknown") -> str:
+    """Statute / case / memo / other, from title terms first, then the content classifier"""
+    title = (title or "").lower()
+    has_statute_term = any(term in title for term in STATUTE_TITLE_TERMS)
+    has_case_term = any(term in title for term in CASE_TITLE_TERMS)
+
+    if any(term in title for term in MEMO_TITLE_TERMS):
+        return "memo"
+    if has_statute_term and not has_case_term:
+        return "statute"
+    if has_case_term and not has_statute_term:
+        return "case"
+
+    if content_type == "legislation":
+        return "statute"
+    if content_type == "court_ruling":
+        return "case"
+    return "other"
+
+
+def compute_static_features(title: str, content: str) -> DocumentFeatures:
+    """Rule-based features (kind, authority, citation value) - no network calls"""
+    classification = _classifier.classify_content(title or "", (content or "")[:4000])
+    doc_kind = classify_doc_kind(title, classification.content_type)
+
+    authority = float(classification.authority_score)
+    citation_value = KIND_CITATION_VALUE[doc_kind] * (0.5 + 0.5 * authority)
+
+    return DocumentFeatures(
+        doc_kind=doc_kind,
+        authority_score=round(authority, 3),
+        citation_value=round(min(citation_value, 1.0), 3),
+    )
+
+
+def style_match_scores(doc_kinds: Sequence[str], doc_styles: Sequence[Optional[str]], target_style: str) -> np.ndarray:
+    """1.0 for the intent's target style, otherwise the kind's baseline"""
+    baseline = np.array([KIND_STYLE_BASELINE.get(kind, 0.4) for kind in doc_kinds], dtype=np.float32)
+    exact = np.array([style == target_style for style in doc_styles], dtype=bool)
+    return np.where(exact, 1.0, baseline).astype(np.float32)
+
+
+def normalize_similarities(similarities: Sequence[float]) -> np.ndarray:
+    """Min-max scale similarities within the candidate set (cosine scores bunch near the top)"""
+    values = np.asarray(similarities, dtype=np.float32)
+    if values.size == 0:
+        return values
+    spread = float(values.max() - values.min())
+    if spread < 1e-6:
+        return np.ones_like(values)
+    return (values - values.min()) / spread
+
+
+def composite_scores(
+    relevance: np.ndarray,
+    citation_value: np.ndarray,
+    style_match: np.ndarray,
+    weights: Optional[Dict[str, float]] = None
+) -> np.ndarray:
+    """Weighted sum of the three objectives"""
+    weights = weights or SCORE_WEIGHTS
+    return (
+        relevance * weights["relevance"]
+        + citation_value * weights["citation_value"]
+        + style_match * weights["style_match"]
+    )
+
+
+def feature_columns(chunks: List) -> Dict[str, List]:
+    """Per-chunk features, falling back to rule-based features for chunks indexed before they existed"""
+    kinds, citations, styles = [], [], []
+    for chunk in chunks:
+        if chunk.doc_kind is None:
+            features = compute_static_features(chunk.title, chunk.content)
+            chunk.doc_kind = features.doc_kind
+            chunk.authority_score = features.authority_score
+            chunk.citation_value = features.citation_value
+        kinds.append(chunk.doc_kind)
+        citations.append(chunk.citation_value if chunk.citation_value is not None else KIND_CITATION_VALUE["other"])
+        styles.append(chunk.doc_style)
+    return {
+        "doc_kind": kinds,
+        "citation_value": np.asarray(citations, dtype=np.float32),
+        "doc_style": styles,
+    }
@@ -0,0 +1,123 @@
+"""
+Hierarchical Retrieval Index - law/chapter centroids, then chunk vectors
+Chunks are grouped by the law they belong to and the chapter SmartLegalChunker
+placed them in. Stage one scores the small centroid matrix to choose candidate
+groups; stage two scores only the chunk vectors of those groups.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.retrieval.snippet_extractor import normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_GROUPS = 8
+
+GroupKey = Tuple[str, Optional[str]]
+
+
+def group_key(title: str, metadata: Optional[Dict[str, Any]]) -> GroupKey:
+    """(law, chapter) a chunk belongs to, from the chunker's hierarchy metadata"""
+    metadata = metadata or {}
+    law = metadata.get('law_title') or (title or '').split(' - ', 1)[0].strip()
+    structure = metadata.get('legal_structure') or {}
+    return law, structure.get('chapter_context')
+
+
+@dataclass
+class HierarchicalSearchStats:
+    """How much of the corpus each stage looked at"""
+    total_chunks: int = 0
+    groups_scored: int = 0
+    groups_selected: int = 0
+    candidates_scored: int = 0
+    selected_groups: List[GroupKey] = field(default_factory=list)
+
+
+class HierarchicalIndex:
+    """Immutable two-level index over normalized chunk embeddings"""
+
+    def __init__(self, ids: Sequence[str], matrix: np.ndarray, keys: Sequence[GroupKey]):
+        self.ids = list(ids)
+        self.matrix = normalize_rows(np.asarray(matrix, dtype=np.float32)) if len(self.ids) else np.zeros((0, 0), np.float32)
+
+        self.group_keys: List[GroupKey] = []
+        group_of: Dict[GroupKey, int] = {}
+        members: List[List[int]] = []
+        for row, key in enumerate(keys):
+            if key not in group_of:
+                group_of[key] = len(self.group_keys)
+                self.group_keys.append(key)
+                members.append([])
+            members[group_of[key]].append(row)
+        self.group_rows = [np.asarray(rows, dtype=np.int64) for rows in members]
+
+        if self.group_rows:
+            centroids = np.stack([self.matrix[rows].mean(axis=0) for rows in self.group_rows])
+            self.centroids = normalize_rows(centroids)
+        else:
+            self.centroids = np.zeros((0, self.matrix.shape[1] if self.matrix.ndim == 2 else 0), np.float32)
+
+    @classmethod
+    def build(cls, entries: Iterable[Tuple[str, Sequence[float], GroupKey]]) -> "HierarchicalIndex":
+        """Build from (chunk id, embedding, group key) triples"""
+        ids, vectors, keys = [], [], []
+        for chunk_id, embedding, key in entries:
+            if embedding is None or not len(embedding):
+                continue
+            ids.append(chunk_id)
+            vectors.append(embedding)
+            keys.append(key)
+
+        matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), np.float32)
+        index = cls(ids, matrix, keys)
+        logger.info(f"🗂️ Hierarchical index built: {len(ids)} chunks in {len(index.group_keys)} law/chapter groups")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(
+        self,
+        query_vector: Sequence[float],
+        top_k: int,
+        max_groups: int = DEFAULT_MAX_GROUPS
+    ) -> Tuple[List[Tuple[str, float]], HierarchicalSearchStats]:
+        """
+        Best `top_k` (chunk id, cosine similarity) pairs
+
+        Groups are taken in centroid order: the best `max_groups`, plus more
+        while they hold fewer than `top_k` chunks in total.
+        """
+        stats = HierarchicalSearchStats(total_chunks=len(self.ids), groups_scored=len(self.group_keys))
+        if not self.ids or top_k <= 0:
+            return [], stats
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(query))
+        if norm == 0.0:
+            return [], stats
+        query = query / norm
+
+        # Stage 1: law/chapter centroids
+        group_order = np.argsort(-(self.centroids @ query), kind="stable")
+        selected, candidate_count = [], 0
+        for group in group_order:
+            if len(selected) >= max_groups and candidate_count >= top_k:
+                break
+            selected.append(int(group))
+            candidate_count += len(self.group_rows[group])
+
+        # Stage 2: chunk vectors of the selected groups only
+        rows = np.concatenate([self.group_rows[group] for group in selected])
+        scores = self.matrix[rows] @ query
+        best = np.argsort(-scores, kind="stable")[:top_k]
+
+        stats.groups_selected = len(selected)
+        stats.candidates_scored = int(rows.size)
+        stats.selected_groups = [self.group_keys[group] for group in selected]
+        return [(self.ids[rows[i]], float(scores[i])) for i in best], stats
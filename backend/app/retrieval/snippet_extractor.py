@@ -0,0 +1,160 @@
+"""
+Query-Aware Snippet Extraction
+Sentence/article offsets are computed once at ingestion and stored next to each
+chunk together with sentence-level embeddings. At query time the best-matching
+window of a chunk is picked with a single vectorized dot product - no API calls.
+"""
+
+import re
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget per chunk (matches the historical content[:1000] cut)
+DEFAULT_SNIPPET_CHARS = 1000
+
+# Sentence segmentation limits
+MIN_SENTENCE_CHARS = 40
+MAX_SENTENCE_CHARS = 600
+MAX_SENTENCES_PER_CHUNK = 256
+
+# Article headers always start a new unit, sentence punctuation ends one
+ARTICLE_BOUNDARY = re.compile(r'(?=(?:تعديلات\s*)?المادة\s+(?:\(?\s*[\d٠-٩]+|[؀-ۿ]+)[^\n]{0,60}?:)')
+SENTENCE_END = re.compile(r'[.!؟?\n]+')
+
+
+def split_sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """
+    Split legal text into sentence/article spans (character offsets)
+
+    Articles are never merged across their header, tiny fragments are merged
+    with their neighbour and very long sentences are cut on whitespace so a
+    single span always fits inside the snippet budget.
+    """
+    if not text:
+        return []
+
+    # Step 1: Article boundaries
+    starts = sorted({0, *(m.start() for m in ARTICLE_BOUNDARY.finditer(text))})
+    blocks = [(s, e) for s, e in zip(starts, starts[1:] + [len(text)]) if e > s]
+
+    # Step 2: Sentence boundaries inside each article block
+    raw_spans: List[Tuple[int, int]] = []
+    for block_start, block_end in blocks:
+        cursor = block_start
+        for match in SENTENCE_END.finditer(text, block_start, block_end):
+            raw_spans.append((cursor, match.end()))
+            cursor = match.end()
+        if cursor < block_end:
+            raw_spans.append((cursor, block_end))
+
+    # Step 3: Merge tiny fragments, split oversized sentences
+    spans: List[Tuple[int, int]] = []
+    for start, end in raw_spans:
+        if not text[start:end].strip():
+            continue
+        if spans and (spans[-1][1] - spans[-1][0]) < MIN_SENTENCE_CHARS and not ARTICLE_BOUNDARY.match(text, start):
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+
+    bounded: List[Tuple[int, int]] = []
+    for start, end in spans:
+        while end - start > MAX_SENTENCE_CHARS:
+            cut = text.rfind(' ', start + MIN_SENTENCE_CHARS, start + MAX_SENTENCE_CHARS)
+            cut = cut if cut > start else start + MAX_SENTENCE_CHARS
+            bounded.append((start, cut))
+            start = cut
+        bounded.append((start, end))
+
+    return bounded[:MAX_SENTENCES_PER_CHUNK]
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize embedding rows (zero rows stay zero)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def select_best_window(
+    sentence_embeddings: np.ndarray,
+    spans: Sequence[Sequence[int]],
+    query_vector: Sequence[float],
+    max_chars: int = DEFAULT_SNIPPET_CHARS
+) -> Optional[Tuple[int, int]]:
+    """
+    Pick the contiguous run of sentences that best matches the query
+
+    Scores every sentence with one matrix-vector product, seeds the window at
+    the best sentence and grows it towards the better-scoring neighbour until
+    the character budget is used.
+
+    Returns:
+        (start, end) character span inside the chunk, or None if unavailable
+    """
+    if sentence_embeddings is None or not len(spans):
+        return None
+
+    matrix = np.asarray(sentence_embeddings, dtype=np.float32)
+    if matrix.ndim != 2 or matrix.shape[0] != len(spans):
+        return None
+
+    query = np.asarray(query_vector, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    if query_norm == 0 or matrix.shape[1] != query.shape[0]:
+        return None
+
+    # Stored rows are already normalized - one dot product scores all sentences
+    scores = matrix @ (query / query_norm)
+
+    best = int(np.argmax(scores))
+    left, right = best, best
+    start, end = spans[best][0], spans[best][1]
+
+    while True:
+        candidates = []
+        if left > 0 and end - spans[left - 1][0] <= max_chars:
+            candidates.append((scores[left - 1], 'left'))
+        if right + 1 < len(spans) and spans[right + 1][1] - start <= max_chars:
+            candidates.append((scores[right + 1], 'right'))
+        if not candidates:
+            break
+
+        _, direction = max(candidates)
+        if direction == 'left':
+            left -= 1
+            start = spans[left][0]
+        else:
+            right += 1
+            end = spans[right][1]
+
+    return start, min(end, start + max_chars)
+
+
+def extract_snippet(
+    content: str,
+    sentence_embeddings: Optional[np.ndarray],
+    spans: Optional[Sequence[Sequence[int]]],
+    query_vector: Sequence[float],
+    max_chars: int = DEFAULT_SNIPPET_CHARS
+) -> Optional[Tuple[int, int, str]]:
+    """Return (start, end, text) of the best window, or None to fall back to the chunk head"""
+    if not content or not spans or len(content) <= max_chars:
+        return None
+
+    try:
+        window = select_best_window(sentence_embeddings, spans, query_vector, max_chars)
+    except Exception as e:
+        logger.warning(f"Snippet selection failed: {e}")
+        return None
+
+    if not window:
+        return None
+
+    start, end = window
+    return start, end, content[start:end].strip()
@@ -1,14 +1,34 @@
 # backend/app/services/chat_service.py - CLEAN REWRITE - ZERO TECH DEBT
 import json
 import uuid
-from typing import Dict, List, Optional, Any
+import asyncio
+import logging
+from typing import Dict, List, Optional, Any, Tuple
+from sqlalchemy import and_, or_, update
 from sqlalchemy.orm import Session
 from datetime import datetime
 
+from app.database import SessionLocal
+from app.core.db_executor import run_db
+from app.core.write_behind import WriteBehindQueue
 from app.models.conversation import Conversation, Message
 from app.models.user import User
 from app.services.auth_service import AuthService
-from rag_engine import get_rag_engine
+from app.services.context_cache import context_cache
+from app.services.guest_service import GuestService
+from rag_engine import get_rag_engine, VERBATIM_HISTORY_MESSAGES
+
+logger = logging.getLogger(__name__)
+
+# Strong references for fire-and-forget summary tasks
+_background_tasks: set = set()
+
+# Characters of the last message shown in the conversation list
+MESSAGE_PREVIEW_CHARS = 100
+
+
+def message_preview(content: str) -> str:
+    return content[:MESSAGE_PREVIEW_CHARS] + "..." if len(content) > MESSAGE_PREVIEW_CHARS else content
 
 
 class ChatService:
@@ -20,9 +40,6 @@ class ChatService:
     - Guest + authenticated user support
     """
     
-    # In-memory guest sessions
-    _guest_sessions: Dict[str, List[Dict[str, str]]] = {}
-    
     # ===== CONVERSATION MANAGEMENT =====
     
     @staticmethod
@@ -41,23 +58,70 @@ class ChatService:
         return conversation
 
     @staticmethod
-    def get_user_conversations(db: Session, user_id: str, limit: int = 50) -> List[Conversation]:
-        """Get all active conversations for a user"""
-        return db.query(Conversation).filter(
+    def get_user_conversations(
+        db: Session,
+        user_id: str,
+        limit: int = 50,
+        before: Optional[Tuple[datetime, str]] = None,
+        offset: int = 0
+    ) -> List[Conversation]:
+        """
+        Active conversations for a user, most recently updated first
+        `before` is the (updated_at, id) of the last conversation already
+        served (keyset pagination); `offset` is kept for older clients.
+        """
+        query = db.query(Conversation).filter(
             Conversation.user_id == user_id,
             Conversation.is_active == True
-        ).order_by(
-            Conversation.updated_at.desc()
-        ).limit(limit).all()
+        )
+        if before:
+            updated_at, conversation_id = before
+            query = query.filter(or_(
+                Conversation.updated_at < updated_at,
+                and_(Conversation.updated_at == updated_at, Conversation.id < conversation_id)
+            ))
+        query = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        if offset and not before:
+            query = query.offset(offset)
+        return query.limit(limit).all()
 
     @staticmethod
-    def get_conversation_messages(db: Session, conversation_id: str, limit: int = 100) -> List[Message]:
-        """Get messages from a conversation"""
-        return db.query(Message).filter(
-            Message.conversation_id == conversation_id
-        ).order_by(
-            Message.created_at.asc()
-        ).limit(limit).all()
+    def get_conversation_messages(
+        db: Session,
+        conversation_id: str,
+        limit: int = 100,
+        before: Optional[str] = None,
+        after: Optional[str] = None
+    ) -> List[Message]:
+        """
+        Messages in chronological order: the newest `limit`, or the page just
+        before / after the message with the given id (keyset on created_at, id).
+        Raises ValueError if that message is not in the conversation.
+        """
+        query = db.query(Message).filter(Message.conversation_id == conversation_id)
+        anchor_id = after or before
+        if anchor_id:
+            anchor = db.query(Message.created_at).filter(
+                Message.id == anchor_id,
+                Message.conversation_id == conversation_id
+            ).scalar()
+            if anchor is None:
+                raise ValueError(f"Message {anchor_id} is not in conversation {conversation_id}")
+        
+        if after:
+            return query.filter(or_(
+                Message.created_at > anchor,
+                and_(Message.created_at == anchor, Message.id > after)
+            )).order_by(Message.created_at.asc(), Message.id.asc()).limit(limit).all()
+        
+        if before:
+            query = query.filter(or_(
+                Message.created_at < anchor,
+                and_(Message.created_at == anchor, Message.id < before)
+            ))
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit).all()
+        messages.reverse()  # Chronological order
+        return messages
 
     @staticmethod
     def add_message(
@@ -81,32 +145,145 @@ class ChatService:
         
         db.add(message)
         
-        # Update conversation timestamp
-        conversation = db.query(Conversation).filter(
-            Conversation.id == conversation_id
-        ).first()
-        if conversation:
-            conversation.updated_at = datetime.utcnow()
+        # Conversation timestamp and listing data in one statement
+        message_count = db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(
+                updated_at=datetime.utcnow(),
+                message_count=Conversation.message_count + 1,
+                last_message_preview=message_preview(content)
+            )
+            .returning(Conversation.message_count)
+            .execution_options(synchronize_session=False)
+        ).scalar()
         
         db.commit()
+        if message_count is not None:
+            context_cache.append(conversation_id, message_count, [{"role": role, "content": content}])
         db.refresh(message)
         return message
 
     @staticmethod
-    def get_conversation_context(db: Session, conversation_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
-        """Get recent conversation context for AI"""
+    def add_messages(db: Session, messages: List[Dict[str, Any]]) -> None:
+        """
+        Insert a batch of messages (Message column dicts, id and created_at
+        included) and update each conversation once - one transaction
+        """
+        db.add_all([Message(**message) for message in messages])
+        
+        added: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        for message in messages:
+            count, _ = added.get(message["conversation_id"], (0, None))
+            added[message["conversation_id"]] = (count + 1, message)
+        
+        message_counts = {}
+        for conversation_id, (count, last) in added.items():
+            message_counts[conversation_id] = db.execute(
+                update(Conversation)
+                .where(Conversation.id == conversation_id)
+                .values(
+                    updated_at=last["created_at"],
+                    message_count=Conversation.message_count + count,
+                    last_message_preview=message_preview(last["content"])
+                )
+                .returning(Conversation.message_count)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+        
+        db.commit()
+        for conversation_id, message_count in message_counts.items():
+            if message_count is not None:
+                context_cache.append(conversation_id, message_count, [
+                    {"role": message["role"], "content": message["content"]}
+                    for message in messages if message["conversation_id"] == conversation_id
+                ])
+
+    @staticmethod
+    def queue_assistant_message(
+        conversation_id: str, content: str, processing_time_ms: int, is_truncated: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Hand the answer to the write-behind queue and return it as the API shape
+        The summary refresh runs once the message is actually stored.
+        `is_truncated` marks a partial answer (the client disconnected).
+        """
+        message = {
+            "id": str(uuid.uuid4()),
+            "conversation_id": conversation_id,
+            "role": "assistant",
+            "content": content,
+            "processing_time_ms": str(processing_time_ms),
+            "is_truncated": is_truncated,
+            "created_at": datetime.utcnow()
+        }
+        persisted = message_queue.enqueue(message, key=conversation_id)
+        persisted.add_done_callback(
+            lambda done: done.result() and ChatService.schedule_summary_refresh(conversation_id=conversation_id)
+        )
+        return {
+            "id": message["id"],
+            "content": content,
+            "timestamp": message["created_at"].isoformat(),
+            "role": "assistant",
+            "processing_time_ms": message["processing_time_ms"],
+            "is_truncated": is_truncated
+        }
+
+    @staticmethod
+    def get_conversation_context(
+        db: Session,
+        conversation_id: str,
+        max_messages: int = 10,
+        message_count: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Get recent conversation context for AI
+        Served from the context cache when its window matches `message_count`
+        (read from the conversation row when the caller does not have it).
+        """
+        if message_count is None:
+            message_count = db.query(Conversation.message_count).filter(
+                Conversation.id == conversation_id
+            ).scalar() or 0
+        
+        cached = context_cache.get(conversation_id, message_count, max_messages)
+        if cached is not None:
+            return cached
+        
         messages = db.query(Message).filter(
             Message.conversation_id == conversation_id
         ).order_by(
             Message.created_at.desc()
-        ).limit(max_messages).all()
+        ).limit(max(max_messages, context_cache.window)).all()
         
         messages.reverse()  # Chronological order
         
-        return [{
+        context = [{
             "role": message.role,
             "content": message.content
         } for message in messages]
+        context_cache.put(conversation_id, message_count, context)
+        return context[-max_messages:]
+
+    @staticmethod
+    def history_after_summary(
+        recent: List[Dict[str, str]],
+        total_messages: int,
+        summarized_count: int
+    ) -> List[Dict[str, str]]:
+        """
+        Prompt history for a turn: the messages of `recent` (the tail of a
+        conversation of `total_messages`, ending with the current question) that
+        the rolling summary does not cover yet. The question itself is sent
+        separately, so it is left out.
+        """
+        first_index = total_messages - len(recent)
+        return [
+            {"role": message["role"], "content": message["content"]}
+            for index, message in enumerate(recent[:-1], first_index)
+            if index >= summarized_count
+        ]
 
     @staticmethod
     def update_conversation_title(db: Session, conversation_id: str, title: str) -> Optional[Conversation]:
@@ -119,6 +296,7 @@ class ChatService:
             conversation.title = title
             conversation.updated_at = datetime.utcnow()
             db.commit()
+            context_cache.invalidate(conversation_id)
             db.refresh(conversation)
         
         return conversation
@@ -135,48 +313,146 @@ class ChatService:
             conversation.is_active = False
             conversation.updated_at = datetime.utcnow()
             db.commit()
+            context_cache.invalidate(conversation_id)
             return True
         
         return False
 
+    # ===== CONVERSATION SUMMARY (HISTORY COMPACTION) =====
+
+    @staticmethod
+    def schedule_summary_refresh(conversation_id: Optional[str] = None, guest_session: Optional[Dict[str, Any]] = None) -> None:
+        """Refresh the rolling summary in the background after an assistant turn"""
+        if conversation_id:
+            coro = ChatService.refresh_conversation_summary(conversation_id)
+        elif guest_session is not None:
+            coro = ChatService.refresh_guest_summary(guest_session)
+        else:
+            return
+        
+        task = asyncio.create_task(coro)
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+
+    @staticmethod
+    async def refresh_conversation_summary(conversation_id: str) -> None:
+        """
+        Fold messages older than the last two turns into Conversation.context_summary
+        Runs outside the request - uses its own database sessions, off the event loop
+        """
+        work = await run_db(ChatService._load_summary_work, conversation_id)
+        if not work:
+            return
+        summarized_count, fold_until, total_messages, previous_summary, new_history = work
+        
+        summary = await get_rag_engine().summarize_conversation(previous_summary, new_history)
+        if not summary or summary == previous_summary:
+            return
+        
+        await run_db(
+            ChatService._save_conversation_summary,
+            conversation_id, summary, summarized_count, fold_until, total_messages
+        )
+
+    @staticmethod
+    def _load_summary_work(conversation_id: str) -> Optional[Tuple[int, int, int, Optional[str], List[Dict[str, str]]]]:
+        """Messages due for folding: (summarized_count, fold_until, total, previous_summary, history)"""
+        db = SessionLocal()
+        try:
+            conversation = db.query(Conversation).filter(Conversation.id == conversation_id).first()
+            if not conversation:
+                return None
+            
+            summarized_count = conversation.summarized_message_count or 0
+            total_messages = db.query(Message).filter(Message.conversation_id == conversation_id).count()
+            fold_until = total_messages - VERBATIM_HISTORY_MESSAGES
+            if fold_until <= summarized_count:
+                return None
+            
+            new_messages = db.query(Message).filter(
+                Message.conversation_id == conversation_id
+            ).order_by(
+                Message.created_at.asc()
+            ).offset(summarized_count).limit(fold_until - summarized_count).all()
+            new_history = [{"role": m.role, "content": m.content} for m in new_messages]
+            return summarized_count, fold_until, total_messages, conversation.context_summary, new_history
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_conversation_summary(
+        conversation_id: str,
+        summary: str,
+        summarized_count: int,
+        fold_until: int,
+        total_messages: int
+    ) -> None:
+        db = SessionLocal()
+        try:
+            # Only advance if nobody else did meanwhile
+            updated = db.query(Conversation).filter(
+                Conversation.id == conversation_id,
+                Conversation.summarized_message_count == summarized_count
+            ).update({
+                Conversation.context_summary: summary,
+                Conversation.summarized_message_count: fold_until
+            }, synchronize_session=False)
+            db.commit()
+            if updated:
+                logger.info(f"🗜️ Conversation {conversation_id} summary covers {fold_until}/{total_messages} messages")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Failed to save conversation summary: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    async def refresh_guest_summary(guest_session: Dict[str, Any]) -> None:
+        """Same rolling summary for guest sessions, kept in the session itself"""
+        history = guest_session.get("conversation_history", [])
+        summarized_count = guest_session.get("summarized_count", 0)
+        fold_until = len(history) - VERBATIM_HISTORY_MESSAGES
+        if fold_until <= summarized_count:
+            return
+        
+        folded = list(history[summarized_count:fold_until])
+        new_history = [{"role": m["role"], "content": m["content"]} for m in folded]
+        summary = await get_rag_engine().summarize_conversation(guest_session.get("context_summary"), new_history)
+        if not summary:
+            return
+        
+        # Re-read from the session store - it may hand out copies
+        session_id = guest_session.get("session_id")
+        current = GuestService.store.get(session_id) if session_id else guest_session
+        if current is None:
+            return
+        
+        # Skip if the history was trimmed or folded meanwhile - the next turn folds again
+        if (current.get("summarized_count", 0) == summarized_count
+                and current.get("conversation_history", [])[summarized_count:fold_until] == folded):
+            current["context_summary"] = summary
+            current["summarized_count"] = fold_until
+            if session_id:
+                GuestService.save_guest_session(session_id, current)
+
     # ===== GUEST SESSION MANAGEMENT =====
     
     @staticmethod
     def create_guest_session() -> str:
         """Create a new guest session"""
         session_id = f"guest_{uuid.uuid4().hex[:8]}"
-        ChatService._guest_sessions[session_id] = []
+        GuestService.get_guest_session(session_id)
         return session_id
 
     @staticmethod
     def add_guest_message(session_id: str, role: str, content: str) -> None:
-        """Add message to guest session"""
-        if session_id not in ChatService._guest_sessions:
-            ChatService._guest_sessions[session_id] = []
-        
-        ChatService._guest_sessions[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        
-        # Keep only last 20 messages to prevent memory bloat
-        if len(ChatService._guest_sessions[session_id]) > 20:
-            ChatService._guest_sessions[session_id] = ChatService._guest_sessions[session_id][-20:]
+        """Add message to guest session (same session store as the streaming path)"""
+        GuestService.add_message_to_history(session_id, role, content)
 
     @staticmethod
     def get_guest_context(session_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
         """Get conversation context for guest session"""
-        if session_id not in ChatService._guest_sessions:
-            return []
-        
-        messages = ChatService._guest_sessions[session_id]
-        recent_messages = messages[-max_messages:] if len(messages) > max_messages else messages
-        
-        return [{
-            "role": message["role"],
-            "content": message["content"]
-        } for message in recent_messages]
+        return GuestService.get_conversation_context(session_id, max_messages)
 
     # ===== MAIN PROCESSING METHODS =====
 
@@ -190,66 +466,83 @@ class ChatService:
         """Process message for authenticated users"""
         start_time = datetime.utcnow()
         
-        # Check user limits
-        can_proceed, limit_message = AuthService.check_user_limits(db, user.id)
-        if not can_proceed:
-            raise Exception(limit_message)
-        
-        # Get or create conversation
-        if conversation_id:
-            conversation = db.query(Conversation).filter(
-                Conversation.id == conversation_id,
-                Conversation.user_id == user.id
-            ).first()
-            if not conversation:
-                raise Exception("Conversation not found")
-        else:
-            conversation = ChatService.create_conversation(
-                db, user.id,
-                title=message_content[:50] + "..." if len(message_content) > 50 else message_content
+        def open_turn() -> Tuple[str, Dict[str, Any], List[Dict[str, str]], Optional[str]]:
+            # Check user limits
+            can_proceed, limit_message = AuthService.check_user_limits(db, user.id)
+            if not can_proceed:
+                raise Exception(limit_message)
+            
+            # Get or create conversation
+            if conversation_id:
+                conversation = db.query(Conversation).filter(
+                    Conversation.id == conversation_id,
+                    Conversation.user_id == user.id
+                ).first()
+                if not conversation:
+                    raise Exception("Conversation not found")
+            else:
+                conversation = ChatService.create_conversation(
+                    db, user.id,
+                    title=message_content[:50] + "..." if len(message_content) > 50 else message_content
+                )
+            
+            # Read before the commit below expires the row
+            turn_conversation_id, message_count = conversation.id, conversation.message_count
+            context_summary = conversation.context_summary
+            summarized_count = conversation.summarized_message_count or 0
+            
+            # Add user message
+            user_message = ChatService.add_message(db, turn_conversation_id, "user", message_content)
+            
+            # Messages the summary does not cover yet
+            context_messages = ChatService.history_after_summary(
+                ChatService.get_conversation_context(db, turn_conversation_id, 10, message_count=message_count + 1),
+                message_count + 1, summarized_count
             )
-            conversation_id = conversation.id
-        
-        # Add user message
-        user_message = ChatService.add_message(db, conversation_id, "user", message_content)
+            return turn_conversation_id, {
+                "id": user_message.id,
+                "content": user_message.content,
+                "timestamp": user_message.created_at.isoformat(),
+                "role": "user"
+            }, context_messages, context_summary
         
-        # Get conversation context
-        context_messages = ChatService.get_conversation_context(db, conversation_id, 10)
+        if conversation_id:
+            await message_queue.settle(conversation_id)
+        conversation_id, user_message, context_messages, context_summary = await run_db(open_turn)
         
         # Process with RAG engine
         rag_instance = get_rag_engine()
         chunks = []
-        async for chunk in rag_instance.ask_question_with_context_streaming(message_content, context_messages):
+        async for chunk in rag_instance.ask_question_with_context_streaming(
+            message_content, context_messages, context_summary
+        ):
             chunks.append(chunk)
         ai_response = ''.join(chunks)
         
         processing_time = int((datetime.utcnow() - start_time).total_seconds() * 1000)
         
-        # Save AI response
-        ai_message = ChatService.add_message(
-            db, conversation_id, "assistant", ai_response,
-            processing_time_ms=str(processing_time)
-        )
-        
-        # Update user question count
-        from app.services.user_service import UserService
-        UserService.increment_question_usage(db, user.id)
-        
-        return {
-            "conversation_id": conversation_id,
-            "user_message": {
-                "id": user_message.id,
-                "content": user_message.content,
-                "timestamp": user_message.created_at.isoformat(),
-                "role": "user"
-            },
-            "ai_message": {
+        def save_answer() -> Dict[str, Any]:
+            # Save AI response
+            ai_message = ChatService.add_message(
+                db, conversation_id, "assistant", ai_response,
+                processing_time_ms=str(processing_time)
+            )
+            # (the question was counted when it was claimed)
+            return {
                 "id": ai_message.id,
                 "content": ai_message.content,
                 "timestamp": ai_message.created_at.isoformat(),
                 "role": "assistant",
                 "processing_time_ms": ai_message.processing_time_ms
-            },
+            }
+        
+        ai_message = await run_db(save_answer)
+        ChatService.schedule_summary_refresh(conversation_id=conversation_id)
+        
+        return {
+            "conversation_id": conversation_id,
+            "user_message": user_message,
+            "ai_message": ai_message,
             "processing_time_ms": processing_time
         }
 
@@ -333,11 +626,9 @@ class ChatService:
             # Authenticated user flow
             result = await ChatService.process_chat_message(db, user, conversation_id, message_content)
             
-            # Add required fields for API contract
-            db.refresh(user)
-            result.update({
-                "conversation_title": "محادثة",  # Default title
-                "updated_user": {
+            def refreshed_user() -> Tuple[Dict[str, Any], int]:
+                db.refresh(user)
+                return {
                     "id": user.id,
                     "email": user.email,
                     "full_name": user.full_name,
@@ -346,8 +637,14 @@ class ChatService:
                     "cycle_reset_time": user.cycle_reset_time.isoformat() if user.cycle_reset_time else None,
                     "is_active": user.is_active,
                     "is_verified": user.is_verified
-                },
-                "user_questions_remaining": ChatService._get_remaining_questions(user),
+                }, ChatService._get_remaining_questions(user)
+            
+            # Add required fields for API contract
+            updated_user, questions_remaining = await run_db(refreshed_user)
+            result.update({
+                "conversation_title": "محادثة",  # Default title
+                "updated_user": updated_user,
+                "user_questions_remaining": questions_remaining,
                 # API contract fields (simplified)
                 "multi_agent_enabled": False,
                 "processing_mode": "standard",
@@ -390,4 +687,16 @@ class ChatService:
         elif user.subscription_tier == "pro":
             return 999999
         else:  # enterprise
-            return 999999
\ No newline at end of file
+            return 999999
+
+
+def _persist_messages(messages: List[Dict[str, Any]]) -> None:
+    db = SessionLocal()
+    try:
+        ChatService.add_messages(db, messages)
+    finally:
+        db.close()
+
+
+# Assistant messages from the stream path, written behind the `complete` frame
+message_queue = WriteBehindQueue(_persist_messages, name="messages")
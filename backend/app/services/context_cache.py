@@ -0,0 +1,91 @@
+"""
+Conversation Context Cache - recent message windows of signed-in conversations
+Every turn needs the last CONTEXT_WINDOW_MESSAGES messages, which the previous
+turn has just written. ChatService keeps them here (updated on add_message,
+dropped on archive/title change) in a SessionStore, so the cache is an
+in-process LRU or shared across workers like guest sessions.
+
+Each window records the conversation's message_count it reflects. A window is
+only served when that count matches the one the caller read from the
+conversation row - a write this worker did not see makes it a miss, never a
+wrong context.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.core.session_config import session_config
+from app.core.tracing import emit
+from app.storage.session_store import SessionStore, create_session_store
+
+logger = logging.getLogger(__name__)
+
+
+def _create_store() -> SessionStore:
+    return create_session_store(
+        backend=session_config.CONTEXT_CACHE_STORE,
+        ttl_seconds=session_config.CONTEXT_CACHE_TTL_MINUTES * 60,
+        max_sessions=session_config.CONTEXT_CACHE_MAX_CONVERSATIONS,
+        max_bytes=session_config.CONTEXT_CACHE_MAX_MB * 1024 * 1024,
+        db_path=session_config.CONTEXT_CACHE_DB_PATH
+    )
+
+
+class ContextCache:
+    """Per-conversation window of recent {role, content} messages"""
+
+    def __init__(self, store: SessionStore, window: int = session_config.CONTEXT_WINDOW_MESSAGES):
+        self.store = store
+        self.window = window
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conversation_id: str, message_count: int, max_messages: int) -> Optional[List[Dict[str, str]]]:
+        """The last `max_messages` messages, if the cached window is current"""
+        entry = self.store.get(conversation_id)
+        usable = (
+            entry is not None
+            and entry["count"] == message_count
+            and (max_messages <= len(entry["messages"]) or len(entry["messages"]) == message_count)
+        )
+        if not usable:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["messages"][-max_messages:]
+
+    def put(self, conversation_id: str, message_count: int, messages: List[Dict[str, str]]) -> None:
+        self.store.put(conversation_id, {"count": message_count, "messages": messages[-self.window:]})
+
+    def append(self, conversation_id: str, message_count: int, messages: List[Dict[str, str]]) -> None:
+        """Extend a cached window with messages just stored (message_count includes them)"""
+        entry = self.store.get(conversation_id)
+        if entry is None:
+            return
+        if entry["count"] != message_count - len(messages):
+            # Another worker wrote in between - rebuild from the database next time
+            self.store.delete(conversation_id)
+            return
+        self.put(conversation_id, message_count, entry["messages"] + messages)
+
+    def invalidate(self, conversation_id: str) -> None:
+        self.store.delete(conversation_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "window": self.window, "hits": self.hits, "misses": self.misses}
+
+
+def render_prometheus(stats: Dict[str, Any]) -> str:
+    """Context cache lookups in Prometheus text format"""
+    backend = {"backend": stats["backend"]}
+    return "".join([
+        emit("legal_chat_context_cache_lookups_total", "counter", "Conversation context lookups, by result", [
+            ({**backend, "result": "hit"}, stats["hits"]),
+            ({**backend, "result": "miss"}, stats["misses"]),
+        ]),
+        emit("legal_chat_context_cache_conversations", "gauge",
+             "Conversation windows currently cached", [(backend, stats["sessions"])]),
+    ])
+
+
+context_cache = ContextCache(_create_store())
@@ -1,11 +1,31 @@
 """
 Cooldown service for managing question limits and refill timing.
+Signed-in users: one conditional UPDATE ... RETURNING on the users row checks,
+consumes (or resets a lapsed cycle) and counts the question; refunds are its
+mirror statement. Guests: the shared quota engine (app/core/quota_engine.py).
 """
 
 from datetime import datetime, timedelta
 from typing import Tuple, Optional
+from sqlalchemy import and_, case, or_, select, update
 from sqlalchemy.orm import Session
 
+from app.core.quota_engine import QuotaDecision, QuotaPolicy
+from app.core.session_config import session_config
+from app.models.user import User
+
+# Tiers that are tracked but never limited
+UNLIMITED_TIERS = ("admin", "testing", "unlimited")
+UNLIMITED_QUESTIONS = 10 ** 9
+
+_used = User.questions_used_current_cycle
+_reset = User.cycle_reset_time
+
+
+def _lapsed(now: datetime):
+    """The cooldown of the current cycle has ended (column values before the update)"""
+    return and_(_reset.isnot(None), _reset <= now)
+
 
 class CooldownService:
     """Service for managing user question cooldowns and limits"""
@@ -15,14 +35,28 @@ class CooldownService:
     GUEST_QUESTION_LIMIT = 7
     SIGNED_IN_QUESTION_LIMIT = 20
     
+    @staticmethod
+    def user_policy(user) -> QuotaPolicy:
+        """Quota for a signed-in user (admin/testing tiers are tracked but not limited)"""
+        if user.subscription_tier in UNLIMITED_TIERS:
+            return QuotaPolicy(UNLIMITED_QUESTIONS, 0)
+        return QuotaPolicy(CooldownService.SIGNED_IN_QUESTION_LIMIT, CooldownService.COOLDOWN_DURATION_HOURS * 3600)
+    
+    @staticmethod
+    def guest_policy() -> QuotaPolicy:
+        """Guest quota; an idle guest's counter lapses with the guest session"""
+        return QuotaPolicy(
+            CooldownService.GUEST_QUESTION_LIMIT,
+            CooldownService.COOLDOWN_DURATION_HOURS * 3600,
+            idle_seconds=session_config.GUEST_SESSION_TTL_MINUTES * 60
+        )
+    
     @staticmethod
     def get_question_status(db: Session, user) -> dict:
-        """Get current question availability status for a user."""
-        now = datetime.utcnow()
-        
+        """Get current question availability status for a user (read-only)."""
         if user:
             # Admin/testing accounts have unlimited access
-            if user.subscription_tier in ["admin", "testing", "unlimited"]:
+            if user.subscription_tier in UNLIMITED_TIERS:
                 return {
                     "questions_available": 999999,
                     "questions_used": user.questions_used_current_cycle,
@@ -33,67 +67,95 @@ class CooldownService:
                     "tier": user.subscription_tier
                 }
             
-            max_questions = CooldownService.SIGNED_IN_QUESTION_LIMIT
-            
-            # Check if user needs a reset
-            if user.cycle_reset_time and now >= user.cycle_reset_time:
-                user.questions_used_current_cycle = 0
-                user.cycle_reset_time = None
-                db.commit()
-            
-            questions_used = user.questions_used_current_cycle
+            decision = CooldownService.peek(user)
         else:
-            max_questions = CooldownService.GUEST_QUESTION_LIMIT
-            questions_used = 0
-        
-        questions_available = max_questions - questions_used
-        is_in_cooldown = questions_available <= 0 and user and user.cycle_reset_time
+            decision = QuotaDecision(True, 0, CooldownService.GUEST_QUESTION_LIMIT)
         
         return {
-            "questions_available": max(0, questions_available),
-            "questions_used": questions_used,
-            "max_questions": max_questions,
-            "is_in_cooldown": is_in_cooldown,
-            "reset_time": user.cycle_reset_time.isoformat() if user and user.cycle_reset_time else None,
-            "can_ask_question": questions_available > 0
+            "questions_available": decision.remaining,
+            "questions_used": decision.used,
+            "max_questions": decision.limit,
+            "is_in_cooldown": bool(not decision.allowed and decision.reset_at),
+            "reset_time": decision.reset_at.isoformat() if decision.reset_at else None,
+            "can_ask_question": decision.allowed
         }
     
+    @staticmethod
+    def peek(user) -> QuotaDecision:
+        """Quota state from the loaded user row (a lapsed cycle reads as fresh)"""
+        policy = CooldownService.user_policy(user)
+        return _decision(user.questions_used_current_cycle, user.cycle_reset_time, policy)
+    
     @staticmethod
     def can_ask_question(db: Session, user) -> Tuple[bool, str, Optional[datetime]]:
         """Check if user can ask a question right now."""
-        status = CooldownService.get_question_status(db, user)
-        
-        if status["can_ask_question"]:
-            return True, "OK", None
-        
-        if status["is_in_cooldown"]:
-            reset_time = datetime.fromisoformat(status["reset_time"])
-            return False, f"Questions will refill at {reset_time.strftime('%I:%M %p')}", reset_time
+        decision = CooldownService.peek(user)
+        return decision.allowed, decision.message, decision.reset_at
+    
+    @staticmethod
+    def claim_question(db: Session, user) -> QuotaDecision:
+        """
+        Check and use one question in a single conditional UPDATE
+        The same statement resets a lapsed cycle, starts the cooldown on the
+        last question and counts monthly usage; it matches no row when the
+        user is out of questions.
+        """
+        policy = CooldownService.user_policy(user)
+        now = datetime.utcnow()
+        new_used = case((_lapsed(now), 1), else_=_used + 1)
+        row = db.execute(
+            update(User)
+            .where(User.id == user.id, or_(_used < policy.limit, _lapsed(now)))
+            .values(
+                questions_used_current_cycle=new_used,
+                cycle_reset_time=case(
+                    (new_used >= policy.limit, now + timedelta(seconds=policy.cooldown_seconds)),
+                    (_lapsed(now), None),
+                    else_=_reset
+                ),
+                last_question_time=now,
+                questions_used_this_month=User.questions_used_this_month + 1
+            )
+            .returning(_used, _reset)
+            .execution_options(synchronize_session=False)
+        ).first()
+        db.commit()
         
-        return False, "Question limit reached", None
+        if row is None:
+            # Denied - read the cooldown for the 429 message
+            row = db.execute(select(_used, _reset).where(User.id == user.id)).first()
+            used, reset_at = row if row else (policy.limit, None)
+            return QuotaDecision(False, used, policy.limit, reset_at)
+        return QuotaDecision(True, row[0], policy.limit, row[1])
     
     @staticmethod
     def use_question(db: Session, user) -> bool:
         """Use one question and update cooldown if needed."""
-        # Admin/testing accounts bypass all limits
-        if user and user.subscription_tier in ["admin", "testing", "unlimited"]:
-            # Still track usage for analytics but don't enforce limits
-            user.questions_used_current_cycle += 1
-            user.last_question_time = datetime.utcnow()
-            db.commit()
-            return True
-            
-        can_ask, message, reset_time = CooldownService.can_ask_question(db, user)
-        
-        if not can_ask:
-            return False
-        
-        user.questions_used_current_cycle += 1
-        user.last_question_time = datetime.utcnow()
-        
-        # Check if they've hit the limit
-        if user.questions_used_current_cycle >= CooldownService.SIGNED_IN_QUESTION_LIMIT:
-            user.cycle_reset_time = datetime.utcnow() + timedelta(hours=CooldownService.COOLDOWN_DURATION_HOURS)
-        
+        return CooldownService.claim_question(db, user).allowed
+    
+    @staticmethod
+    def refund_question(db: Session, user) -> QuotaDecision:
+        """Give the question back after a failed request (lifts a cooldown it started)"""
+        policy = CooldownService.user_policy(user)
+        row = db.execute(
+            update(User)
+            .where(User.id == user.id)
+            .values(
+                questions_used_current_cycle=case((_used > 0, _used - 1), else_=0),
+                cycle_reset_time=case((_used - 1 < policy.limit, None), else_=_reset),
+                questions_used_this_month=case(
+                    (User.questions_used_this_month > 0, User.questions_used_this_month - 1), else_=0
+                )
+            )
+            .returning(_used, _reset)
+            .execution_options(synchronize_session=False)
+        ).first()
         db.commit()
-        return True
\ No newline at end of file
+        used, reset_at = row if row else (0, None)
+        return QuotaDecision(used < policy.limit, used, policy.limit, reset_at)
+
+
+def _decision(used: int, reset_at: Optional[datetime], policy: QuotaPolicy) -> QuotaDecision:
+    if reset_at is not None and reset_at <= datetime.utcnow():
+        return QuotaDecision(True, 0, policy.limit)
+    return QuotaDecision(used < policy.limit, used, policy.limit, reset_at)
@@ -13,6 +13,10 @@ from openai import AsyncOpenAI
 import logging
 from smart_legal_chunker import SmartLegalChunker, LegalChunk
 from app.storage.vector_store import VectorStore, Chunk
+from app.retrieval.snippet_extractor import split_sentence_spans
+from app.retrieval.document_features import compute_static_features
+from app.legal_reasoning.ai_style_classifier import AIStyleClassifier
+from app.core.prompt_controller import extract_article_citations
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +39,7 @@ class DocumentService:
         """
         self.storage = storage
         self.ai_client = ai_client
+        self.style_classifier = AIStyleClassifier(ai_client)
         
         logger.info(f"DocumentService initialized with {type(storage).__name__}")
 
@@ -46,6 +51,62 @@ class DocumentService:
         """Determine if document needs chunking"""
         return self.estimate_tokens(content) > 2000
     
+    async def index_sentences(self, chunks: List[Chunk]) -> None:
+        """
+        Precompute sentence/article offsets and sentence embeddings for each chunk
+        
+        One batched embeddings call per chunk. Failures are non-fatal: the chunk is
+        stored without a sentence index and retrieval falls back to the chunk head.
+        """
+        for chunk in chunks:
+            spans = split_sentence_spans(chunk.content)
+            if len(spans) < 2:
+                continue
+            
+            try:
+                response = await self.ai_client.embeddings.create(
+                    model="text-embedding-ada-002",
+                    input=[chunk.content[start:end] for start, end in spans]
+                )
+                chunk.sentence_spans = [[start, end] for start, end in spans]
+                chunk.sentence_embeddings = [item.embedding for item in response.data]
+            except Exception as e:
+                logger.warning(f"⚠️ Sentence indexing skipped for {chunk.id}: {e}")
+        
+        indexed = sum(1 for chunk in chunks if chunk.sentence_spans)
+        logger.info(f"🧩 Sentence index built for {indexed}/{len(chunks)} chunks")
+    
+    async def annotate_features(self, chunks: List[Chunk]) -> None:
+        """
+        Compute static document features (kind, authority, citation value, style,
+        article citations)
+        
+        Kind, authority and article citations are rule-based. Style needs one LLM
+        call, made once per parent document and only for non-statute documents
+        (statutes have no style).
+        """
+        styles: Dict[str, Optional[str]] = {}
+        
+        for chunk in chunks:
+            chunk.article_citations = extract_article_citations(chunk.content)
+            features = compute_static_features(chunk.title, chunk.content)
+            chunk.doc_kind = features.doc_kind
+            chunk.authority_score = features.authority_score
+            chunk.citation_value = features.citation_value
+            
+            if chunk.doc_kind == "statute":
+                continue
+            
+            parent_id = (chunk.metadata or {}).get('parent_document_id', chunk.id)
+            if parent_id not in styles:
+                style_info = await self.style_classifier.classify_document_style(chunk.content, chunk.title)
+                styles[parent_id] = style_info.get("style")
+            chunk.doc_style = styles[parent_id]
+        
+        kinds = [chunk.doc_kind for chunk in chunks]
+        logger.info(f"🏷️ Static features: {kinds.count('statute')} statute, {kinds.count('memo')} memo, "
+                    f"{kinds.count('case')} case, {kinds.count('other')} other")
+    
     async def add_document(
     self, 
     title: str, 
@@ -104,6 +165,7 @@ class DocumentService:
                         chunk_metadata = {
                             **(metadata or {}),
                             'parent_document_id': document_id,
+                            'law_title': title,
                             'chunk_index': legal_chunk.chunk_index,
                             'total_chunks': legal_chunk.total_chunks,
                             'hierarchy_level': legal_chunk.hierarchy_level,
@@ -153,6 +215,8 @@ class DocumentService:
             
             # Store all chunks
             if chunks_to_store:
+                await self.index_sentences(chunks_to_store)
+                await self.annotate_features(chunks_to_store)
                 success = await self.storage.store_chunks(chunks_to_store)
                 
                 if success:
@@ -234,6 +298,7 @@ class DocumentService:
                                 chunk_metadata = {
                                     **doc_metadata,
                                     'parent_document_id': doc_id,
+                                    'law_title': doc_title,
                                     'chunk_index': legal_chunk.chunk_index,
                                     'total_chunks': legal_chunk.total_chunks,
                                     'hierarchy_level': legal_chunk.hierarchy_level,
@@ -289,6 +354,8 @@ class DocumentService:
             
             # Store all successfully processed chunks
             if chunks_to_store:
+                await self.index_sentences(chunks_to_store)
+                await self.annotate_features(chunks_to_store)
                 storage_success = await self.storage.store_chunks(chunks_to_store)
                 
                 if not storage_success:
@@ -2,112 +2,132 @@
 
 """
 Guest session management for tracking question limits and conversation history.
+Sessions live in a SessionStore (in-process LRU/TTL or shared SQLite); every
+change is written back with save_guest_session. Question quotas live in the
+quota engine, keyed by session id.
 """
 
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, Optional, Tuple, List
 
+from app.core.quota_engine import QuotaDecision, get_quota_engine
+from app.core.session_config import session_config
+from app.storage.session_store import SessionStore, create_session_store
+
+
+def _create_store() -> SessionStore:
+    return create_session_store(
+        backend=session_config.GUEST_SESSION_STORE,
+        ttl_seconds=session_config.GUEST_SESSION_TTL_MINUTES * 60,
+        max_sessions=session_config.MAX_GUEST_SESSIONS,
+        max_bytes=session_config.GUEST_SESSION_MAX_MB * 1024 * 1024,
+        db_path=session_config.GUEST_SESSION_DB_PATH
+    )
+
 
 class GuestService:
     """Service for managing guest user question limits and conversation memory"""
-    
-    # In-memory storage for guest sessions (in production, use Redis)
-    guest_sessions = {}
-    
+
+    # Guest session storage (bounded; see app/storage/session_store.py)
+    store: SessionStore = _create_store()
+
     @staticmethod
     def get_guest_session(session_id: str) -> Dict:
         """Get or create guest session data with conversation history"""
-        if session_id not in GuestService.guest_sessions:
-            GuestService.guest_sessions[session_id] = {
-                "questions_used": 0,
-                "reset_time": None,
+        session = GuestService.store.get(session_id)
+        if session is None:
+            session = {
+                "session_id": session_id,
                 "created_at": datetime.utcnow(),
                 "conversation_history": [],  # 🔥 NEW: Store conversation history
                 "last_activity": datetime.utcnow()
             }
-        
+            GuestService.save_guest_session(session_id, session)
+
         # Update last activity
-        GuestService.guest_sessions[session_id]["last_activity"] = datetime.utcnow()
-        return GuestService.guest_sessions[session_id]
-    
+        session["last_activity"] = datetime.utcnow()
+        return session
+
+    @staticmethod
+    def save_guest_session(session_id: str, session: Dict) -> None:
+        """Write a session back (its TTL restarts)"""
+        GuestService.store.put(session_id, session)
+
+    @staticmethod
+    def guest_quota(session_id: str) -> QuotaDecision:
+        """Current quota state without using a question"""
+        from app.services.cooldown_service import CooldownService
+        return get_quota_engine().peek(_quota_key(session_id), CooldownService.guest_policy())
+
     @staticmethod
     def can_guest_ask_question(session_id: str) -> Tuple[bool, str, Optional[datetime]]:
         """Check if guest can ask a question"""
+        decision = GuestService.guest_quota(session_id)
+        return decision.allowed, decision.message, decision.reset_at
+
+    @staticmethod
+    def claim_guest_question(session_id: str) -> QuotaDecision:
+        """Check and use one question in a single atomic quota operation"""
         from app.services.cooldown_service import CooldownService
-        
-        session = GuestService.get_guest_session(session_id)
-        now = datetime.utcnow()
-        
-        # Check if reset time has passed
-        if session["reset_time"] and now >= session["reset_time"]:
-            session["questions_used"] = 0
-            session["reset_time"] = None
-        
-        questions_available = CooldownService.GUEST_QUESTION_LIMIT - session["questions_used"]
-        
-        if questions_available > 0:
-            return True, "OK", None
-        
-        if session["reset_time"]:
-            return False, f"Questions will refill at {session['reset_time'].strftime('%I:%M %p')}", session["reset_time"]
-        
-        return False, "Question limit reached", None
-    
+        return get_quota_engine().consume(_quota_key(session_id), CooldownService.guest_policy())
+
     @staticmethod
     def use_guest_question(session_id: str) -> bool:
         """Use one question for guest user"""
+        return GuestService.claim_guest_question(session_id).allowed
+
+    @staticmethod
+    def refund_guest_question(session_id: str) -> None:
+        """Give a question back after a failed request"""
         from app.services.cooldown_service import CooldownService
-        
-        can_ask, message, reset_time = GuestService.can_guest_ask_question(session_id)
-        
-        if not can_ask:
-            return False
-        
-        session = GuestService.get_guest_session(session_id)
-        session["questions_used"] += 1
-        
-        # Check if they've hit the limit
-        if session["questions_used"] >= CooldownService.GUEST_QUESTION_LIMIT:
-            session["reset_time"] = datetime.utcnow() + timedelta(hours=CooldownService.COOLDOWN_DURATION_HOURS)
-        
-        return True
-    
+        get_quota_engine().refund(_quota_key(session_id), CooldownService.guest_policy())
+
     @staticmethod
-    def add_message_to_history(session_id: str, role: str, content: str) -> None:
-        """Add a message to guest conversation history"""
+    def add_message_to_history(session_id: str, role: str, content: str, is_truncated: bool = False) -> None:
+        """Add a message to guest conversation history (`is_truncated`: partial answer)"""
         session = GuestService.get_guest_session(session_id)
-        
+
         # Ensure conversation_history exists
         if "conversation_history" not in session:
             session["conversation_history"] = []
-        
+
         message = {
             "role": role,
             "content": content,
             "timestamp": datetime.utcnow().isoformat()
         }
-        
+        if is_truncated:
+            message["is_truncated"] = True
+
         session["conversation_history"].append(message)
-        
-        # Keep only last 20 messages to prevent memory bloat
-        if len(session["conversation_history"]) > 20:
-            session["conversation_history"] = session["conversation_history"][-20:]
-    
+        GuestService.trim_history(session)
+        GuestService.save_guest_session(session_id, session)
+
+    @staticmethod
+    def trim_history(session: Dict) -> None:
+        """Keep only the last GUEST_MESSAGE_HISTORY_LIMIT messages to prevent memory bloat"""
+        limit = session_config.GUEST_MESSAGE_HISTORY_LIMIT
+        history = session.get("conversation_history", [])
+        if len(history) > limit:
+            trimmed = len(history) - limit
+            session["conversation_history"] = history[-limit:]
+            session["summarized_count"] = max(0, session.get("summarized_count", 0) - trimmed)
+
     @staticmethod
     def get_conversation_context(session_id: str, max_messages: int = 10) -> List[Dict[str, str]]:
         """Get conversation context for AI processing"""
         session = GuestService.get_guest_session(session_id)
-        
+
         # Ensure conversation_history exists
         if "conversation_history" not in session:
             session["conversation_history"] = []
             return []
-        
+
         history = session["conversation_history"]
-        
+
         # Get last N messages for context
         recent_messages = history[-max_messages:] if len(history) > max_messages else history
-        
+
         # Format for AI context (remove timestamp)
         context = []
         for message in recent_messages:
@@ -115,22 +135,19 @@ class GuestService:
                 "role": message["role"],
                 "content": message["content"]
             })
-        
+
         return context
-    
+
     @staticmethod
-    def cleanup_old_sessions(hours_old: int = 24) -> int:
-        """Clean up guest sessions older than specified hours"""
-        now = datetime.utcnow()
-        cutoff_time = now - timedelta(hours=hours_old)
-        
-        sessions_to_remove = []
-        for session_id, session_data in GuestService.guest_sessions.items():
-            last_activity = session_data.get("last_activity", session_data.get("created_at"))
-            if last_activity < cutoff_time:
-                sessions_to_remove.append(session_id)
-        
-        for session_id in sessions_to_remove:
-            del GuestService.guest_sessions[session_id]
-        
-        return len(sessions_to_remove)
\ No newline at end of file
+    def cleanup_old_sessions() -> int:
+        """Evict expired guest sessions (the sweeper calls this periodically)"""
+        return GuestService.store.sweep()
+
+    @staticmethod
+    def store_stats() -> Dict:
+        """Session count, memory and evictions of the guest session store"""
+        return GuestService.store.stats()
+
+
+def _quota_key(session_id: str) -> str:
+    return f"guest:{session_id}"
@@ -0,0 +1,338 @@
+"""
+Session Store Interface - guest session storage
+Guest sessions (recent history, rolling summary) live
+behind this contract. MemorySessionStore keeps them in-process with LRU + TTL
+eviction and a byte budget; SqliteSessionStore shares them across workers
+through one SQLite file. Callers must `put` after changing a session - only
+the in-memory store hands out live objects.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from threading import RLock
+from typing import Any, Callable, Dict, Optional
+
+from app.core.tracing import emit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 3600.0
+DEFAULT_MAX_SESSIONS = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+EVICTION_REASONS = ("ttl", "lru", "bytes")
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$dt" in obj:
+        return datetime.fromisoformat(obj["$dt"])
+    return obj
+
+
+def encode_session(data: Dict[str, Any]) -> str:
+    """JSON with datetimes preserved (created_at, last_activity...)"""
+    return json.dumps(data, ensure_ascii=False, default=_encode_value)
+
+
+def decode_session(payload: str) -> Dict[str, Any]:
+    return json.loads(payload, object_hook=_decode_object)
+
+
+class SessionStore(ABC):
+    """Contract for guest session storage"""
+
+    backend = "abstract"
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session data, or None if missing or expired"""
+
+    @abstractmethod
+    def put(self, session_id: str, data: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        """Store a session; its TTL restarts now"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        """Remove a session; True if it existed"""
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Evict expired sessions; returns how many were removed"""
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Session count, bytes held and evictions by reason"""
+
+    def close(self) -> None:
+        """Release resources"""
+
+
+@dataclass
+class _Entry:
+    data: Dict[str, Any]
+    size: int
+    expires_at: float
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store: LRU order, per-entry TTL, session and byte limits"""
+
+    backend = "memory"
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = RLock()
+        self.evictions = {reason: 0 for reason in EVICTION_REASONS}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                self._evict(session_id, "ttl")
+                self.misses += 1
+                return None
+            self._entries.move_to_end(session_id)
+            self.hits += 1
+            return entry.data
+
+    def put(self, session_id: str, data: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        # Serialized size is the budget unit - close to what the shared store holds
+        size = len(encode_session(data).encode("utf-8"))
+        expires_at = self._clock() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            previous = self._entries.pop(session_id, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[session_id] = _Entry(data, size, expires_at)
+            self._bytes += size
+            self._enforce_limits(keep=session_id)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._entries.pop(session_id, None)
+            if entry is None:
+                return False
+            self._bytes -= entry.size
+            return True
+
+    def sweep(self) -> int:
+        now = self._clock()
+        with self._lock:
+            expired = [sid for sid, entry in self._entries.items() if entry.expires_at <= now]
+            for session_id in expired:
+                self._evict(session_id, "ttl")
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "backend": self.backend,
+                "sessions": len(self._entries),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "evictions": dict(self.evictions),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        entry = self._entries.pop(session_id)
+        self._bytes -= entry.size
+        self.evictions[reason] += 1
+
+    def _enforce_limits(self, keep: str) -> None:
+        """Drop least recently used sessions (never the one just written)"""
+        while len(self._entries) > self.max_sessions:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._evict(oldest, "lru")
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._evict(oldest, "bytes")
+
+
+class SqliteSessionStore(SessionStore):
+    """Shared store for multi-worker deployments (one SQLite file, WAL mode)"""
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        db_path: str = "data/sessions.db",
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        # Wall clock - expiry times are shared between processes
+        self._clock = clock
+        self._lock = RLock()
+        self.evictions = {reason: 0 for reason in EVICTION_REASONS}
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS guest_sessions (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_guest_sessions_expires ON guest_sessions(expires_at)")
+        logger.info(f"Guest session store (sqlite) at {db_path}")
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data FROM guest_sessions WHERE session_id = ? AND expires_at > ?",
+                (session_id, self._clock())
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return decode_session(row[0])
+
+    def put(self, session_id: str, data: Dict[str, Any], ttl_seconds: Optional[float] = None) -> None:
+        payload = encode_session(data)
+        now = self._clock()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO guest_sessions (session_id, data, size, expires_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    data = excluded.data, size = excluded.size,
+                    expires_at = excluded.expires_at, updated_at = excluded.updated_at
+                """,
+                (session_id, payload, len(payload.encode("utf-8")), expires_at, now)
+            )
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._db.execute("DELETE FROM guest_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def sweep(self) -> int:
+        with self._lock:
+            expired = self._db.execute(
+                "DELETE FROM guest_sessions WHERE expires_at <= ?", (self._clock(),)
+            ).rowcount
+            self.evictions["ttl"] += expired
+
+            # Session cap: drop the least recently written beyond max_sessions
+            overflow = self._db.execute(
+                """
+                DELETE FROM guest_sessions WHERE session_id IN (
+                    SELECT session_id FROM guest_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_sessions,)
+            ).rowcount
+            self.evictions["lru"] += overflow
+        return expired + overflow
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions, size = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM guest_sessions"
+            ).fetchone()
+            return {
+                "backend": self.backend,
+                "sessions": sessions,
+                "bytes": size,
+                "max_sessions": self.max_sessions,
+                "max_bytes": None,
+                "evictions": dict(self.evictions),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def create_session_store(
+    backend: str = "memory",
+    ttl_seconds: float = DEFAULT_TTL_SECONDS,
+    max_sessions: int = DEFAULT_MAX_SESSIONS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    db_path: str = "data/sessions.db"
+) -> SessionStore:
+    """Store for the configured backend (memory | sqlite)"""
+    if backend == "sqlite":
+        return SqliteSessionStore(db_path, ttl_seconds, max_sessions)
+    if backend != "memory":
+        logger.warning(f"⚠️ Unknown session store '{backend}', using memory")
+    return MemorySessionStore(ttl_seconds, max_sessions, max_bytes)
+
+
+async def run_sweeper(store: Any, interval_seconds: float, label: str = "guest sessions") -> None:
+    """Evict expired entries periodically (in a thread - the SQLite backends block)
+
+    Works with anything that has `sweep() -> int` (session stores, quota engines).
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            removed = await asyncio.to_thread(store.sweep)
+            if removed:
+                logger.info(f"🧹 Evicted {removed} {label}")
+        except Exception as e:
+            logger.error(f"Sweep of {label} failed: {e}")
+
+
+def render_prometheus(stats: Dict[str, Any]) -> str:
+    """Session store gauges and eviction counters in Prometheus text format"""
+    backend = {"backend": stats["backend"]}
+    return "".join([
+        emit("legal_chat_guest_sessions", "gauge", "Guest sessions currently stored", [(backend, stats["sessions"])]),
+        emit("legal_chat_guest_session_bytes", "gauge",
+             "Serialized size of stored guest sessions", [(backend, stats["bytes"])]),
+        emit("legal_chat_guest_session_evictions_total", "counter", "Guest sessions evicted, by reason", [
+            ({**backend, "reason": reason}, count) for reason, count in stats["evictions"].items()
+        ]),
+    ])
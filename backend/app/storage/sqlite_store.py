@@ -2,9 +2,12 @@
 SQLite Vector Store Implementation
 File-based vector storage perfect for development and small-scale production
 """
+import os
+import time
 import pickle
 import json
 import sqlite3
+import asyncio
 import aiosqlite
 import numpy as np
 from pathlib import Path
@@ -14,9 +17,19 @@ from datetime import datetime
 import logging
 
 from .vector_store import VectorStore, Chunk, SearchResult, StorageStats
+from app.retrieval.snippet_extractor import normalize_rows
+from app.retrieval.article_index import ArticleLocation, find_article_spans, normalize_law_title
+from app.retrieval.hierarchical_index import DEFAULT_MAX_GROUPS, HierarchicalIndex, group_key
+from app.core.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Seconds between checks for chunk writes made by other processes (ingestion, workers)
+HIERARCHY_INDEX_TTL = float(os.getenv("HIERARCHY_INDEX_TTL", "60"))
+
+# Changes on any insert, replace, delete or embedding update - without a table read per search
+CHUNKS_VERSION_SQL = "SELECT COUNT(embedding), MAX(rowid), MAX(updated_at) FROM chunks"
+
 
 class SqliteVectorStore(VectorStore):
     """
@@ -37,6 +50,13 @@ class SqliteVectorStore(VectorStore):
         self.db_path = db_path
         self.initialized = False
         
+        # Law/chapter retrieval index, rebuilt lazily after any write
+        self._hierarchy: Optional[HierarchicalIndex] = None
+        self._hierarchy_version: Optional[tuple] = None
+        self._hierarchy_checked_at = 0.0
+        self.hierarchy_ttl = HIERARCHY_INDEX_TTL
+        self._hierarchy_lock = asyncio.Lock()
+        
         # Ensure data directory exists
         db_dir = Path(db_path).parent
         db_dir.mkdir(exist_ok=True)
@@ -69,6 +89,33 @@ class SqliteVectorStore(VectorStore):
                     )
                 """)
                 
+                # Add columns introduced after the initial schema
+                await self._ensure_columns(db, {
+                    "sentence_spans": "TEXT",
+                    "sentence_embeddings": "BLOB",
+                    "doc_kind": "TEXT",
+                    "authority_score": "REAL",
+                    "citation_value": "REAL",
+                    "doc_style": "TEXT",
+                    "article_citations": "TEXT"
+                })
+                
+                # Statute article lookup: normalized law title + article number -> chunk span
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS article_index (
+                        law_key TEXT NOT NULL,
+                        law_title TEXT NOT NULL,
+                        article_number INTEGER NOT NULL,
+                        chunk_id TEXT NOT NULL,
+                        span_start INTEGER NOT NULL,
+                        span_end INTEGER NOT NULL
+                    )
+                """)
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_article_index_chunk 
+                    ON article_index(chunk_id)
+                """)
+                
                 # Create index on title for faster searches
                 await db.execute("""
                     CREATE INDEX IF NOT EXISTS idx_chunks_title 
@@ -90,6 +137,69 @@ class SqliteVectorStore(VectorStore):
             logger.error(f"Failed to initialize SQLite store: {e}")
             raise
     
+    async def _ensure_columns(self, db: aiosqlite.Connection, columns: Dict[str, str]) -> None:
+        """Add missing columns to the chunks table (lightweight in-place migration)"""
+        async with db.execute("PRAGMA table_info(chunks)") as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+        
+        for name, column_type in columns.items():
+            if name not in existing:
+                await db.execute(f"ALTER TABLE chunks ADD COLUMN {name} {column_type}")
+                logger.info(f"🛠️ Added chunks.{name} column")
+    
+    @staticmethod
+    def _encode_sentence_embeddings(sentence_embeddings: Optional[Any]) -> Optional[bytes]:
+        """Pack sentence embeddings as a normalized float16 matrix (rows x dims header + data)"""
+        if sentence_embeddings is None or not len(sentence_embeddings):
+            return None
+        
+        matrix = normalize_rows(np.asarray(sentence_embeddings, dtype=np.float32))
+        header = np.array(matrix.shape, dtype=np.int32).tobytes()
+        return header + matrix.astype(np.float16).tobytes()
+    
+    @staticmethod
+    def _decode_sentence_embeddings(blob: Optional[bytes]) -> Optional[np.ndarray]:
+        """Unpack sentence embeddings stored by _encode_sentence_embeddings"""
+        if not blob:
+            return None
+        
+        rows, dims = np.frombuffer(blob[:8], dtype=np.int32)
+        matrix = np.frombuffer(blob[8:], dtype=np.float16)
+        return matrix.reshape(int(rows), int(dims)).astype(np.float32)
+    
+    @staticmethod
+    def _feature_fields(values: tuple) -> Dict[str, Any]:
+        """Map (doc_kind, authority_score, citation_value, doc_style) columns onto Chunk fields"""
+        doc_kind, authority_score, citation_value, doc_style = values
+        return {
+            "doc_kind": doc_kind,
+            "authority_score": authority_score,
+            "citation_value": citation_value,
+            "doc_style": doc_style
+        }
+    
+    async def _attach_sentence_data(self, db: aiosqlite.Connection, chunks: List[Chunk]) -> None:
+        """Load sentence spans/embeddings and article citations only for the chunks that made the cut"""
+        if not chunks:
+            return
+        
+        by_id = {chunk.id: chunk for chunk in chunks}
+        placeholders = ",".join("?" * len(by_id))
+        async with db.execute(f"""
+            SELECT id, sentence_spans, sentence_embeddings, article_citations
+            FROM chunks WHERE id IN ({placeholders})
+        """, list(by_id.keys())) as cursor:
+            rows = await cursor.fetchall()
+        
+        for chunk_id, spans_json, embeddings_blob, citations_json in rows:
+            chunk = by_id[chunk_id]
+            try:
+                chunk.sentence_spans = json.loads(spans_json) if spans_json else None
+                chunk.sentence_embeddings = self._decode_sentence_embeddings(embeddings_blob)
+                chunk.article_citations = json.loads(citations_json) if citations_json is not None else None
+            except Exception as e:
+                logger.warning(f"Failed to load sentence data for chunk {chunk_id}: {e}")
+    
     async def store_chunks(self, chunks: List[Chunk]) -> bool:
         """Store chunks in SQLite database"""
         if not self.initialized:
@@ -101,21 +211,34 @@ class SqliteVectorStore(VectorStore):
                     # Serialize embedding as JSON (more portable than BLOB)
                     embedding_json = json.dumps(chunk.embedding) if chunk.embedding else None
                     metadata_json = json.dumps(chunk.metadata) if chunk.metadata else "{}"
+                    spans_json = json.dumps(chunk.sentence_spans) if chunk.sentence_spans else None
                     
                     # Use INSERT OR REPLACE for upsert behavior
                     await db.execute("""
                         INSERT OR REPLACE INTO chunks 
-                        (id, content, title, embedding, metadata, updated_at)
-                        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                        (id, content, title, embedding, metadata,
+                         sentence_spans, sentence_embeddings,
+                         doc_kind, authority_score, citation_value, doc_style,
+                         article_citations, updated_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
                     """, (
                         chunk.id,
                         chunk.content,
                         chunk.title,
                         embedding_json,
-                        metadata_json
+                        metadata_json,
+                        spans_json,
+                        self._encode_sentence_embeddings(chunk.sentence_embeddings),
+                        chunk.doc_kind,
+                        chunk.authority_score,
+                        chunk.citation_value,
+                        chunk.doc_style,
+                        json.dumps(chunk.article_citations, ensure_ascii=False) if chunk.article_citations is not None else None
                     ))
+                    await self._index_articles(db, chunk)
                 
                 await db.commit()
+            self._hierarchy = None
                 
             logger.info(f"Successfully stored {len(chunks)} chunks")
             return True
@@ -124,6 +247,48 @@ class SqliteVectorStore(VectorStore):
             logger.error(f"Failed to store chunks: {e}")
             return False
     
+    async def _index_articles(self, db: aiosqlite.Connection, chunk: Chunk) -> None:
+        """Replace the chunk's article index rows with the spans recorded by the chunker"""
+        await db.execute("DELETE FROM article_index WHERE chunk_id = ?", (chunk.id,))
+        
+        metadata = chunk.metadata or {}
+        law_title = metadata.get('law_title') or chunk.title
+        structure = metadata.get('legal_structure') or {}
+        spans = structure.get('article_spans')
+        if spans is None:
+            # Small documents are stored whole without passing through the chunker
+            spans = find_article_spans(chunk.content)
+        
+        if not spans or not normalize_law_title(law_title):
+            return
+        
+        await db.executemany("""
+            INSERT INTO article_index
+            (law_key, law_title, article_number, chunk_id, span_start, span_end)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (normalize_law_title(law_title), law_title, span['article_number'], chunk.id, span['start'], span['end'])
+            for span in spans
+        ])
+    
+    async def load_article_index(self) -> List[ArticleLocation]:
+        """All article index rows, in insertion order"""
+        if not self.initialized:
+            await self.initialize()
+        
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                async with db.execute("""
+                    SELECT law_title, article_number, chunk_id, span_start, span_end
+                    FROM article_index ORDER BY rowid
+                """) as cursor:
+                    rows = await cursor.fetchall()
+            return [ArticleLocation(*row) for row in rows]
+            
+        except Exception as e:
+            logger.error(f"Failed to load article index: {e}")
+            return []
+    
     async def search_similar(
     self, 
     query_vector: List[float], 
@@ -148,14 +313,14 @@ class SqliteVectorStore(VectorStore):
                 logger.info("🔍 Domain filtering disabled - searching all documents")
                 # Step 2: Get domain-filtered chunks with embeddings
                 base_query = """
-                    SELECT id, content, title, embedding, metadata 
+                    SELECT id, content, title, embedding, metadata,
+                           doc_kind, authority_score, citation_value, doc_style
                     FROM chunks 
                     WHERE embedding IS NOT NULL
                 """
                 
                 # Add domain filter
-                print(f"🔥 FILTER DEBUG: domain_filter_sql = '{domain_filter_sql}'")
-                print(f"🔥 FILTER DEBUG: domain_filter_sql != '1=1' = {domain_filter_sql != '1=1'}")
+                logger.debug(f"🔥 FILTER DEBUG: domain_filter_sql = '{domain_filter_sql}'")
                 if domain_filter_sql != "1=1":
                     query_sql = f"{base_query} AND ({domain_filter_sql})"
                 else:
@@ -169,7 +334,7 @@ class SqliteVectorStore(VectorStore):
                         params.append(f'%"{key}":"{value}"%')
 
 
-                print(f"🔍 EXECUTING SQL: {query_sql[:200]}...")
+                logger.debug(f"🔍 EXECUTING SQL: {query_sql[:200]}...")
                 async with db.execute(query_sql, params) as cursor:
                     rows = await cursor.fetchall()
                     
@@ -185,7 +350,7 @@ class SqliteVectorStore(VectorStore):
                 processed_count = 0
                 
                 for row in rows:
-                    chunk_id, content, title, embedding_data, metadata_json = row
+                    chunk_id, content, title, embedding_data, metadata_json = row[:5]
                     
                     try:
                         # Unpickle the stored embedding
@@ -207,7 +372,8 @@ class SqliteVectorStore(VectorStore):
                             content=content,
                             title=title,
                             embedding=chunk_embedding,
-                            metadata=metadata
+                            metadata=metadata,
+                            **self._feature_fields(row[5:])
                         )
                         
                         results.append(SearchResult(
@@ -227,12 +393,113 @@ class SqliteVectorStore(VectorStore):
                 logger.info(f"Successfully processed {processed_count} chunks, returning top {top_k}")
                 logger.info(f"Top result similarity: {results[0].similarity_score:.3f}" if results else "No results")
                 
-                return results[:top_k]
+                top_results = results[:top_k]
+                await self._attach_sentence_data(db, [result.chunk for result in top_results])
+                
+                return top_results
                 
         except Exception as e:
             logger.error(f"Failed to search similar chunks: {e}")
             return []
 
+    def _hierarchy_is_fresh(self) -> bool:
+        return self._hierarchy is not None and time.monotonic() - self._hierarchy_checked_at < self.hierarchy_ttl
+    
+    async def _load_hierarchy(self, db: aiosqlite.Connection) -> HierarchicalIndex:
+        """
+        Embedding matrix grouped by law/chapter, parsed once and reused until the chunks change
+        
+        Writes through this store drop it right away; writes by other processes
+        are noticed by a data-version check at most every HIERARCHY_INDEX_TTL
+        seconds. One rebuild at a time - concurrent cold searches wait for it.
+        """
+        if self._hierarchy_is_fresh():
+            return self._hierarchy
+        
+        async with self._hierarchy_lock:
+            if self._hierarchy_is_fresh():
+                return self._hierarchy
+            async with db.execute(CHUNKS_VERSION_SQL) as cursor:
+                version = tuple(await cursor.fetchone())
+            if self._hierarchy is None or version != self._hierarchy_version:
+                with span("hierarchy_build"):
+                    self._hierarchy = await self._build_hierarchy(db)
+                self._hierarchy_version = version
+            self._hierarchy_checked_at = time.monotonic()
+        return self._hierarchy
+    
+    async def _build_hierarchy(self, db: aiosqlite.Connection) -> HierarchicalIndex:
+        async with db.execute("""
+            SELECT id, title, embedding, metadata
+            FROM chunks WHERE embedding IS NOT NULL
+        """) as cursor:
+            rows = await cursor.fetchall()
+        
+        entries = []
+        for chunk_id, title, embedding_json, metadata_json in rows:
+            try:
+                metadata = json.loads(metadata_json) if metadata_json else {}
+                entries.append((chunk_id, json.loads(embedding_json), group_key(title, metadata)))
+            except Exception as e:
+                logger.warning(f"Skipping chunk {chunk_id} in hierarchical index: {e}")
+        
+        return HierarchicalIndex.build(entries)
+    
+    async def search_hierarchical(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        max_groups: int = DEFAULT_MAX_GROUPS
+    ) -> List[SearchResult]:
+        """
+        Two-stage search: law/chapter centroids choose candidate groups,
+        then only those groups' chunk vectors are scored
+        """
+        if not self.initialized:
+            await self.initialize()
+        
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                hierarchy = await self._load_hierarchy(db)
+                ranked, stats = hierarchy.search(query_vector, top_k, max_groups)
+                if not ranked:
+                    return []
+                
+                logger.info(
+                    f"🗂️ Hierarchical search: {stats.groups_selected}/{stats.groups_scored} groups, "
+                    f"{stats.candidates_scored}/{stats.total_chunks} chunks scored"
+                )
+                
+                scores = dict(ranked)
+                placeholders = ",".join("?" * len(scores))
+                async with db.execute(f"""
+                    SELECT id, content, title, embedding, metadata,
+                           doc_kind, authority_score, citation_value, doc_style
+                    FROM chunks WHERE id IN ({placeholders})
+                """, list(scores.keys())) as cursor:
+                    rows = await cursor.fetchall()
+                
+                results = []
+                for row in rows:
+                    chunk_id, content, title, embedding_json, metadata_json = row[:5]
+                    chunk = Chunk(
+                        id=chunk_id,
+                        content=content,
+                        title=title,
+                        embedding=json.loads(embedding_json) if embedding_json else None,
+                        metadata=json.loads(metadata_json) if metadata_json else {},
+                        **self._feature_fields(row[5:])
+                    )
+                    results.append(SearchResult(chunk=chunk, similarity_score=scores[chunk_id]))
+                
+                results.sort(key=lambda x: x.similarity_score, reverse=True)
+                await self._attach_sentence_data(db, [result.chunk for result in results])
+                return results
+                
+        except Exception as e:
+            logger.error(f"Failed hierarchical search: {e}")
+            return []
+
     async def get_chunk_by_id(self, chunk_id: str) -> Optional[Chunk]:
         """Retrieve a specific chunk by ID"""
         if not self.initialized:
@@ -241,7 +508,8 @@ class SqliteVectorStore(VectorStore):
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 async with db.execute("""
-                    SELECT id, content, title, embedding, metadata 
+                    SELECT id, content, title, embedding, metadata,
+                           doc_kind, authority_score, citation_value, doc_style
                     FROM chunks WHERE id = ?
                 """, (chunk_id,)) as cursor:
                     row = await cursor.fetchone()
@@ -249,19 +517,23 @@ class SqliteVectorStore(VectorStore):
                 if not row:
                     return None
                 
-                chunk_id, content, title, embedding_json, metadata_json = row
+                chunk_id, content, title, embedding_json, metadata_json = row[:5]
                 
                 # Parse embedding and metadata
                 embedding = json.loads(embedding_json) if embedding_json else None
                 metadata = json.loads(metadata_json) if metadata_json else {}
                 
-                return Chunk(
+                chunk = Chunk(
                     id=chunk_id,
                     content=content,
                     title=title,
                     embedding=embedding,
-                    metadata=metadata
+                    metadata=metadata,
+                    **self._feature_fields(row[5:])
                 )
+                await self._attach_sentence_data(db, [chunk])
+                
+                return chunk
                 
         except Exception as e:
             logger.error(f"Failed to get chunk {chunk_id}: {e}")
@@ -283,9 +555,14 @@ class SqliteVectorStore(VectorStore):
                     f"DELETE FROM chunks WHERE id IN ({placeholders})",
                     chunk_ids
                 )
+                await db.execute(
+                    f"DELETE FROM article_index WHERE chunk_id IN ({placeholders})",
+                    chunk_ids
+                )
                 
                 await db.commit()
                 deleted_count = result.rowcount
+                self._hierarchy = None
                 
                 logger.info(f"Deleted {deleted_count} chunks")
                 return deleted_count
@@ -362,7 +639,9 @@ class SqliteVectorStore(VectorStore):
         try:
             async with aiosqlite.connect(self.db_path) as db:
                 await db.execute("DELETE FROM chunks")
+                await db.execute("DELETE FROM article_index")
                 await db.commit()
+            self._hierarchy = None
                 
             logger.info("Cleared all chunks from SQLite store")
             return True
@@ -17,6 +17,16 @@ class Chunk:
     title: str
     embedding: Optional[List[float]] = None
     metadata: Optional[Dict[str, Any]] = None
+    # Sentence/article offsets and their embeddings (precomputed at ingestion)
+    sentence_spans: Optional[List[List[int]]] = None
+    sentence_embeddings: Optional[Any] = None
+    # Static document features (precomputed at ingestion)
+    doc_kind: Optional[str] = None
+    authority_score: Optional[float] = None
+    citation_value: Optional[float] = None
+    doc_style: Optional[str] = None
+    # Normalized article citations found in the content ("المادة (12)")
+    article_citations: Optional[List[str]] = None
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert chunk to dictionary"""
@@ -25,7 +35,13 @@ class Chunk:
             "content": self.content,
             "title": self.title,
             "embedding": self.embedding,
-            "metadata": self.metadata or {}
+            "metadata": self.metadata or {},
+            "sentence_spans": self.sentence_spans,
+            "doc_kind": self.doc_kind,
+            "authority_score": self.authority_score,
+            "citation_value": self.citation_value,
+            "doc_style": self.doc_style,
+            "article_citations": self.article_citations
         }
     
     @classmethod
@@ -36,7 +52,13 @@ class Chunk:
             content=data["content"],
             title=data["title"],
             embedding=data.get("embedding"),
-            metadata=data.get("metadata", {})
+            metadata=data.get("metadata", {}),
+            sentence_spans=data.get("sentence_spans"),
+            doc_kind=data.get("doc_kind"),
+            authority_score=data.get("authority_score"),
+            citation_value=data.get("citation_value"),
+            doc_style=data.get("doc_style"),
+            article_citations=data.get("article_citations")
         )
 
 
@@ -216,4 +238,32 @@ class VectorStore(ABC):
             bool: True if chunk exists, False otherwise
         """
         chunk = await self.get_chunk_by_id(chunk_id)
-        return chunk is not None
\ No newline at end of file
+        return chunk is not None
+
+    async def search_hierarchical(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        max_groups: int = 8
+    ) -> List[SearchResult]:
+        """
+        Two-stage law/chapter -> chunk search
+        
+        Args:
+            query_vector: Query embedding vector
+            top_k: Number of results to return
+            max_groups: Law/chapter groups to expand in the second stage
+            
+        Returns:
+            List[SearchResult]: Flat similarity search for backends without a hierarchy
+        """
+        return await self.search_similar(query_vector, top_k=top_k)
+    
+    async def load_article_index(self) -> List[Any]:
+        """
+        Load statute article locations (law title, article number, chunk span)
+        
+        Returns:
+            List[ArticleLocation]: Empty for backends without an article index
+        """
+        return []
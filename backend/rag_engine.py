@@ -5,16 +5,33 @@ Natural conversations + Smart document retrieval + Dynamic prompt selection
 """
 
 import os
+import time
+import asyncio
 import logging
+from contextlib import aclosing
 from datetime import datetime
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
-from typing import List, Dict, Optional, AsyncIterator
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Union
 import json
 
 # Import the smart database components from old RAG
-from app.storage.vector_store import VectorStore, Chunk
+from app.storage.vector_store import VectorStore, Chunk, SearchResult
 from app.storage.sqlite_store import SqliteVectorStore
+from app.retrieval.snippet_extractor import extract_snippet, DEFAULT_SNIPPET_CHARS
+from app.retrieval.document_features import (
+    feature_columns, normalize_similarities, style_match_scores, composite_scores
+)
+from app.legal_reasoning.ai_style_classifier import AIStyleClassifier
+from app.core.llm_gateway import LLMGateway
+from app.core.provider_router import LLMProvider, ProviderRouter
+from app.core.request_coalescer import SingleFlight, StreamCoalescer, normalize_query
+from app.core.citation_postprocessor import StreamingCitationFixer, statute_titles_from
+from app.core.prompt_controller import CitationValidator, StreamingCitationValidator
+from app.core.deadline import Deadline
+from app.core.tracing import observe, span
+from app.retrieval.article_index import ArticleIndex, parse_article_reference
+from app.retrieval.adaptive_cutoff import adaptive_cutoff, category_limits
 from enum import Enum
 
 class ProcessingMode(Enum):
@@ -24,7 +41,7 @@ class ProcessingMode(Enum):
     COMPREHENSIVE = "comprehensive" # PLANNING_ACTION: Full analysis
 
 class SimpleCitationFixer:
-    """MEMO-AWARE Citation Fixer - Removes ALL memo citations of any type"""
+    """MEMO-AWARE Citation Fixer - Removes ALL memo citations of any type (full-text; the stream uses StreamingCitationFixer)"""
     
     def fix_citations(self, ai_response: str, available_documents: List[Chunk]) -> str:
         """Remove ALL memo citations and enhance statute citations"""
@@ -222,43 +239,56 @@ logger = logging.getLogger(__name__)
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-# Initialize AI client - prioritize OpenAI, fallback to DeepSeek
-# Fix for httpx compatibility issue
-try:
-    if OPENAI_API_KEY:
-        ai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
-        ai_model = "gpt-4o"
-        classification_model = "gpt-4o-mini"  # Small model for classification
-        print("✅ Using OpenAI for intelligent legal AI with classification")
-    elif DEEPSEEK_API_KEY:
-        ai_client = AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url="https://api.deepseek.com/v1")
-        ai_model = "deepseek-chat"
-        classification_model = "deepseek-chat"
-        print("✅ Using DeepSeek for intelligent legal AI with classification")
-    else:
-        raise ValueError("❌ Either OPENAI_API_KEY or DEEPSEEK_API_KEY must be provided")
-except TypeError as e:
-    # Fallback for httpx compatibility issues
-    import httpx
-    if OPENAI_API_KEY:
-        ai_client = AsyncOpenAI(
-            api_key=OPENAI_API_KEY,
-            http_client=httpx.AsyncClient()
-        )
-        ai_model = "gpt-4o"
-        classification_model = "gpt-4o-mini"
-        print("✅ Using OpenAI with custom http client")
-    elif DEEPSEEK_API_KEY:
-        ai_client = AsyncOpenAI(
-            api_key=DEEPSEEK_API_KEY, 
-            base_url="https://api.deepseek.com/v1",
-            http_client=httpx.AsyncClient()
-        )
-        ai_model = "deepseek-chat"
-        classification_model = "deepseek-chat"
-        print("✅ Using DeepSeek with custom http client")
-    else:
-        raise ValueError("❌ Either OPENAI_API_KEY or DEEPSEEK_API_KEY must be provided")
+# Provider endpoints (overridable, e.g. to point at local stub servers)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None = SDK default
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com/v1")
+
+# Answer length budget; each provider clamps it to its model's output limit
+ANSWER_MAX_TOKENS = int(os.getenv("ANSWER_MAX_TOKENS", "15000"))
+
+
+def _create_provider_client(api_key: str, base_url: Optional[str]) -> AsyncOpenAI:
+    """OpenAI-compatible client. SDK retries are disabled - the gateway owns the retry policy."""
+    try:
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+    except TypeError:
+        # Fix for httpx compatibility issue
+        import httpx
+        return AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=httpx.AsyncClient(), max_retries=0)
+
+
+# Initialize AI providers - prioritize OpenAI, fallback to DeepSeek
+ai_providers: Dict[str, LLMProvider] = {}
+if OPENAI_API_KEY:
+    ai_providers["openai"] = LLMProvider(
+        name="openai",
+        gateway=LLMGateway.from_env(_create_provider_client(OPENAI_API_KEY, OPENAI_BASE_URL)),
+        chat_model="gpt-4o",
+        classification_model="gpt-4o-mini",  # Small model for classification
+        max_output_tokens=int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "16384"))
+    )
+if DEEPSEEK_API_KEY:
+    ai_providers["deepseek"] = LLMProvider(
+        name="deepseek",
+        gateway=LLMGateway.from_env(_create_provider_client(DEEPSEEK_API_KEY, DEEPSEEK_BASE_URL)),
+        chat_model="deepseek-chat",
+        classification_model="deepseek-chat",
+        max_output_tokens=int(os.getenv("DEEPSEEK_MAX_OUTPUT_TOKENS", "8192"))
+    )
+if not ai_providers:
+    raise ValueError("❌ Either OPENAI_API_KEY or DEEPSEEK_API_KEY must be provided")
+
+# Failover order for streamed answers (AI_PROVIDER picks the primary)
+_primary_name = os.getenv("AI_PROVIDER", "openai").lower()
+_provider_order = sorted(ai_providers, key=lambda name: (name != _primary_name, name != "openai"))
+provider_router = ProviderRouter.from_env([ai_providers[name] for name in _provider_order])
+
+# Every AI call goes through the primary provider's gateway (concurrency caps, rate limits, retries, metrics)
+ai_client = provider_router.primary.gateway
+ai_model = provider_router.primary.chat_model
+classification_model = provider_router.primary.classification_model
+print(f"✅ Using {provider_router.primary.name} for intelligent legal AI with classification "
+      f"(failover: {' → '.join(_provider_order)})")
 
 
 # DYNAMIC PROMPTS - NO HARD-CODING OF CATEGORIES
@@ -447,216 +477,37 @@ PROMPT_TEMPLATES = {
 }
 
 
-async def score_documents_multi_objective(documents: List[Chunk], original_query: str, user_intent: str, ai_client) -> List[Dict]:
+def score_documents_multi_objective(search_results: List[SearchResult], user_intent: str) -> List[Dict]:
     """
-    Score documents on multiple objectives for intelligent selection
-    Returns list of documents with scores for different objectives
+    Score candidates on multiple objectives for intelligent selection
+    Relevance comes from the similarity score; citation value and style are
+    static features stored at ingestion, so scoring is one vectorized pass.
     """
     
-    if not documents:
+    if not search_results:
         return []
     
-    scoring_prompt = f"""
-You are an expert legal document analyst. Score these legal documents for their value in responding to this query.
-
-Query: {original_query}
-Intent: {user_intent}
-
-For each document, provide scores (0.0-1.0) for these objectives:
-
-1. RELEVANCE: How directly related to the query topic
-2. CITATION_VALUE: Potential for legal citations (statutes > precedents > memos)  
-3. STYLE_MATCH: Fits aggressive/defensive memo style for disputes
-
-Documents to score:
-"""
-
-    # Add document previews for scoring (cleaned for JSON safety)
-    for i, doc in enumerate(documents, 1):
-        # Clean content to avoid JSON parsing issues
-        # Enhanced JSON-safe cleaning
-        clean_content = (doc.content
-                .replace('"', "'")
-                .replace('\n', ' ')
-                .replace('\r', ' ')
-                .replace('\\', '\\\\')  # Escape backslashes
-                .replace('\t', ' ')     # Replace tabs
-                .replace('\b', ' ')     # Replace backspace
-                .replace('\f', ' '))    # Replace form feed
-        preview = clean_content[:150] + "..." if len(clean_content) > 150 else clean_content
-        # JSON-safe title cleaning
-        clean_title = (doc.title
-              .replace('"', "'")
-              .replace('\\', '\\\\')
-              .replace('\n', ' ')
-              .replace('\r', ' '))
-        scoring_prompt += f"\nDocument {i}: {clean_title}\nContent: {preview}\n"
+    chunks = [result.chunk for result in search_results]
+    features = feature_columns(chunks)
+    target_style = AIStyleClassifier.get_style_for_intent(user_intent)
     
-    scoring_prompt += f"""
-
-Respond with ONLY a JSON array with scores for each document:
-[
-  {{
-    "document_id": 1,
-    "relevance": 0.85,
-    "citation_value": 0.3,
-    "style_match": 0.9
-  }},
-  {{
-    "document_id": 2,
-    "relevance": 0.7,
-    "citation_value": 0.9,
-    "style_match": 0.2
-  }}
-]
-
-Score all {len(documents)} documents. Higher citation_value for statutes/regulations, higher style_match for aggressive memos.
-"""
-
-    try:
-        response = await self.ai_client.chat.completions.create(
-            model="gpt-4o-mini",  # Fast and cost-effective
-            messages=[{"role": "user", "content": scoring_prompt}],
-            temperature=0.1,
-            max_tokens=5000
-        )
-        
-        response_text = response.choices[0].message.content.strip()
-        
-        # Clean JSON response more thoroughly
-        response_text = response.choices[0].message.content.strip()
-        
-        # Remove markdown formatting
-        if response_text.startswith("```"):
-            lines = response_text.split('\n')
-            # Find JSON content between ``` markers
-            json_lines = []
-            in_json = False
-            for line in lines:
-                if line.strip().startswith("```"):
-                    in_json = not in_json
-                    continue
-                if in_json:
-                    json_lines.append(line)
-            response_text = '\n'.join(json_lines)
-        
-        # Additional cleaning for Arabic text issues
-        response_text = response_text.replace('\n', ' ').strip()
-        
-        import json
-        import re
-
-        try:
-            # First attempt: direct parsing
-            scores = json.loads(response_text)
-            logger.info(f"✅ JSON parsed successfully: {len(scores)} document scores")
-            
-        except json.JSONDecodeError as json_error:
-            logger.warning(f"Direct JSON parsing failed: {json_error}")
-            
-            try:
-                # Second attempt: extract JSON array from response
-                array_match = re.search(r'\[[\s\S]*\]', response_text)
-                if array_match:
-                    json_content = array_match.group(0)
-                    scores = json.loads(json_content)
-                    logger.info(f"✅ Extracted JSON parsed successfully: {len(scores)} document scores")
-                else:
-                    raise ValueError("No JSON array found in response")
-                    
-            except (json.JSONDecodeError, ValueError) as fallback_error:
-                logger.error(f"All JSON parsing failed: {fallback_error}")
-                logger.error(f"Raw response: {response_text[:300]}...")
-                
-                # Ultimate fallback: create balanced default scores
-                # STATUTE-PRIORITIZING fallback scores
-                # STATUTE-PRIORITIZING fallback scores
-                scores = []
-                for i in range(len(documents)):
-                    doc_title = documents[i].title.lower()
-                    
-                    # Detect REAL legal statutes vs case documents
-                    is_real_statute = (
-                        any(term in doc_title for term in ["نظام", "المادة", "لائحة", "مرسوم", "التعريفات", "قانون", "قرار وزاري"]) 
-                        and not any(exclude in doc_title for exclude in ["دفع", "حجة", "رقم", "مذكرة"])
-                    )
-                    is_case_document = any(term in doc_title for term in ["دفع", "حجة", "رقم"]) and not any(term in doc_title for term in ["نظام", "المادة", "لائحة"])
-                    is_memo = 'مذكرة' in doc_title
-                    
-                    # PRIORITIZE REAL LAWS ONLY
-                    if is_real_statute:
-                        scores.append({
-                            "document_id": i + 1,
-                            "relevance": 0.9,      # HIGHEST for real laws
-                            "citation_value": 0.95, # MAXIMUM citation value
-                            "style_match": 0.2     # Low style (laws aren't stylistic)
-                        })
-                        logger.info(f"⚖️ REAL LAW PRIORITY: {documents[i].title[:50]}... (citation: 0.95)")
-                    elif is_case_document:
-                        scores.append({
-                            "document_id": i + 1,
-                            "relevance": 0.6,      # Medium relevance for case examples
-                            "citation_value": 0.1, # VERY LOW citation (don't cite cases as laws!)
-                            "style_match": 0.8     # High style for case examples
-                        })
-                        logger.info(f"📋 CASE EXAMPLE: {documents[i].title[:50]}... (style: 0.8)")
-                    elif is_memo:
-                        scores.append({
-                            "document_id": i + 1,
-                            "relevance": 0.7,      # Good relevance for memos
-                            "citation_value": 0.1, # VERY LOW citation value (no memo citations!)
-                            "style_match": 0.8     # High style for memos
-                        })
-                        logger.info(f"📋 MEMO BACKGROUND: {documents[i].title[:50]}... (style: 0.8)")
-                    else:
-                        scores.append({
-                            "document_id": i + 1,
-                            "relevance": 0.6,
-                            "citation_value": 0.5,
-                            "style_match": 0.5
-                        })
-                logger.warning(f"⚠️ Using intelligent fallback scores for {len(scores)} documents")
-        
-        # Combine documents with their scores
-        scored_documents = []
-        for i, doc in enumerate(documents):
-            try:
-                # Find score for this document
-                doc_score = next((s for s in scores if s["document_id"] == i + 1), None)
-                if doc_score:
-                    scored_documents.append({
-                        "document": doc,
-                        "relevance": doc_score.get("relevance", 0.5),
-                        "citation_value": doc_score.get("citation_value", 0.5),
-                        "style_match": doc_score.get("style_match", 0.5),
-                        "document_id": i + 1
-                    })
-                else:
-                    # Fallback scoring
-                    scored_documents.append({
-                        "document": doc,
-                        "relevance": 0.5,
-                        "citation_value": 0.5,
-                        "style_match": 0.5,
-                        "document_id": i + 1
-                    })
-            except Exception as e:
-                logger.warning(f"Error processing document {i+1} score: {e}")
-                continue
-        
-        logger.info(f"🎯 Multi-objective scoring completed for {len(scored_documents)} documents")
-        return scored_documents
-        
-    except Exception as e:
-        logger.error(f"Multi-objective scoring failed: {e}")
-        # Fallback: return documents with default scores
-        return [{
-            "document": doc,
-            "relevance": 0.5,
-            "citation_value": 0.5,
-            "style_match": 0.5,
-            "document_id": i + 1
-        } for i, doc in enumerate(documents)]
+    relevance = normalize_similarities([result.similarity_score for result in search_results])
+    citation_value = features["citation_value"]
+    style_match = style_match_scores(features["doc_kind"], features["doc_style"], target_style)
+    composite = composite_scores(relevance, citation_value, style_match)
+    
+    scored_documents = [{
+        "document": chunk,
+        "doc_kind": features["doc_kind"][i],
+        "relevance": float(relevance[i]),
+        "citation_value": float(citation_value[i]),
+        "style_match": float(style_match[i]),
+        "composite_score": float(composite[i]),
+        "document_id": i + 1
+    } for i, chunk in enumerate(chunks)]
+    
+    logger.info(f"🎯 Multi-objective scoring completed for {len(scored_documents)} documents (target style: {target_style})")
+    return scored_documents
 
 
 def select_optimal_document_mix(scored_documents: List[Dict], top_k: int = 3) -> List[Chunk]:
@@ -668,22 +519,6 @@ def select_optimal_document_mix(scored_documents: List[Dict], top_k: int = 3) ->
     if not scored_documents:
         return []
     
-    # Calculate composite scores with weights
-    weights = {
-        "relevance": 0.4,      # 40% - must be relevant
-        "citation_value": 0.3, # 30% - need legal citations  
-        "style_match": 0.3     # 30% - need aggressive style
-    }
-    
-    # Add composite score to each document
-    for doc_data in scored_documents:
-        composite = (
-            doc_data["relevance"] * weights["relevance"] +
-            doc_data["citation_value"] * weights["citation_value"] +
-            doc_data["style_match"] * weights["style_match"]
-        )
-        doc_data["composite_score"] = composite
-    
     # Sort by composite score (highest first)
     scored_documents.sort(key=lambda x: x["composite_score"], reverse=True)
     
@@ -695,8 +530,7 @@ def select_optimal_document_mix(scored_documents: List[Dict], top_k: int = 3) ->
     memo_docs = []
     
     for doc_data in scored_documents:
-        doc_title = doc_data["document"].title
-        if any(term in doc_title for term in ["نظام", "المادة", "التعريفات", "مرسوم"]):
+        if doc_data["doc_kind"] == "statute":
             statute_docs.append(doc_data)
         else:
             memo_docs.append(doc_data)
@@ -758,6 +592,13 @@ class DocumentRetriever:
         self.storage = storage
         self.ai_client = ai_client
         self.initialized = False
+        
+        # Two-stage law/chapter -> chunk retrieval instead of scoring every chunk
+        self.hierarchical_enabled = os.getenv("HIERARCHICAL_RETRIEVAL_ENABLED", "true").lower() == "true"
+        self.hierarchical_groups = int(os.getenv("HIERARCHICAL_RETRIEVAL_GROUPS", "8"))
+        
+        # Variable-length results: stop at the first clear similarity drop
+        self.adaptive_top_k = os.getenv("ADAPTIVE_TOP_K_ENABLED", "true").lower() == "true"
         logger.info(f"DocumentRetriever initialized with {type(storage).__name__}")
     
     async def initialize(self) -> None:
@@ -774,6 +615,42 @@ class DocumentRetriever:
             logger.error(f"Failed to initialize retriever: {e}")
             raise
     
+    async def _vector_search(self, query_embedding: List[float], top_k: int, query_text: Optional[str] = None) -> List[SearchResult]:
+        """Hierarchical search when enabled, otherwise the flat similarity scan"""
+        async with span("vector_search", hierarchical=self.hierarchical_enabled):
+            if self.hierarchical_enabled:
+                return await self.storage.search_hierarchical(
+                    query_embedding, top_k=top_k, max_groups=self.hierarchical_groups
+                )
+            if query_text:
+                return await self.storage.search_similar(
+                    query_embedding, top_k=top_k, query_text=query_text, openai_client=self.ai_client
+                )
+            return await self.storage.search_similar(query_embedding, top_k=top_k)
+    
+    def _adaptive_top_k(
+        self,
+        search_results: List[SearchResult],
+        user_intent: Optional[str],
+        top_k: int,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> int:
+        """How many chunks to keep: up to the similarity gap/elbow, within the category's min/max"""
+        if not self.adaptive_top_k or not search_results:
+            return top_k
+        
+        min_k, max_k = category_limits(user_intent)
+        ranked = sorted((result.similarity_score for result in search_results), reverse=True)
+        kept, stats = adaptive_cutoff(ranked, min_k, min(max_k, top_k), user_intent or "")
+        
+        logger.info(
+            f"✂️ Adaptive top_k: keeping {kept}/{stats.candidates} ({stats.reason}, "
+            f"top={stats.top_score}, cutoff={stats.cutoff_score})"
+        )
+        if on_event:
+            on_event({"type": "retrieval_cutoff", **stats.to_dict()})
+        return kept
+    
     async def decompose_query_to_concepts(self, query: str) -> List[str]:
         """
         NUCLEAR OPTION 1: AI-driven query decomposition for precision targeting
@@ -816,7 +693,14 @@ class DocumentRetriever:
             return [query]
         
 
-    async def search_by_concepts(self, concepts: List[str], original_query: str, top_k: int = 15) -> List[Chunk]:
+    async def search_by_concepts(
+        self,
+        concepts: List[str],
+        original_query: str,
+        top_k: int = 15,
+        user_intent: Optional[str] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None
+    ) -> List[Chunk]:
         """
         PRECISION SEARCH: Intent-aware retrieval instead of keyword matching
         """
@@ -824,18 +708,18 @@ class DocumentRetriever:
         
         try:
             # KEY FIX: Use FULL original query, not fragmented concepts
-            response = await self.ai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=original_query  # ← Use complete query for better context
-            )
+            async with span("embedding"):
+                response = await self.ai_client.embeddings.create(
+                    model="text-embedding-ada-002",
+                    input=original_query  # ← Use complete query for better context
+                )
             query_embedding = response.data[0].embedding
             
             # Search with full query context
-            search_results = await self.storage.search_similar(
+            search_results = await self._vector_search(
                 query_embedding,
                 top_k=min(top_k * 2, 30),  # Get more candidates for filtering
-                query_text=original_query,
-                openai_client=self.ai_client
+                query_text=original_query
             )
             
             # Return top results (AI filtering comes next if needed)
@@ -845,7 +729,9 @@ class DocumentRetriever:
                 final_results.append(chunk)
             
             # AI-powered filtering to find the ANSWER document
+            top_k = self._adaptive_top_k(search_results, user_intent, top_k, on_event)
             filtered_results = await self._ai_filter_results(original_query, search_results, top_k)
+            self._attach_snippets(filtered_results, query_embedding)
             
             logger.info(f"✅ PRECISION SEARCH: AI filtered to {len(filtered_results)} answer documents")
             return filtered_results
@@ -854,6 +740,33 @@ class DocumentRetriever:
             logger.error(f"Precision search failed: {e}")
             return []
    
+    def _attach_snippets(self, chunks: List[Chunk], query_embedding: List[float]) -> None:
+        """
+        Select the best-matching sentence window of each chunk for the prompt
+        Uses sentence embeddings precomputed at ingestion - no extra API calls
+        """
+        snippet_count = 0
+        for chunk in chunks:
+            snippet = extract_snippet(
+                chunk.content,
+                chunk.sentence_embeddings,
+                chunk.sentence_spans,
+                query_embedding,
+                DEFAULT_SNIPPET_CHARS
+            )
+            if not snippet:
+                continue
+            
+            start, end, text = snippet
+            if chunk.metadata is None:
+                chunk.metadata = {}
+            chunk.metadata['snippet_span'] = [start, end]
+            chunk.metadata['snippet'] = text
+            snippet_count += 1
+        
+        if snippet_count:
+            logger.info(f"✂️ Query-aware snippets selected for {snippet_count}/{len(chunks)} chunks")
+
     async def _ai_filter_results(self, query: str, search_results: List, top_k: int) -> List[Chunk]:
         """
         Trust vector similarity ranking - no AI filtering needed
@@ -872,12 +785,23 @@ class DocumentRetriever:
         logger.info(f"✅ AI Filter: Successfully returning {len(chunks)} chunks to RAG engine")
         return chunks
 
-    async def get_relevant_documents(self, query: str, top_k: int = 3, user_intent: str = None) -> List[Chunk]:
+    async def get_relevant_documents(
+        self,
+        query: str,
+        top_k: int = 3,
+        user_intent: str = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Chunk]:
         """
         Mode-aware document retrieval with strategic processing:
         - LIGHTWEIGHT: Simple content retrieval
         - STRATEGIC: Smart semantic queries + batch processing  
         - COMPREHENSIVE: Full pipeline with style analysis
+        
+        `top_k` is an upper bound: the adaptive cutoff may keep fewer chunks and
+        reports its statistics to `on_event`. With a `deadline`, decomposition
+        and scoring are skipped when the budget runs low (plain vector top-k).
         """
         # Determine processing mode
         processing_mode = ProcessingMode.LIGHTWEIGHT  # Default
@@ -899,12 +823,18 @@ class DocumentRetriever:
             logger.info(f"📋 User intent: {user_intent}")
             
             # NUCLEAR OPTION 1: AI-driven concept decomposition for ALL queries
-            target_concepts = await self.decompose_query_to_concepts(query)
+            async with span("decomposition"):
+                if deadline:
+                    target_concepts = await deadline.run_optional(
+                        "decomposition", lambda: self.decompose_query_to_concepts(query), [query]
+                    )
+                else:
+                    target_concepts = await self.decompose_query_to_concepts(query)
 
             # Use precision search for high-accuracy targeting
             if len(target_concepts) > 1:
                 logger.info("🚀 NUCLEAR OPTION 1: Using precision concept-based search")
-                relevant_chunks = await self.search_by_concepts(target_concepts, query, top_k)
+                relevant_chunks = await self.search_by_concepts(target_concepts, query, top_k, user_intent, on_event)
                 logger.info(f"✅ NUCLEAR OPTION 1: Retrieved {len(relevant_chunks)} precisely targeted documents")
                 return relevant_chunks
             else:
@@ -920,10 +850,11 @@ class DocumentRetriever:
             for i, semantic_query in enumerate(semantic_queries):
                 try:
                     # Get embedding for this semantic query
-                    response = await self.ai_client.embeddings.create(
-                        model="text-embedding-ada-002",
-                        input=semantic_query
-                    )
+                    async with span("embedding"):
+                        response = await self.ai_client.embeddings.create(
+                            model="text-embedding-ada-002",
+                            input=semantic_query
+                        )
                     query_embedding = response.data[0].embedding
                     
                     # DEBUG: Check bypass condition
@@ -935,21 +866,22 @@ class DocumentRetriever:
                     if user_intent in ["ACTIVE_DISPUTE", "GENERAL_QUESTION"]:
                         logger.info(f"🔓 {user_intent} detected: Bypassing ALL domain filtering for query {i+1}")
                         # Search ALL documents without domain filtering for comprehensive legal analysis
-                        search_results = await self.storage.search_similar(
+                        search_results = await self._vector_search(
                             query_embedding, 
                             top_k=15  # Get more candidates since we're not filtering
-                            # No query_text, no openai_client = no domain filtering
+                            # No query_text = no domain filtering
                         )
                     else:
                         # Use normal domain filtering for other queries
                         expanded_top_k = min(top_k * 4, 15) if user_intent in ["ACTIVE_DISPUTE", "GENERAL_QUESTION"] else top_k * 4
-                        search_results = await self.storage.search_similar(
+                        search_results = await self._vector_search(
                             query_embedding, 
                             top_k=expanded_top_k, 
-                            query_text=semantic_query, 
-                            openai_client=self.ai_client
+                            query_text=semantic_query
                         )
                     
+                    self._attach_snippets([result.chunk for result in search_results], query_embedding)
+                    
                     # Tag results with semantic source for debugging
                     for result in search_results:
                         if not hasattr(result.chunk, 'metadata'):
@@ -993,21 +925,23 @@ class DocumentRetriever:
             
             logger.info(f"📊 Stage 2-3: Found {len(content_candidates)} content matches")
             
-            # STAGE 4: Direct multi-objective scoring (style classification bypassed)
-            if len(content_candidates) > top_k:
+            # Variable result size: stage 4 picks this many from the full candidate pool
+            top_k = self._adaptive_top_k(search_results, user_intent, top_k, on_event)
+            
+            # STAGE 4: Multi-objective scoring from ingestion-time document features
+            if len(content_candidates) > top_k and deadline and not deadline.allows("scoring"):
+                relevant_chunks = content_candidates[:top_k]
+                logger.info(f"⏱️ Plain vector top-{top_k} (scoring skipped for latency budget)")
+            elif len(content_candidates) > top_k:
                 try:
                     logger.info("⚡ Stage 4: Direct multi-objective document scoring")
                     
-                    # Apply multi-objective scoring directly to content candidates
-                    scored_documents = await score_documents_multi_objective(
-                        content_candidates, 
-                        query, 
-                        user_intent, 
-                        self.ai_client
-                    )
-                    
-                    # Select optimal mix using intelligent scoring
-                    relevant_chunks = select_optimal_document_mix(scored_documents, top_k)
+                    with span("scoring", candidates=len(search_results)):
+                        # Score candidates from stored static features + similarity
+                        scored_documents = score_documents_multi_objective(search_results, user_intent)
+                        
+                        # Select optimal mix using intelligent scoring
+                        relevant_chunks = select_optimal_document_mix(scored_documents, top_k)
                     logger.info(f"⚡ EFFICIENT SELECTION: {len(relevant_chunks)} documents via direct scoring")
                     
                 except Exception as scoring_error:
@@ -1062,7 +996,7 @@ class IntentClassifier:
             context = ""
             if conversation_history:
                 recent_context = conversation_history[-3:]  # Last 3 messages for context
-                context = "\n".join([f"{msg['role']}: {msg['content']}" for msg in recent_context])
+                context = "\n".join([f"{msg['role']}: {msg['content'][:CLASSIFIER_HISTORY_CHAR_LIMIT]}" for msg in recent_context])
                 context = f"\n\nسياق المحادثة:\n{context}\n"
             
             classification_prompt = CLASSIFICATION_PROMPT.format(query=query) + context
@@ -1164,6 +1098,29 @@ class IntentClassifier:
 
     
 
+# CONVERSATION COMPACTION - bounded prompt size for long threads
+VERBATIM_HISTORY_MESSAGES = 4        # Last two turns are never folded into the summary
+UNSUMMARIZED_HISTORY_MESSAGES = 8    # Hard cap on messages sent verbatim (summary lagging or absent)
+HISTORY_MESSAGE_CHAR_LIMIT = 3000    # Long assistant answers are clipped in the prompt
+CLASSIFIER_HISTORY_CHAR_LIMIT = 500
+SUMMARY_MAX_TOKENS = 700
+
+CONVERSATION_SUMMARY_PROMPT = """أنت مساعد يلخص الاستشارات القانونية. حدّث ملخص المحادثة التالي بدمج الرسائل الجديدة.
+
+الملخص الحالي:
+{previous_summary}
+
+الرسائل الجديدة:
+{new_messages}
+
+اكتب ملخصاً موجزاً (أقل من 250 كلمة) يحفظ:
+- وقائع قضية المستخدم وأطرافها والتواريخ والمبالغ
+- الأنظمة والمواد القانونية التي تم الاستشهاد بها
+- النصائح والقرارات التي قدمت والأسئلة المفتوحة
+
+الملخص فقط، بدون مقدمات."""
+
+
 class IntelligentLegalRAG:
     """
     Intelligent Legal RAG with AI-Powered Intent Classification
@@ -1174,6 +1131,12 @@ class IntelligentLegalRAG:
         """Initialize intelligent RAG with AI classification"""
         self.ai_client = ai_client
         self.ai_model = ai_model
+        self.provider_router = provider_router
+        
+        # Single-flight for identical context-free questions (spike protection)
+        self.coalescing_enabled = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+        self.single_flight = SingleFlight()
+        self.coalescer = StreamCoalescer()
         
         # Add smart document retrieval
         self.storage = StorageFactory.create_storage()
@@ -1191,13 +1154,84 @@ class IntelligentLegalRAG:
         
         
         logger.info("🚀 Intelligent Legal RAG initialized - AI-powered classification + Smart retrieval!")
-        self.citation_fixer = SimpleCitationFixer()
-        logger.info("🔧 Citation fixer initialized")
+        logger.info("🔧 Streaming citation fixer enabled")
+        self.citation_validator = CitationValidator()
+        
+        # Statute article index for explicit "المادة N من نظام X" questions (reloaded after TTL)
+        self.article_index = ArticleIndex()
+        self.article_index_ttl = float(os.getenv("ARTICLE_INDEX_TTL", "300"))
+        self._article_index_lock = asyncio.Lock()
+    
+    async def get_article_index(self) -> ArticleIndex:
+        """Article index, loaded from storage on first use and refreshed after the TTL"""
+        if self.article_index.loaded_at and time.monotonic() - self.article_index.loaded_at < self.article_index_ttl:
+            return self.article_index
+        
+        async with self._article_index_lock:
+            if not self.article_index.loaded_at or time.monotonic() - self.article_index.loaded_at >= self.article_index_ttl:
+                self.article_index.load(await self.storage.load_article_index())
+        return self.article_index
+    
+    async def lookup_article(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve an explicit article reference straight from the article index
+        
+        Returns the article text with its location, or None when the question is
+        not an explicit reference or the article is not indexed. `pure_lookup`
+        tells whether the reference is the whole question.
+        """
+        reference = parse_article_reference(query)
+        if reference is None:
+            return None
+        article = await self.resolve_article(reference.law_name, reference.article_number)
+        if article:
+            article['pure_lookup'] = (await self.get_article_index()).is_pure_lookup(reference)
+        return article
+    
+    async def resolve_article(self, law_name: str, article_number: int) -> Optional[Dict[str, Any]]:
+        """Article text and location for a law name + article number, or None if not indexed"""
+        started = time.perf_counter()
+        index = await self.get_article_index()
+        location = index.lookup(law_name, article_number)
+        if location is None:
+            logger.info(f"📖 Article {article_number} of '{law_name}' not in article index")
+            return None
+        
+        chunk = await self.storage.get_chunk_by_id(location.chunk_id)
+        if chunk is None:
+            return None
+        
+        article = Chunk(
+            id=chunk.id,
+            title=location.law_title,
+            content=chunk.content[location.start:location.end],
+            metadata={**(chunk.metadata or {}), 'article_number': location.article_number},
+            doc_kind="statute",
+            authority_score=chunk.authority_score,
+            citation_value=chunk.citation_value
+        )
+        lookup_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"📖 Article index hit: {location.law_title} / {location.article_number} ({lookup_ms:.1f}ms)")
+        
+        return {
+            'law_title': location.law_title,
+            'article_number': location.article_number,
+            'chunk_id': location.chunk_id,
+            'text': article.content,
+            'document': article,
+            'lookup_ms': round(lookup_ms, 2)
+        }
     
 
-    async def structure_multi_article_chunks(self, documents: List[Chunk], query: str) -> List[Chunk]:
+    async def structure_multi_article_chunks(
+        self,
+        documents: List[Chunk],
+        query: str,
+        deadline: Optional[Deadline] = None
+    ) -> List[Chunk]:
         """
         Create article navigation for large chunks containing multiple articles
+        Chunks are left as they are once the deadline leaves no room for another call.
         """
         if not documents:
             return documents
@@ -1212,7 +1246,10 @@ class IntelligentLegalRAG:
                 import re
                 article_matches = re.findall(r'المادة\s+([\d\u0660-\u0669]+|الأولى|الثانية|الثالثة|الرابعة|الخامسة|السادسة|السابعة|الثامنة|التاسعة|العاشرة)', doc.content)
                 
-                if len(article_matches) > 3:  # Multiple articles detected
+                if len(article_matches) > 3 and deadline and not deadline.allows("article_navigation"):
+                    structured_docs.append(doc)
+                
+                elif len(article_matches) > 3:  # Multiple articles detected
                     # Use AI to identify relevant articles
                     navigation_prompt = f"""السؤال: {query}
 
@@ -1222,12 +1259,21 @@ class IntelligentLegalRAG:
 
 حدد رقم المادة التي تحتوي على معلومات تتعلق بالسؤال. أجب برقم المادة فقط:"""
 
-                    response = await self.ai_client.chat.completions.create(
+                    navigation_call = self.ai_client.chat.completions.create(
                         model="gpt-4o-mini",
                         messages=[{"role": "user", "content": navigation_prompt}],
                         max_tokens=400,
                         temperature=0.1
                     )
+                    if deadline:
+                        try:
+                            response = await asyncio.wait_for(navigation_call, timeout=deadline.stage_budget())
+                        except asyncio.TimeoutError:
+                            deadline.skip("article_navigation", "timeout")
+                            structured_docs.append(doc)
+                            continue
+                    else:
+                        response = await navigation_call
                     
                     relevant_article = response.choices[0].message.content.strip()
                     logger.info(f"🎯 AI identified relevant article: {relevant_article}")
@@ -1274,16 +1320,19 @@ class IntelligentLegalRAG:
                 import re
                 article_matches = re.findall(r'المادة\s+([\d\u0660-\u0669]+|الأولى|الثانية|الثالثة|الرابعة|الخامسة|السادسة|السابعة|الثامنة|التاسعة|العاشرة)', content)
                 
+                # Prefer the query-aware snippet over the chunk head
+                excerpt = (doc.metadata or {}).get('snippet') or content[:DEFAULT_SNIPPET_CHARS]
+                
                 if title and content:
                     # Add document with emphasis on specific articles
                     if article_matches:
                         article_list = ", ".join(set(article_matches))
                         context_parts.append(f"""📄 **{title}**
         📍 **المواد المتاحة**: {article_list}
-        📝 **المحتوى**: {content[:1000]}...""")
+        📝 **المحتوى**: {excerpt}...""")
                     else:
                         context_parts.append(f"""📄 **{title}**
-        📝 **المحتوى**: {content[:1000]}...""")
+        📝 **المحتوى**: {excerpt}...""")
             
             full_context = "\n\n".join(context_parts)
             
@@ -1301,92 +1350,275 @@ class IntelligentLegalRAG:
             return context_header + full_context
 
 
+    def build_history_messages(
+        self,
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Bounded conversation context for the prompt: rolling summary + every
+        message it does not cover yet (callers pass only those, see
+        ChatService.history_after_summary), capped and each clipped
+        """
+        recent_history = conversation_history[-UNSUMMARIZED_HISTORY_MESSAGES:]
+        history_messages = []
+        if conversation_summary:
+            history_messages.append({
+                "role": "system",
+                "content": f"ملخص ما سبق في هذه المحادثة:\n{conversation_summary}"
+            })
+        
+        for msg in recent_history:
+            content = msg["content"]
+            if len(content) > HISTORY_MESSAGE_CHAR_LIMIT:
+                content = content[:HISTORY_MESSAGE_CHAR_LIMIT] + "..."
+            history_messages.append({
+                "role": msg["role"],
+                "content": content
+            })
+        
+        return history_messages
+
+    async def summarize_conversation(
+        self,
+        previous_summary: Optional[str],
+        new_messages: List[Dict[str, str]]
+    ) -> Optional[str]:
+        """Fold new messages into the rolling conversation summary (small model)"""
+        if not new_messages:
+            return previous_summary
+        
+        try:
+            transcript = "\n\n".join(
+                f"{msg['role']}: {msg['content'][:HISTORY_MESSAGE_CHAR_LIMIT]}" for msg in new_messages
+            )
+            summary_prompt = CONVERSATION_SUMMARY_PROMPT.format(
+                previous_summary=previous_summary or "لا يوجد",
+                new_messages=transcript
+            )
+            
+            response = await self.ai_client.chat.completions.create(
+                model=classification_model,
+                messages=[{"role": "user", "content": summary_prompt}],
+                max_tokens=SUMMARY_MAX_TOKENS,
+                temperature=0.1
+            )
+            
+            summary = response.choices[0].message.content.strip()
+            logger.info(f"🗜️ Conversation summary updated: {len(new_messages)} messages folded, {len(summary)} chars")
+            return summary or previous_summary
+            
+        except Exception as e:
+            logger.error(f"Conversation summary error: {e}")
+            return previous_summary
+
     async def ask_question_with_context_streaming(
         self, 
         query: str, 
-        conversation_history: List[Dict[str, str]]
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: Optional[str] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        deadline: Optional[Deadline] = None
     ) -> AsyncIterator[str]:
         """
         Intelligent context-aware legal consultation with AI classification
+        
+        Side-channel events (e.g. invalid citations) travel in-band as dicts so
+        coalesced listeners get them too; they are handed to `on_event` and only
+        text is yielded. `deadline` bounds the optional stages (defaults to
+        REQUEST_LATENCY_BUDGET).
         """
         try:
             logger.info(f"Processing intelligent contextual legal question: {query[:50]}...")
             logger.info(f"Conversation context: {len(conversation_history)} messages")
+            if conversation_summary:
+                logger.info(f"🗜️ Using rolling conversation summary ({len(conversation_summary)} chars)")
             
-            # Stage 1: AI-powered intent classification with context
-            classification = await self.classifier.classify_intent(query, conversation_history)
-            category = classification["category"]
-            confidence = classification["confidence"]
-            
-            # Stage 2: Get relevant documents
-            print(f"🔥 DEBUG CATEGORY: category='{category}', type={type(category)}")
-            if category == "ACTIVE_DISPUTE":
-                top_k = 25  # Get more statutes for comprehensive legal citations
-            elif category == "PLANNING_ACTION":
-                top_k = 20  # Need good coverage for planning
-            else:
-                top_k = 15  # General questions need fewer documents
-
-            logger.info(f"🔍 RAG Engine requesting top_k={top_k} chunks for category {category}")
-            relevant_docs = await self.retriever.get_relevant_documents(query, top_k=top_k, user_intent=category)
-            logger.info(f"📄 RAG Engine received {len(relevant_docs)} chunks from retriever")
+            deadline = deadline or Deadline.from_env()
             
-            # Stage 3: Select appropriate prompt
-            system_prompt = PROMPT_TEMPLATES[category]
+            # Identical context-free questions in flight share one classification + generation
+            coalescing_key = None
+            if self.coalescing_enabled and not conversation_history and not conversation_summary:
+                coalescing_key = normalize_query(query)
             
-            messages = [
-                {"role": "system", "content": system_prompt}
-            ]
-            
-            # Stage 4: Add conversation history (last 8 messages)
-            recent_history = conversation_history[-8:] if len(conversation_history) > 8 else conversation_history
-            for msg in recent_history:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
+            # Fast path: a question that only asks for an article -> index lookup,
+            # no classification or vector search. An article referenced inside a
+            # wider question is prepended to the retrieved documents instead.
+            documents = None
+            pinned_documents = None
+            async with span("article_lookup") as lookup_span:
+                article = await self.lookup_article(query)
+                lookup_span.set(hit=bool(article), pure=bool(article and article['pure_lookup']))
+            if article and on_event:
+                on_event({
+                    'type': 'article_lookup',
+                    'law_title': article['law_title'],
+                    'article_number': article['article_number'],
+                    'lookup_ms': article['lookup_ms']
                 })
-            
-            # Stage 5: Add current question with legal context if available
-            # Stage 5: Add current question with legal context if available
-            if relevant_docs:
-                # PRIORITY 4 FIX: Structure multi-article chunks before formatting
-                structured_docs = await self.structure_multi_article_chunks(relevant_docs, query)
-                legal_context = self.format_legal_context_naturally(structured_docs)
-                contextual_prompt = f"""{legal_context}
-
-            السؤال: {query}"""
-                logger.info(f"Using {len(relevant_docs)} relevant legal documents with {category} approach (contextual)")
+            if article and article['pure_lookup']:
+                category = "GENERAL_QUESTION"
+                documents = [article['document']]
+                flight = "ARTICLE_LOOKUP"
             else:
-                contextual_prompt = query
-                logger.info(f"No relevant documents found - using {category} approach with contextual general knowledge")
+                # Stage 1: AI-powered intent classification with context
+                async with span("classification"):
+                    if coalescing_key:
+                        classification = await self.single_flight.do(
+                            ("classify", coalescing_key),
+                            lambda: self.classifier.classify_intent(query, conversation_history)
+                        )
+                    else:
+                        classification = await self.classifier.classify_intent(query, conversation_history)
+                category = classification["category"]
+                flight = category
+                if article:
+                    pinned_documents = [article['document']]
             
-            messages.append({
-                "role": "user", 
-                "content": contextual_prompt
-            })
+            if coalescing_key:
+                answer = self.coalescer.stream(
+                    (coalescing_key, flight),
+                    lambda: self._generate_answer(
+                        query, conversation_history, conversation_summary, category, documents,
+                        deadline=deadline, pinned_documents=pinned_documents
+                    )
+                )
+            else:
+                answer = self._generate_answer(
+                    query, conversation_history, conversation_summary, category, documents,
+                    deadline=deadline, pinned_documents=pinned_documents
+                )
             
-            # Stage 6: Stream intelligent contextual response
-            async for chunk in self._stream_ai_response(messages, category):
-                yield chunk
+            # Closing this stream (client gone) closes the answer down to the provider stream
+            async with aclosing(answer):
+                async for chunk in answer:
+                    if isinstance(chunk, dict):
+                        if on_event:
+                            on_event(chunk)
+                        continue
+                    yield chunk
                 
         except Exception as e:
             logger.error(f"Intelligent contextual legal AI error: {e}")
             yield f"عذراً، حدث خطأ في معالجة سؤالك: {str(e)}"
     
+    async def _generate_answer(
+        self,
+        query: str,
+        conversation_history: List[Dict[str, str]],
+        conversation_summary: Optional[str],
+        category: str,
+        documents: Optional[List[Chunk]] = None,
+        deadline: Optional[Deadline] = None,
+        pinned_documents: Optional[List[Chunk]] = None
+    ) -> AsyncIterator[Union[str, Dict[str, Any]]]:
+        """
+        Retrieval, prompt assembly and streamed answer (text plus in-band event dicts)
+        
+        `documents` skips retrieval (e.g. an article resolved from the article index);
+        `pinned_documents` are put ahead of whatever retrieval returns.
+        Optional stages skipped for `deadline` are reported as stage_skipped events.
+        """
+        # Stage 2: Get relevant documents
+        logger.debug(f"🔥 DEBUG CATEGORY: category='{category}', type={type(category)}")
+        if documents is not None:
+            relevant_docs = documents
+            logger.info(f"📖 Using {len(relevant_docs)} pre-resolved documents - retrieval skipped")
+        else:
+            # Upper bound per category (disputes need more statutes); the
+            # retriever stops earlier when similarity drops off
+            _, top_k = category_limits(category)
+
+            logger.info(f"🔍 RAG Engine requesting up to top_k={top_k} chunks for category {category}")
+            retrieval_events = []
+            async with span("retrieval", category=category) as retrieval_span:
+                relevant_docs = await self.retriever.get_relevant_documents(
+                    query, top_k=top_k, user_intent=category, on_event=retrieval_events.append, deadline=deadline
+                )
+                retrieval_span.set(chunks=len(relevant_docs))
+            logger.info(f"📄 RAG Engine received {len(relevant_docs)} chunks from retriever")
+            for event in retrieval_events:
+                yield event
+            if pinned_documents:
+                pinned = {doc.content for doc in pinned_documents}
+                relevant_docs = pinned_documents + [doc for doc in relevant_docs if doc.content not in pinned]
+                logger.info(f"📖 Prepended {len(pinned_documents)} referenced article(s) to retrieved documents")
+        
+        # Stage 3: Select appropriate prompt
+        system_prompt = PROMPT_TEMPLATES[category]
+        
+        messages = [
+            {"role": "system", "content": system_prompt}
+        ]
+        
+        # Stage 4: Add conversation history (summary + last turns, bounded)
+        messages.extend(self.build_history_messages(conversation_history, conversation_summary))
+        
+        # Stage 5: Add current question with legal context if available
+        # Stage 5: Add current question with legal context if available
+        if relevant_docs:
+            # PRIORITY 4 FIX: Structure multi-article chunks before formatting
+            async with span("article_navigation", chunks=len(relevant_docs)):
+                structured_docs = await self.structure_multi_article_chunks(relevant_docs, query, deadline)
+            legal_context = self.format_legal_context_naturally(structured_docs)
+            contextual_prompt = f"""{legal_context}
+
+            السؤال: {query}"""
+            logger.info(f"Using {len(relevant_docs)} relevant legal documents with {category} approach (contextual)")
+        else:
+            contextual_prompt = query
+            logger.info(f"No relevant documents found - using {category} approach with contextual general knowledge")
+        
+        messages.append({
+            "role": "user", 
+            "content": contextual_prompt
+        })
+        
+        if deadline:
+            for entry in deadline.skipped_stages:
+                yield {"type": "stage_skipped", **entry}
+        
+        # Stage 6: Stream intelligent contextual response (memo citations fixed,
+        # article citations checked against the retrieved documents in-flight)
+        citation_fixer = StreamingCitationFixer(statute_titles_from(relevant_docs))
+        citation_checker = StreamingCitationValidator(self.citation_validator.available_citations(relevant_docs))
+        generation_started = time.perf_counter()
+        first_token = True
+        async with aclosing(self._stream_ai_response(messages, category)) as stream:
+            async for chunk in stream:
+                if first_token:
+                    observe("llm_first_token", time.perf_counter() - generation_started, generation_started)
+                    first_token = False
+                fixed = citation_fixer.feed(chunk)
+                if fixed:
+                    yield fixed
+                    for event in citation_checker.feed(fixed):
+                        yield event
+        remainder = citation_fixer.flush()
+        if remainder:
+            yield remainder
+        for event in citation_checker.feed(remainder) + citation_checker.flush():
+            yield event
+        observe("llm_generation", time.perf_counter() - generation_started, generation_started)
+        if citation_checker.invalid:
+            logger.warning(f"⚠️ {citation_checker.invalid}/{citation_checker.checked} article citations not found in sources")
+    
     async def _stream_ai_response(self, messages: List[Dict[str, str]], category: str = "GENERAL_QUESTION") -> AsyncIterator[str]:
-        """Stream AI response with error handling"""
+        """
+        Stream AI response with provider failover and error handling
+        
+        Closing this generator (or cancelling its task) closes the provider
+        stream right away - the upstream HTTP response is dropped and the
+        model stops generating.
+        """
+        stream = self.provider_router.stream_chat(
+            messages,
+            temperature=0.3 if category == "ACTIVE_DISPUTE" else 0.7,
+            max_tokens=ANSWER_MAX_TOKENS,
+        )
         try:
-            stream = await self.ai_client.chat.completions.create(
-                model=self.ai_model,
-                messages=messages,
-                temperature=0.3 if category == "ACTIVE_DISPUTE" else 0.7,
-                max_tokens=15000 if category == "ACTIVE_DISPUTE" else 15000,  # ← GIVE DISPUTES MORE SPACE!
-                stream=True
-            )
-            
-            async for chunk in stream:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+            async for content in stream:
+                yield content
                     
         except Exception as e:
             logger.error(f"AI streaming error: {e}")
@@ -1398,6 +1630,8 @@ class IntelligentLegalRAG:
                 yield "\n\n🔑 خطأ في مفتاح API. يرجى التواصل مع الدعم الفني."
             else:
                 yield f"\n\n❌ خطأ تقني: {str(e)}"
+        finally:
+            await stream.aclose()
     
     async def generate_conversation_title(self, first_message: str) -> str:
         """Intelligent conversation title generation"""
@@ -1447,9 +1681,17 @@ async def ask_question_streaming(query: str) -> AsyncIterator[str]:
     async for chunk in rag_engine.ask_question_with_context_streaming(query, []):
         yield chunk
 
-async def ask_question_with_context_streaming(query: str, conversation_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+async def ask_question_with_context_streaming(
+    query: str,
+    conversation_history: List[Dict[str, str]],
+    conversation_summary: Optional[str] = None,
+    on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+    deadline: Optional[Deadline] = None
+) -> AsyncIterator[str]:
     """Modern contextual streaming interface"""
-    async for chunk in rag_engine.ask_question_with_context_streaming(query, conversation_history):
+    async for chunk in rag_engine.ask_question_with_context_streaming(
+        query, conversation_history, conversation_summary, on_event=on_event, deadline=deadline
+    ):
         yield chunk
 
 # Test function
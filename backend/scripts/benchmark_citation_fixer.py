@@ -0,0 +1,111 @@
+"""
+Benchmark: SimpleCitationFixer (full text) vs StreamingCitationFixer (token stream)
+Run from backend/: python scripts/benchmark_citation_fixer.py [--repeat 200] [--chunk-chars 4]
+
+Reports per-answer processing time for both, plus for the streaming fixer the
+worst per-chunk cost and how far emitted text lags behind received text.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+
+from app.core.citation_postprocessor import StreamingCitationFixer, statute_titles_from
+from app.storage.vector_store import Chunk
+from rag_engine import SimpleCitationFixer
+
+DOCUMENTS = [
+    Chunk(id="s1", title="نظام العمل - المادة 77", content=""),
+    Chunk(id="s2", title="اللائحة التنفيذية لنظام العمل", content=""),
+    Chunk(id="m1", title="مذكرة دفاع في قضية عمالية", content=""),
+]
+
+PARAGRAPHS = [
+    "## التحليل القانوني\n",
+    "يحق للعامل المطالبة بالتعويض عن الفصل غير المشروع، وفقاً لـ\"مذكرة civil رقم 12\". ",
+    "كما أن صاحب العمل ملزم بدفع الأجر كاملاً حسب المادة الثالثة من العقد.\n",
+    "#### أولاً: الأساس النظامي\n",
+    'استناداً إلى "مصدر غير محدد" يجب على المحكمة النظر في الدعوى. ',
+    "بالإشارة إلى \"**مذكرة الدفاع المقدمة**\" فإن الدفع غير مقبول.\n",
+    "- البند الأول: الإنذار الكتابي قبل الفصل بثلاثين يوماً.\n",
+    "- البند الثاني: مكافأة نهاية الخدمة وفق الأجر الأخير.\n",
+    "مرجع 3: تفاصيل القضية السابقة.\n",
+    "الخلاصة: نوصي برفع الدعوى خلال المدة النظامية.\n\n",
+]
+
+
+def build_answer(target_chars: int) -> str:
+    text = ""
+    while len(text) < target_chars:
+        text += "".join(PARAGRAPHS)
+    return text
+
+
+def chunked(text: str, size: int):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def bench_legacy(text: str, repeat: int) -> list:
+    fixer = SimpleCitationFixer()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fixer.fix_citations(text, DOCUMENTS)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def bench_streaming(text: str, repeat: int, chunk_chars: int):
+    titles = statute_titles_from(DOCUMENTS)
+    chunks = chunked(text, chunk_chars)
+    totals, worst_chunk, lags = [], [], []
+
+    for _ in range(repeat):
+        fixer = StreamingCitationFixer(titles)
+        worst = 0.0
+        started = time.perf_counter()
+        for chunk in chunks:
+            chunk_started = time.perf_counter()
+            fixer.feed(chunk)
+            worst = max(worst, time.perf_counter() - chunk_started)
+            lags.append(fixer.pending)
+        fixer.flush()
+        totals.append((time.perf_counter() - started) * 1000)
+        worst_chunk.append(worst * 1000)
+
+    return totals, worst_chunk, lags
+
+
+def describe(name: str, values: list, unit: str = "ms") -> None:
+    ordered = sorted(values)
+    p95 = ordered[int(len(ordered) * 0.95) - 1] if len(ordered) > 1 else ordered[0]
+    print(f"  {name:<28} p50={statistics.median(values):8.3f}{unit}  p95={p95:8.3f}{unit}  max={max(values):8.3f}{unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Citation fixer benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--chunk-chars", type=int, default=4, help="characters per streamed delta (~1 token)")
+    parser.add_argument("--answer-chars", type=int, default=6000)
+    args = parser.parse_args()
+
+    text = build_answer(args.answer_chars)
+    print(f"📏 Answer: {len(text)} chars, {len(chunked(text, args.chunk_chars))} stream chunks, {args.repeat} runs\n")
+
+    print("🐢 SimpleCitationFixer (needs the complete answer)")
+    describe("per answer", bench_legacy(text, args.repeat))
+
+    totals, worst_chunk, lags = bench_streaming(text, args.repeat, args.chunk_chars)
+    print("\n⚡ StreamingCitationFixer (incremental)")
+    describe("per answer (all chunks)", totals)
+    describe("worst single chunk", worst_chunk)
+    describe("held-back text", lags, unit="ch")
+
+
+if __name__ == "__main__":
+    main()
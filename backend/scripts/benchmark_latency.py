@@ -0,0 +1,289 @@
+"""
+End-to-end latency benchmark against the offline OpenAI stub
+Run from backend/: python scripts/benchmark_latency.py [--mode engine|api] [--clients 8] [--requests 5]
+
+Starts scripts/stub_llm_server.py in-process, seeds a synthetic statute corpus
+(stub embeddings), then drives either IntelligentLegalRAG directly or the
+FastAPI /api/chat/message SSE endpoint with N concurrent clients. Reports
+time-to-first-token, total latency and throughput; --json writes the report
+for comparison across commits.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from stub_llm_server import StubServer, add_stub_arguments, config_from_args, hashed_embedding
+
+QUESTIONS = [
+    "ما هي حقوق العامل عند الفصل التعسفي؟",
+    "كم مدة الإنذار قبل إنهاء عقد العمل؟",
+    "ما نص المادة 77 من نظام العمل؟",
+    "هل يحق لصاحب العمل خصم الراتب بسبب الغياب؟",
+    "كيف تحسب مكافأة نهاية الخدمة؟",
+    "صاحب العمل رفض دفع أجري منذ ثلاثة أشهر، ماذا أفعل؟",
+    "أريد رفع دعوى عمالية، ما هي الخطوات؟",
+    "ما عقوبة تشغيل العامل دون تصريح؟",
+]
+
+STATUTE_SENTENCES = [
+    "يستحق العامل أجراً عن ساعات العمل الإضافية يوازي أجر الساعة مضافاً إليه خمسون في المائة",
+    "إذا أنهي العقد لسبب غير مشروع كان للطرف الذي أصابه ضرر الحق في تعويض تقدره المحكمة",
+    "يجب على صاحب العمل أن يدفع للعامل مكافأة نهاية الخدمة عن مدة خدمته",
+    "لا يجوز لصاحب العمل أن يقتطع من أجر العامل أي مبلغ إلا في الحالات المنصوص عليها",
+    "يجب أن يكون الإشعار مكتوباً قبل إنهاء العقد بثلاثين يوماً على الأقل",
+]
+
+
+@dataclass
+class RequestResult:
+    ttft: Optional[float]
+    total: float
+    chars: int
+    error: Optional[str] = None
+    answer: str = ""
+    conversation_id: Optional[str] = None
+
+
+def configure_environment(stub_url: str, vectors_db: str, database_url: Optional[str] = None) -> None:
+    """Point every provider at the stub before rag_engine / app.main are imported"""
+    os.environ["OPENAI_BASE_URL"] = stub_url
+    os.environ["OPENAI_API_KEY"] = "sk-stub"
+    os.environ["DEEPSEEK_API_KEY"] = ""  # no failover to a real provider
+    os.environ["AI_PROVIDER"] = "openai"
+    os.environ["SQLITE_DB_PATH"] = vectors_db
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-0123456789abcdefghij")
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+
+
+async def seed_corpus(vectors_db: str, documents: int, dims: int) -> None:
+    """Synthetic statute chunks with stub embeddings (same hashing as the stub server)"""
+    from app.storage.sqlite_store import SqliteVectorStore
+    from app.storage.vector_store import Chunk
+
+    store = SqliteVectorStore(vectors_db)
+    chunks = []
+    for i in range(documents):
+        law = f"نظام رقم {i // 20 + 1}"
+        content = f"المادة ({i % 20 + 1}): {STATUTE_SENTENCES[i % len(STATUTE_SENTENCES)]}"
+        chunks.append(Chunk(
+            id=f"bench_{i}",
+            title=f"{law} - المادة {i % 20 + 1}",
+            content=content,
+            embedding=hashed_embedding(content, dims),
+            metadata={"law_title": law}
+        ))
+    await store.store_chunks(chunks)
+
+
+async def engine_request(engine, question: str, history: Optional[List[Dict]] = None) -> RequestResult:
+    started = time.perf_counter()
+    ttft, parts = None, []
+    try:
+        async for chunk in engine.ask_question_with_context_streaming(question, history or []):
+            if ttft is None and chunk.strip():
+                ttft = time.perf_counter() - started
+            parts.append(chunk)
+        answer = "".join(parts)
+        return RequestResult(ttft, time.perf_counter() - started, len(answer), answer=answer)
+    except Exception as e:
+        return RequestResult(ttft, time.perf_counter() - started, sum(map(len, parts)), error=str(e))
+
+
+async def api_request(
+    client,
+    base_url: str,
+    question: str,
+    session_id: Optional[str] = None,
+    conversation_id: Optional[str] = None
+) -> RequestResult:
+    """
+    One guest SSE request. Without a session_id a fresh one is used per request,
+    which keeps the guest question limit out of the way.
+    """
+    started = time.perf_counter()
+    ttft, chars, error = None, 0, None
+    data = {"message": question, "session_id": session_id or f"bench-{uuid.uuid4()}"}
+    if conversation_id:
+        data["conversation_id"] = conversation_id
+    try:
+        async with client.stream(
+            "POST", f"{base_url}/api/chat/message",
+            data=data,
+            headers={"Accept": "text/event-stream"}
+        ) as response:
+            if response.status_code != 200:
+                return RequestResult(None, time.perf_counter() - started, 0, error=f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or line == "data: [DONE]":
+                    continue
+                frame = json.loads(line[6:])
+                if frame.get("type") == "metadata":
+                    conversation_id = frame.get("conversation_id") or conversation_id
+                elif frame.get("type") == "chunk":
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    chars += len(frame.get("content", ""))
+                elif frame.get("type") == "error":
+                    error = frame.get("error")
+    except Exception as e:
+        error = str(e)
+    return RequestResult(ttft, time.perf_counter() - started, chars, error, conversation_id=conversation_id)
+
+
+async def run_clients(
+    clients: int,
+    requests_per_client: int,
+    make_request: Callable[[str], Awaitable[RequestResult]],
+    questions: List[str]
+) -> (List[RequestResult], float):
+    """Closed loop: each client sends its next question as soon as the previous answer ends"""
+    results: List[RequestResult] = []
+
+    async def client(index: int):
+        for n in range(requests_per_client):
+            results.append(await make_request(questions[(index * requests_per_client + n) % len(questions)]))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    return results, time.perf_counter() - started
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 1)
+
+    return {"p50_ms": pick(0.5), "p95_ms": pick(0.95), "p99_ms": pick(0.99),
+            "mean_ms": round(statistics.mean(ordered) * 1000, 1)}
+
+
+def summarize(results: List[RequestResult], wall_seconds: float) -> Dict:
+    ok = [r for r in results if r.error is None]
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else None,
+        "chars_per_second": round(sum(r.chars for r in ok) / wall_seconds, 1) if wall_seconds else None,
+        "ttft": _percentiles([r.ttft for r in ok if r.ttft is not None]),
+        "total": _percentiles([r.total for r in ok]),
+    }
+
+
+def print_report(title: str, summary: Dict) -> None:
+    print(f"\n📊 {title}")
+    print(f"  requests={summary['requests']}  errors={summary['errors']}  wall={summary['wall_seconds']}s  "
+          f"throughput={summary['throughput_rps']} req/s  ({summary['chars_per_second']} chars/s)")
+    for name in ("ttft", "total"):
+        stats = summary[name]
+        print(f"  {name:<6} p50={stats['p50_ms']}ms  p95={stats['p95_ms']}ms  p99={stats['p99_ms']}ms  mean={stats['mean_ms']}ms")
+
+
+class BackendServer:
+    """The FastAPI app under uvicorn in a background thread"""
+
+    def __init__(self, port: int):
+        import uvicorn
+        from app.main import app
+
+        self.url = f"http://127.0.0.1:{port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "BackendServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+async def run_engine_benchmark(args, questions: List[str]) -> Dict:
+    from rag_engine import get_rag_engine
+
+    engine = get_rag_engine()
+    results, wall = await run_clients(args.clients, args.requests, lambda q: engine_request(engine, q), questions)
+    return summarize(results, wall)
+
+
+async def run_api_benchmark(args, questions: List[str], base_url: str) -> Dict:
+    import httpx
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        results, wall = await run_clients(args.clients, args.requests, lambda q: api_request(client, base_url, q), questions)
+    return summarize(results, wall)
+
+
+def load_questions(path: Optional[str]) -> List[str]:
+    """Plain text (one question per line) or a workload JSONL with a "question" field"""
+    if not path:
+        return QUESTIONS
+    questions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark (offline)")
+    parser.add_argument("--mode", choices=["engine", "api"], default="engine")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=5, help="requests per client")
+    parser.add_argument("--questions", help="questions file (text lines or workload JSONL)")
+    parser.add_argument("--corpus-docs", type=int, default=400, help="synthetic statute chunks to seed")
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--api-port", type=int, default=8901)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", help="write the report to this file")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="legal-bench-")
+    vectors_db = os.path.join(workdir, "vectors.db")
+    stub_config = config_from_args(args)
+
+    with StubServer(stub_config, port=args.stub_port) as stub:
+        configure_environment(stub.url, vectors_db, f"sqlite:///{os.path.join(workdir, 'app.db')}")
+        asyncio.run(seed_corpus(vectors_db, args.corpus_docs, stub_config.embedding_dims))
+        questions = load_questions(args.questions)
+        print(f"🧪 Stub at {stub.url}, {args.corpus_docs} chunks, {args.clients} clients x {args.requests} requests ({args.mode})")
+
+        if args.mode == "engine":
+            summary = asyncio.run(run_engine_benchmark(args, questions))
+        else:
+            with BackendServer(args.api_port) as backend:
+                summary = asyncio.run(run_api_benchmark(args, questions, backend.url))
+
+    report = {"mode": args.mode, "clients": args.clients, "stub": asdict(stub_config), **summary}
+    print_report(f"{args.mode} mode", summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n💾 Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
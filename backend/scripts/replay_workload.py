@@ -0,0 +1,388 @@
+"""
+Workload replay from CloudWatch log exports
+Run from backend/:
+  python scripts/replay_workload.py extract ../logs_5pm.json -o workload.jsonl
+  python scripts/replay_workload.py run workload.jsonl [--speed 10] [--mode engine|api] [--json report.json]
+
+`extract` rebuilds the production request stream from the rag_engine log lines
+(question, arrival offset, conversation grouping and the latency observed in
+production). `run` replays it open-loop against the backend wired to the stub
+LLM/embedding server (scripts/stub_llm_server.py): requests start at their
+original offsets divided by --speed, turns of one conversation stay in order
+and carry their history. The report is keyed by workload hash and git commit
+so runs can be compared (--compare baseline.json).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(os.path.dirname(__file__))
+
+from stub_llm_server import StubServer, add_stub_arguments, config_from_args
+from benchmark_latency import (
+    BackendServer, RequestResult, api_request, configure_environment, engine_request,
+    print_report, seed_corpus, summarize
+)
+
+QUESTION_START = re.compile(r"rag_engine:Processing intelligent contextual legal question: (.*?)(?:\.\.\.)?$", re.S)
+CONTEXT_SIZE = re.compile(r"rag_engine:Conversation context: (\d+) messages")
+FULL_QUERY = re.compile(r"rag_engine:.*Intent-aware search for '(.*)'$", re.S)
+INTENT = re.compile(r"rag_engine:.*Intent classified: (\w+)")
+
+# A question without history joins the previous conversation on the same
+# stream if it arrives within this many seconds of the previous answer
+DEFAULT_CONVERSATION_GAP = 300.0
+
+
+@dataclass
+class WorkloadRequest:
+    offset: float  # seconds since the first request
+    question: str
+    conversation: str
+    turn: int
+    history_messages: int = 0
+    category: Optional[str] = None
+    observed_ms: Optional[int] = None  # production latency (question log -> last log line)
+
+
+def _timestamp_ms(value: Any) -> int:
+    """CloudWatch exports use epoch ms; Logs Insights uses '2025-08-14 15:32:48.259'"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).replace("T", " ").rstrip("Z")
+    return int(datetime.fromisoformat(text).timestamp() * 1000)
+
+
+def load_events(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Log events from `aws logs filter-log-events` JSON ({"events": [...]}), a plain
+    JSON list, or JSONL (one event per line, Logs Insights @-fields accepted)
+    """
+    events = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+            records = data.get("events", []) if isinstance(data, dict) else data
+        except json.JSONDecodeError:
+            records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+        for record in records:
+            message = record.get("message", record.get("@message"))
+            timestamp = record.get("timestamp", record.get("@timestamp"))
+            if message is None or timestamp is None:
+                continue
+            events.append({
+                "timestamp": _timestamp_ms(timestamp),
+                "stream": record.get("logStreamName", record.get("@logStream", "")),
+                "message": str(message).strip(),
+            })
+    events.sort(key=lambda event: (event["stream"], event["timestamp"]))
+    return events
+
+
+def extract_workload(
+    events: List[Dict[str, Any]],
+    conversation_gap: float = DEFAULT_CONVERSATION_GAP
+) -> List[WorkloadRequest]:
+    """Turn rag_engine log lines into requests, one per logged question"""
+    requests: List[Dict[str, Any]] = []
+    by_stream: Dict[str, Dict[str, Any]] = {}
+
+    for event in events:
+        message, stream = event["message"], event["stream"]
+        current = by_stream.get(stream)
+
+        match = QUESTION_START.search(message)
+        if match:
+            current = {
+                "stream": stream,
+                "start": event["timestamp"],
+                "end": event["timestamp"],
+                "prefix": match.group(1).strip(),
+                "question": None,
+                "history": 0,
+                "category": None,
+            }
+            by_stream[stream] = current
+            requests.append(current)
+            continue
+        if current is None:
+            continue
+
+        current["end"] = event["timestamp"]
+        if (match := CONTEXT_SIZE.search(message)):
+            current["history"] = int(match.group(1))
+        elif (match := INTENT.search(message)):
+            current["category"] = match.group(1)
+        elif (match := FULL_QUERY.search(message)) and current["question"] is None:
+            # The start line truncates at 50 chars; retrieval logs the whole query
+            if match.group(1).startswith(current["prefix"]):
+                current["question"] = match.group(1)
+
+    if not requests:
+        return []
+
+    # Conversation grouping per log stream
+    conversations: Dict[str, Dict[str, Any]] = {}
+    workload = []
+    first = min(request["start"] for request in requests)
+    counter = 0
+    for request in sorted(requests, key=lambda r: r["start"]):
+        previous = conversations.get(request["stream"])
+        continues = previous is not None and (
+            request["history"] > 0
+            or (request["start"] - previous["end"]) / 1000 <= conversation_gap
+        )
+        if not continues:
+            counter += 1
+            previous = {"id": f"c{counter}", "turns": 0}
+        previous["turns"] += 1
+        previous["end"] = request["end"]
+        conversations[request["stream"]] = previous
+
+        workload.append(WorkloadRequest(
+            offset=round((request["start"] - first) / 1000, 3),
+            question=request["question"] or request["prefix"],
+            conversation=previous["id"],
+            turn=previous["turns"],
+            history_messages=request["history"],
+            category=request["category"],
+            observed_ms=(request["end"] - request["start"]) or None,
+        ))
+    return workload
+
+
+def write_workload(workload: List[WorkloadRequest], path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for request in workload:
+            f.write(json.dumps(asdict(request), ensure_ascii=False) + "\n")
+
+
+def read_workload(path: str) -> List[WorkloadRequest]:
+    with open(path, encoding="utf-8") as f:
+        return [WorkloadRequest(**json.loads(line)) for line in f if line.strip()]
+
+
+def workload_hash(workload: List[WorkloadRequest]) -> str:
+    digest = hashlib.sha256()
+    for request in workload:
+        digest.update(json.dumps(asdict(request), ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def replay(
+    workload: List[WorkloadRequest],
+    speed: float,
+    send,
+) -> (List[Dict[str, Any]], float):
+    """
+    Open-loop replay: each conversation is a task; its turns start at their
+    scheduled offset or when the previous turn finishes, whichever is later.
+    `send(request, state)` performs one request; `state` is per-conversation.
+    """
+    conversations: Dict[str, List[WorkloadRequest]] = {}
+    for request in workload:
+        conversations.setdefault(request.conversation, []).append(request)
+
+    records: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+
+    async def run_conversation(turns: List[WorkloadRequest]):
+        state: Dict[str, Any] = {"history": []}
+        for request in sorted(turns, key=lambda r: r.turn):
+            scheduled = request.offset / speed
+            delay = scheduled - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            lag = max(0.0, time.perf_counter() - started - scheduled)
+            result: RequestResult = await send(request, state)
+            records.append({"request": request, "result": result, "lag": lag})
+
+    await asyncio.gather(*(run_conversation(turns) for turns in conversations.values()))
+    return records, time.perf_counter() - started
+
+
+def build_report(
+    records: List[Dict[str, Any]],
+    wall_seconds: float,
+    workload: List[WorkloadRequest],
+    args: argparse.Namespace
+) -> Dict[str, Any]:
+    results = [record["result"] for record in records]
+    summary = summarize(results, wall_seconds)
+
+    by_category: Dict[str, List[RequestResult]] = {}
+    for record in records:
+        by_category.setdefault(record["request"].category or "UNKNOWN", []).append(record["result"])
+
+    observed = [r.observed_ms / 1000 for r in workload if r.observed_ms]
+    lags = sorted(record["lag"] for record in records)
+    return {
+        "commit": _git_commit(),
+        "workload": os.path.basename(args.workload),
+        "workload_hash": workload_hash(workload),
+        "requests_in_workload": len(workload),
+        "conversations": len({r.conversation for r in workload}),
+        "mode": args.mode,
+        "speed": args.speed,
+        **summary,
+        "schedule_lag_ms": {
+            "p50": round(lags[len(lags) // 2] * 1000, 1) if lags else None,
+            "max": round(lags[-1] * 1000, 1) if lags else None,
+        },
+        "by_category": {
+            category: summarize(items, wall_seconds)["total"] for category, items in sorted(by_category.items())
+        },
+        "production_observed": summarize(
+            [RequestResult(None, seconds, 0) for seconds in observed], 0
+        )["total"] if observed else None,
+    }
+
+
+def print_comparison(report: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("workload_hash") != report["workload_hash"]:
+        print(f"⚠️ Baseline used a different workload ({baseline.get('workload_hash')}), deltas are not comparable")
+
+    print(f"\n🔁 vs {baseline.get('commit') or baseline_path}")
+    for name in ("ttft", "total"):
+        cells = []
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            before, after = baseline.get(name, {}).get(key), report[name][key]
+            if before and after is not None:
+                cells.append(f"{key[:3]} {before}→{after}ms ({(after - before) / before * 100:+.1f}%)")
+        print(f"  {name:<6} " + "  ".join(cells))
+
+
+async def run_engine_replay(workload: List[WorkloadRequest], speed: float):
+    from rag_engine import get_rag_engine
+
+    engine = get_rag_engine()
+
+    async def send(request: WorkloadRequest, state: Dict[str, Any]) -> RequestResult:
+        result = await engine_request(engine, request.question, state["history"])
+        state["history"] += [
+            {"role": "user", "content": request.question},
+            {"role": "assistant", "content": result.answer},
+        ]
+        return result
+
+    return await replay(workload, speed, send)
+
+
+async def run_api_replay(workload: List[WorkloadRequest], speed: float, base_url: str, timeout: float):
+    import httpx
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        async def send(request: WorkloadRequest, state: Dict[str, Any]) -> RequestResult:
+            # One guest session per conversation; the backend keeps the history
+            session_id = state.setdefault("session_id", f"replay-{request.conversation}-{time.time_ns()}")
+            result = await api_request(client, base_url, request.question, session_id, state.get("conversation_id"))
+            state["conversation_id"] = result.conversation_id or state.get("conversation_id")
+            return result
+
+        return await replay(workload, speed, send)
+
+
+def cmd_extract(args: argparse.Namespace) -> None:
+    workload = extract_workload(load_events(args.exports), args.conversation_gap)
+    write_workload(workload, args.output)
+    conversations = len({r.conversation for r in workload})
+    span = workload[-1].offset if workload else 0
+    print(f"✅ {len(workload)} requests in {conversations} conversations over {span:.0f}s -> {args.output}")
+
+
+def cmd_run(args: argparse.Namespace) -> None:
+    workload = read_workload(args.workload)
+    if args.limit:
+        workload = workload[:args.limit]
+    if not workload:
+        print("❌ Empty workload")
+        return
+
+    workdir = tempfile.mkdtemp(prefix="legal-replay-")
+    vectors_db = os.path.join(workdir, "vectors.db")
+    stub_config = config_from_args(args)
+
+    with StubServer(stub_config, port=args.stub_port) as stub:
+        configure_environment(stub.url, vectors_db, f"sqlite:///{os.path.join(workdir, 'app.db')}")
+        asyncio.run(seed_corpus(vectors_db, args.corpus_docs, stub_config.embedding_dims))
+        duration = workload[-1].offset / args.speed
+        print(f"🧪 Replaying {len(workload)} requests ({args.mode}, {args.speed}x, ~{duration:.0f}s) against {stub.url}")
+
+        if args.mode == "engine":
+            records, wall = asyncio.run(run_engine_replay(workload, args.speed))
+        else:
+            with BackendServer(args.api_port) as backend:
+                records, wall = asyncio.run(run_api_replay(workload, args.speed, backend.url, args.timeout))
+
+    report = build_report(records, wall, workload, args)
+    report["stub"] = asdict(stub_config)
+    print_report(f"replay {report['workload']} ({report['workload_hash']}) @ {report['commit']}", report)
+    print(f"  lag    p50={report['schedule_lag_ms']['p50']}ms  max={report['schedule_lag_ms']['max']}ms")
+    for category, stats in report["by_category"].items():
+        print(f"  {category:<17} p50={stats['p50_ms']}ms  p95={stats['p95_ms']}ms")
+
+    if args.compare:
+        print_comparison(report, args.compare)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\n💾 Report written to {args.json}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay production traffic from CloudWatch exports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    extract = commands.add_parser("extract", help="build a workload file from log exports")
+    extract.add_argument("exports", nargs="+", help="CloudWatch export files (JSON or JSONL)")
+    extract.add_argument("-o", "--output", default="workload.jsonl")
+    extract.add_argument("--conversation-gap", type=float, default=DEFAULT_CONVERSATION_GAP,
+                         help="seconds of silence that start a new conversation")
+    extract.set_defaults(func=cmd_extract)
+
+    run = commands.add_parser("run", help="replay a workload file against the stubbed backend")
+    run.add_argument("workload")
+    run.add_argument("--mode", choices=["engine", "api"], default="engine")
+    run.add_argument("--speed", type=float, default=1.0, help="time compression (10 = ten times faster)")
+    run.add_argument("--limit", type=int, help="replay only the first N requests")
+    run.add_argument("--corpus-docs", type=int, default=400)
+    run.add_argument("--stub-port", type=int, default=8900)
+    run.add_argument("--api-port", type=int, default=8901)
+    run.add_argument("--timeout", type=float, default=120.0)
+    run.add_argument("--json", help="write the report to this file")
+    run.add_argument("--compare", help="baseline report to diff against")
+    add_stub_arguments(run)
+    run.set_defaults(func=cmd_run)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Offline OpenAI-compatible stub server for benchmarks and load tests
+Run from backend/: python scripts/stub_llm_server.py [--port 8900] [--first-token lognormal:400,0.5]
+
+Implements /v1/chat/completions (streaming and non-streaming) and /v1/embeddings
+with configurable latency, token rate and error injection. Embeddings are
+deterministic hashed bag-of-words vectors, so texts sharing words are similar.
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8900/v1.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORD = re.compile(r'\w+')
+
+ANSWER_WORDS = (
+    "وفقاً لأحكام نظام العمل يحق للعامل المطالبة بالتعويض عن الفصل غير المشروع "
+    "وتنص المادة (77) على أنه إذا أنهي العقد لسبب غير مشروع كان للطرف الذي أصابه ضرر "
+    "الحق في تعويض تقدره المحكمة العمالية مع مراعاة الأجر ومدة الخدمة والظروف المحيطة"
+).split()
+
+CATEGORIES = ("GENERAL_QUESTION", "ACTIVE_DISPUTE", "PLANNING_ACTION")
+
+
+@dataclass
+class LatencyDistribution:
+    """fixed:MS | uniform:LOW,HIGH | lognormal:MEDIAN,SIGMA (milliseconds)"""
+    kind: str = "fixed"
+    params: List[float] = field(default_factory=lambda: [0.0])
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyDistribution":
+        kind, _, values = spec.partition(":")
+        params = [float(v) for v in values.split(",") if v] or [0.0]
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        """Seconds"""
+        if self.kind == "uniform":
+            ms = rng.uniform(self.params[0], self.params[1])
+        elif self.kind == "lognormal":
+            median, sigma = self.params[0], (self.params[1] if len(self.params) > 1 else 0.5)
+            ms = median * rng.lognormvariate(0.0, sigma)
+        else:
+            ms = self.params[0]
+        return max(0.0, ms) / 1000
+
+
+@dataclass
+class StubConfig:
+    first_token: LatencyDistribution = field(default_factory=lambda: LatencyDistribution.parse("lognormal:400,0.4"))
+    tokens_per_second: float = 60.0
+    answer_tokens: int = 300
+    embedding_latency: LatencyDistribution = field(default_factory=lambda: LatencyDistribution.parse("lognormal:80,0.3"))
+    embedding_dims: int = 1536
+    error_rate: float = 0.0
+    error_status: int = 429
+    stream_abort_rate: float = 0.0
+    seed: int = 0
+
+
+def hashed_embedding(text: str, dims: int) -> List[float]:
+    """Deterministic feature-hashed word vector (signed buckets, L2-normalized)"""
+    vector = np.zeros(dims, dtype=np.float32)
+    for word in WORD.findall(text.lower()) or [text]:
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dims
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+def _last_user_message(messages: list) -> str:
+    for message in reversed(messages or []):
+        if message.get("role") == "user":
+            return str(message.get("content", ""))
+    return ""
+
+
+def _answer_text(prompt: str, max_tokens: Optional[int], config: StubConfig) -> str:
+    """Classification prompts get valid JSON; everything else gets legal-sounding filler"""
+    if '"category"' in prompt:
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=2).digest()
+        category = CATEGORIES[digest[0] % len(CATEGORIES)]
+        return json.dumps({"category": category, "confidence": 0.85, "reasoning": "stub"}, ensure_ascii=False)
+
+    count = min(config.answer_tokens, max_tokens or config.answer_tokens)
+    return " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(count))
+
+
+def _error(status: int) -> JSONResponse:
+    kind = "rate_limit_exceeded" if status == 429 else "server_error"
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": f"Injected stub error ({status})", "type": kind, "code": kind}}
+    )
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="OpenAI stub")
+    rng = random.Random(config.seed)
+    stats = {"chat": 0, "embeddings": 0, "errors": 0}
+
+    def inject_error() -> Optional[JSONResponse]:
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return _error(config.error_status)
+        return None
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["chat"] += 1
+        error = inject_error()
+        if error:
+            return error
+
+        model = body.get("model", "stub")
+        text = _answer_text(_last_user_message(body.get("messages")), body.get("max_tokens"), config)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        await asyncio.sleep(config.first_token.sample(rng))
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(text.split()) / config.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(text.split()), "total_tokens": len(text.split())},
+            }
+
+        abort_at = None
+        if config.stream_abort_rate and rng.random() < config.stream_abort_rate:
+            abort_at = rng.randint(1, max(1, len(text.split()) - 1))
+
+        async def events():
+            def frame(delta: dict, finish_reason: Optional[str] = None) -> str:
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                return f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+
+            yield frame({"role": "assistant", "content": ""})
+            delay = 1.0 / config.tokens_per_second
+            for i, word in enumerate(text.split(" ")):
+                if abort_at is not None and i == abort_at:
+                    stats["errors"] += 1
+                    return  # connection drops mid-stream
+                yield frame({"content": word if i == 0 else " " + word})
+                await asyncio.sleep(delay)
+            yield frame({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["embeddings"] += 1
+        error = inject_error()
+        if error:
+            return error
+
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        await asyncio.sleep(config.embedding_latency.sample(rng))
+        return {
+            "object": "list",
+            "model": body.get("model", "stub-embedding"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": hashed_embedding(str(text), config.embedding_dims)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+class StubServer:
+    """Run the stub in a background thread (for harnesses in the same process)"""
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 8900):
+        self.url = f"http://{host}:{port}/v1"
+        self._server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--first-token", default="lognormal:400,0.4", help="first-token latency distribution (ms)")
+    parser.add_argument("--tokens-per-second", type=float, default=60.0)
+    parser.add_argument("--answer-tokens", type=int, default=300)
+    parser.add_argument("--embedding-latency", default="lognormal:80,0.3", help="embedding latency distribution (ms)")
+    parser.add_argument("--embedding-dims", type=int, default=1536)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with an error")
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--stream-abort-rate", type=float, default=0.0, help="fraction of streams cut mid-answer")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        first_token=LatencyDistribution.parse(args.first_token),
+        tokens_per_second=args.tokens_per_second,
+        answer_tokens=args.answer_tokens,
+        embedding_latency=LatencyDistribution.parse(args.embedding_latency),
+        embedding_dims=args.embedding_dims,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        stream_abort_rate=args.stream_abort_rate,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    print(f"🧪 OpenAI stub on http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,8 @@ import re
 from typing import List, Dict, Any
 from dataclasses import dataclass
 
+from app.retrieval.article_index import parse_article_heading, parse_article_number
+
 @dataclass
 class LegalChunk:
     """Smart legal document chunk with hierarchy"""
@@ -538,8 +540,9 @@ class EliteLegalChunker:
     
     def _create_chunk_from_items(self, items: List[Dict[str, Any]], title: str, chunk_index: int, is_oversized: bool = False, inherited_context: Dict[str, str] = None) -> LegalChunk:
         """Create a legal chunk from structure items with precise metadata"""
-        # Combine content
+        # Combine content, recording where each article sits inside it
         content = "\n\n".join(item['content'] for item in items)
+        article_spans = self._article_spans(items)
         
         # Extract hierarchical context
         current_context = inherited_context or {}
@@ -607,7 +610,10 @@ class EliteLegalChunker:
             # Article metadata (FIXED WITH STANDARDIZATION)
             'articles': unique_articles,
             'unique_articles_count': len(unique_articles),
-            'article_detection_method': 'comprehensive_pattern_matching'
+            'article_detection_method': 'comprehensive_pattern_matching',
+            
+            # Article number -> character span in this chunk (feeds the article index)
+            'article_spans': article_spans
         }
 
 
@@ -626,6 +632,23 @@ class EliteLegalChunker:
             metadata=metadata
         )
     
+    def _article_spans(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Character spans of numbered articles inside the joined chunk content"""
+        spans = []
+        offset = 0
+        for item in items:
+            if item['type'] == 'article':
+                # The heading in the content is complete; titles can stop short of "بعد المائة"
+                number = parse_article_heading(item['content']) or parse_article_number(item['title'])
+                if number:
+                    spans.append({
+                        'article_number': number,
+                        'start': offset,
+                        'end': offset + len(item['content'])
+                    })
+            offset += len(item['content']) + 2  # "\n\n" separator
+        return spans
+    
     def _validate_article_integrity(self, chunks: List[LegalChunk]) -> List[LegalChunk]:
         """Validate that no articles were split (elite validation)"""
         validated_chunks = []
@@ -0,0 +1,64 @@
+"""
+Adaptive top_k (score-gap / elbow cutoff) tests
+Run: python -m pytest test_adaptive_cutoff.py -q
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import rag_engine
+from app.retrieval.adaptive_cutoff import adaptive_cutoff, category_limits
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+
+
+def test_clear_gap_keeps_only_the_leading_chunk():
+    scores = [0.91, 0.84, 0.83, 0.83, 0.82, 0.82, 0.81, 0.81, 0.80, 0.80]
+    kept, stats = adaptive_cutoff(scores, *category_limits("GENERAL_QUESTION"))
+    assert kept == 1
+    assert (stats.reason, stats.gap, stats.cutoff_score) == ("gap", 0.07, 0.91)
+
+
+def test_flat_scores_keep_everything_up_to_max():
+    scores = [0.85 - i * 0.001 for i in range(30)]
+    kept, stats = adaptive_cutoff(scores, 1, 15)
+    assert kept == 15
+    assert stats.reason == "max" and stats.candidates == 30
+
+
+def test_category_minimum_is_respected():
+    scores = [0.95, 0.70, 0.69, 0.69, 0.68, 0.68, 0.67]
+    kept, _ = adaptive_cutoff(scores, *category_limits("ACTIVE_DISPUTE"))
+    assert kept >= 3
+    assert adaptive_cutoff([], 1, 15)[0] == 0
+
+
+def test_retriever_returns_variable_length_results(tmp_path, monkeypatch):
+    async def create(model, input):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0, 0.0])])
+
+    ai_client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    storage = SqliteVectorStore(str(tmp_path / "vectors.db"))
+    retriever = rag_engine.DocumentRetriever(storage, ai_client)
+
+    async def decompose(query):
+        return [query]
+
+    monkeypatch.setattr(retriever, "decompose_query_to_concepts", decompose)
+
+    async def scenario():
+        await storage.store_chunks(
+            [Chunk(id="hit", title="نظام العمل - المادة 77", content="نص", embedding=[1.0, 0.02, 0.0])]
+            + [
+                Chunk(id=f"other{i}", title=f"نظام {i}", content="نص", embedding=[0.5, 0.8 + i * 0.01, 0.1])
+                for i in range(10)
+            ]
+        )
+        events = []
+        docs = await retriever.get_relevant_documents("المادة 77", top_k=15, user_intent="GENERAL_QUESTION", on_event=events.append)
+
+        assert [d.id for d in docs] == ["hit"]
+        assert events[0]["type"] == "retrieval_cutoff"
+        assert events[0]["kept"] == 1 and events[0]["reason"] == "gap"
+
+    asyncio.run(scenario())
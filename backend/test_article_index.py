@@ -0,0 +1,155 @@
+"""
+Statute article index tests
+Run: python -m pytest test_article_index.py -q
+"""
+
+import asyncio
+
+import rag_engine
+from app.retrieval.article_index import (
+    ArticleIndex, ArticleLocation, find_article_spans, parse_article_number, parse_article_reference
+)
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+from smart_legal_chunker import SmartLegalChunker
+
+LABOR_LAW = """
+الباب الأول: التعريفات والأحكام العامة
+
+المادة الأولى: يسمى هذا النظام نظام العمل.
+
+المادة (77): إذا أنهي العقد لسبب غير مشروع كان للطرف الذي أصابه ضرر الحق في تعويض.
+
+المادة الثالثة والثلاثون بعد المائة: تعد في حكم الإصابة حالة الانتكاس.
+"""
+
+
+def test_parse_article_number_forms():
+    assert parse_article_number("المادة (77)") == 77
+    assert parse_article_number("٧٧") == 77
+    assert parse_article_number("الأولى") == 1
+    assert parse_article_number("الحادية عشرة") == 11
+    assert parse_article_number("السابعة والسبعون") == 77
+    assert parse_article_number("الثالثة والثلاثون بعد المائة") == 133
+    assert parse_article_number("السابعه والسبعون") == 77
+
+
+def test_parse_article_reference():
+    reference = parse_article_reference("ما نص المادة 77 من نظام العمل؟")
+    assert (reference.article_number, reference.law_name) == (77, "نظام العمل")
+    assert parse_article_reference("المادة الأولى نظام المرافعات الشرعية").article_number == 1
+    assert parse_article_reference("هل يحق لي التعويض عن الفصل؟") is None
+
+
+def test_pure_lookup_only_when_the_reference_is_the_whole_question():
+    index = ArticleIndex()
+    index.add(ArticleLocation("نظام العمل", 80, "labor", 0, 10))
+
+    def pure(query):
+        return index.is_pure_lookup(parse_article_reference(query))
+
+    assert pure("ما نص المادة 80 من نظام العمل؟")
+    assert pure("المادة الثمانون من نظام العمل السعودي")
+    assert not pure("فصلني صاحب العمل استناداً إلى المادة 80 من نظام العمل كيف أرد عليه وما هي دفوعي")
+    assert not pure("ما نص المادة 80 من نظام العمل وما عقوبته")
+
+
+def test_chunker_spans_resolve_through_index():
+    chunks = SmartLegalChunker(max_tokens_per_chunk=40).chunk_legal_document(LABOR_LAW, "نظام العمل")
+    index = ArticleIndex()
+    for chunk in chunks:
+        for span in chunk.metadata["article_spans"]:
+            index.add(ArticleLocation("نظام العمل", span["article_number"], chunk.title, span["start"], span["end"]))
+
+    location = index.lookup("نظام العمل السعودي وما التعويض", 77)
+    chunk = next(c for c in chunks if c.title == location.chunk_id)
+    assert chunk.content[location.start:location.end].startswith("المادة (77)")
+    assert index.lookup("نظام العمل", 133) is not None
+    assert index.lookup("نظام التنفيذ", 77) is None
+
+
+def test_store_round_trip_and_cleanup(tmp_path):
+    async def scenario():
+        store = SqliteVectorStore(str(tmp_path / "vectors.db"))
+        spans = [{"article_number": 5, "start": 0, "end": 10}]
+        chunked = Chunk(id="c1", title="نظام العمل - الباب الأول", content="المادة 5: نص",
+                        metadata={"law_title": "نظام العمل", "legal_structure": {"article_spans": spans}})
+        whole = Chunk(id="d1", title="نظام المرور", content="المادة الأولى: نص\n\nالمادة الثانية: نص آخر")
+        assert await store.store_chunks([chunked, whole])
+
+        locations = await store.load_article_index()
+        assert [(l.law_title, l.article_number, l.chunk_id) for l in locations] == [
+            ("نظام العمل", 5, "c1"), ("نظام المرور", 1, "d1"), ("نظام المرور", 2, "d1")
+        ]
+
+        await store.store_chunks([chunked])  # re-ingesting does not duplicate rows
+        await store.delete_chunks(["d1"])
+        assert [l.chunk_id for l in await store.load_article_index()] == ["c1"]
+
+    asyncio.run(scenario())
+
+
+def test_find_article_spans_ignores_inline_mentions():
+    text = "المادة الأولى: تطبق وفقاً للمادة 3.\nالمادة (2): نص"
+    assert [s["article_number"] for s in find_article_spans(text)] == [1, 2]
+
+
+def test_engine_fast_path_skips_classification_and_retrieval(monkeypatch, tmp_path):
+    engine = rag_engine.IntelligentLegalRAG()
+    engine.storage = SqliteVectorStore(str(tmp_path / "vectors.db"))
+    captured = {}
+
+    async def classify_intent(query, history=None):
+        raise AssertionError("classification should be skipped")
+
+    async def generate(query, history, summary, category, documents=None, deadline=None, pinned_documents=None):
+        captured["documents"] = documents
+        captured["pinned"] = pinned_documents
+        yield "نص الجواب"
+
+    monkeypatch.setattr(engine.classifier, "classify_intent", classify_intent)
+    monkeypatch.setattr(engine, "_generate_answer", generate)
+
+    async def scenario():
+        content = "المادة 76: نص سابق\n\nالمادة 77: يستحق الطرف المتضرر تعويضاً"
+        await engine.storage.store_chunks([Chunk(id="labor", title="نظام العمل", content=content)])
+
+        events = []
+        text = "".join([c async for c in engine.ask_question_with_context_streaming(
+            "ما نص المادة السابعة والسبعون من نظام العمل؟", [], on_event=events.append
+        )])
+        assert text == "نص الجواب"
+        assert captured["documents"][0].content == "المادة 77: يستحق الطرف المتضرر تعويضاً"
+        assert events[0]["type"] == "article_lookup" and events[0]["article_number"] == 77
+
+        assert (await engine.resolve_article("نظام العمل", 76))["text"] == "المادة 76: نص سابق"
+        assert await engine.resolve_article("نظام العمل", 99) is None
+
+    asyncio.run(scenario())
+
+
+def test_article_inside_a_wider_question_is_pinned_ahead_of_retrieval(monkeypatch, tmp_path):
+    engine = rag_engine.IntelligentLegalRAG()
+    engine.storage = SqliteVectorStore(str(tmp_path / "vectors.db"))
+    captured = {}
+
+    async def classify_intent(query, history=None):
+        return {"category": "ACTIVE_DISPUTE"}
+
+    async def generate(query, history, summary, category, documents=None, deadline=None, pinned_documents=None):
+        captured.update(category=category, documents=documents, pinned=pinned_documents)
+        yield "جواب"
+
+    monkeypatch.setattr(engine.classifier, "classify_intent", classify_intent)
+    monkeypatch.setattr(engine, "_generate_answer", generate)
+
+    async def scenario():
+        content = "المادة 80: لا يجوز لصاحب العمل فسخ العقد دون مكافأة إلا في الحالات الآتية"
+        await engine.storage.store_chunks([Chunk(id="labor", title="نظام العمل", content=content)])
+        query = "فصلني صاحب العمل استناداً إلى المادة 80 من نظام العمل كيف أرد عليه وما هي دفوعي"
+        return [c async for c in engine.ask_question_with_context_streaming(query, [])]
+
+    asyncio.run(scenario())
+    assert captured["category"] == "ACTIVE_DISPUTE"
+    assert captured["documents"] is None  # retrieval still runs
+    assert captured["pinned"][0].metadata["article_number"] == 80
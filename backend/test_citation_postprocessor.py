@@ -0,0 +1,106 @@
+"""
+Streaming citation fixer tests
+Run: python -m pytest test_citation_postprocessor.py -q
+"""
+
+import random
+
+from app.core.citation_postprocessor import StreamingCitationFixer, statute_titles_from
+from app.storage.vector_store import Chunk
+
+
+TITLES = ["نظام العمل", "اللائحة التنفيذية"]
+
+ANSWER = (
+    "## التحليل\n"
+    'يحق للعامل التعويض، وفقاً لـ"مذكرة civil رقم 5". كما أن النظام واضح.\n'
+    'وفقاً لـ"مصدر ما" يجب الدفع. بموجب المادة يلزم.\n'
+    'بالإشارة إلى "**مذكرة الدفاع**" فإن الدفع غير مقبول.\n'
+    "الخلاصة"
+)
+
+# The memo trigger sits inside the quoted citation opened by وفقاً
+QUOTED_MEMO = 'وفقاً لـ"مذكرة الأحكام" يجب الالتزام.\nنهاية'
+
+
+def _stream(fixer: StreamingCitationFixer, text: str, seed: int) -> str:
+    rng = random.Random(seed)
+    out, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 12)
+        out.append(fixer.feed(text[i:i + size]))
+        i += size
+    out.append(fixer.flush())
+    return "".join(out)
+
+
+def test_memo_citations_removed_and_weak_citations_rewritten():
+    fixed = StreamingCitationFixer(TITLES).fix(ANSWER)
+    assert "مذكرة" not in fixed
+    assert "التعويض. كما" in fixed
+    assert 'وفقاً لـ"نظام العمل"' in fixed
+    assert 'بموجب "نظام العمل" يلزم' in fixed
+    assert fixed.startswith("## التحليل\n")
+
+
+def test_legal_prose_mentioning_memos_references_and_articles_is_unchanged():
+    prose = [
+        "ننصحك بتقديم مذكرة دفاع تتضمن الدفوع التالية.\n",
+        "ثانياً: المرجع رقم 5 يثبت ذلك.\n",
+        "مرجع 2 في الملف يؤيد الطلب.\n",
+        "حسب المادة 77 يحق لك التعويض.\n",
+        "بموجب المادة 80 يجوز الفصل دون مكافأة.\n",
+        "وفقاً لـ مذكرة التفاهم بين الطرفين يلتزم المورد بالتسليم.\n",
+    ]
+    for text in prose:
+        fixer = StreamingCitationFixer(TITLES)
+        assert fixer.fix(text) == text
+        assert fixer.memo_removed == fixer.rewritten == 0
+
+    # The reviewer's example, streamed one character at a time
+    text = "ننصحك بتقديم مذكرة دفاع تتضمن الدفوع التالية.\nثانياً: المرجع رقم 5 يثبت ذلك. حسب المادة 77 يحق لك التعويض."
+    fixer = StreamingCitationFixer(["نظام العمل"])
+    assert "".join(fixer.feed(char) for char in text) + fixer.flush() == text
+
+
+def test_streaming_matches_full_text_for_any_chunking():
+    for text in (ANSWER, QUOTED_MEMO):
+        expected = StreamingCitationFixer(TITLES).fix(text)
+        for seed in range(200):
+            assert _stream(StreamingCitationFixer(TITLES), text, seed) == expected
+        # Token streaming: one character at a time
+        fixer = StreamingCitationFixer(TITLES)
+        assert "".join(fixer.feed(char) for char in text) + fixer.flush() == expected
+
+
+def test_quoted_memo_citation_removed_when_streamed():
+    fixer = StreamingCitationFixer(TITLES)
+    streamed = "".join(fixer.feed(char) for char in QUOTED_MEMO) + fixer.flush()
+    assert streamed == " يجب الالتزام.\nنهاية"
+
+
+def test_plain_text_is_released_immediately():
+    fixer = StreamingCitationFixer(TITLES)
+    assert fixer.feed("يحق للعامل") == "يحق للعامل"
+    # A possible trigger prefix is held until the next chunk decides it
+    assert fixer.feed(" وفق") == ""
+    # The sentence end settles it; trailing punctuation waits for the next chunk
+    assert fixer.feed("اً للنظام.") == " وفقاً للنظام"
+    assert fixer.feed("\nنرى") == ".\nنرى"
+
+
+def test_memos_stripped_even_without_statutes():
+    fixer = StreamingCitationFixer([])
+    fixed = fixer.fix('نرى ذلك وفقاً لـ"تقرير" وكما جاء في "مذكرة الدفاع".\n')
+    assert "مذكرة" not in fixed
+    assert 'وفقاً لـ"تقرير"' in fixed
+    assert fixer.memo_removed == 1
+
+
+def test_statute_titles_from_documents():
+    docs = [
+        Chunk(id="1", title="نظام العمل", content="", doc_kind="statute"),
+        Chunk(id="2", title="مذكرة دفاع", content=""),
+        Chunk(id="3", title="لائحة الجزاءات", content=""),
+    ]
+    assert statute_titles_from(docs) == ["نظام العمل", "لائحة الجزاءات"]
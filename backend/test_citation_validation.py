@@ -0,0 +1,62 @@
+"""
+Incremental citation validation tests
+Run: python -m pytest test_citation_validation.py -q
+"""
+
+import asyncio
+
+import rag_engine
+from app.core.prompt_controller import CitationValidator, StreamingCitationValidator, extract_article_citations
+from app.storage.vector_store import Chunk
+
+
+def test_extract_normalizes_all_forms():
+    text = "المادة (12) ومادة 7 والمادة رقم ١٣ واستناداً للمادة 012 ثم المادة 12 مرة أخرى"
+    assert extract_article_citations(text) == ["المادة (12)", "المادة (7)", "المادة (13)"]
+
+
+def test_available_citations_prefer_precomputed_set():
+    validator = CitationValidator()
+    precomputed = Chunk(id="a", title="نظام العمل", content="نص طويل بلا مواد", article_citations=["المادة (77)"])
+    legacy = Chunk(id="b", title="نظام قديم", content="تنص المادة 5 على ذلك")
+    assert validator.available_citations([precomputed, legacy]) == {"المادة (77)", "المادة (5)"}
+
+    valid, warnings = validator.validate_citations("وفقاً للمادة 77 والمادة 9", [precomputed, legacy])
+    assert not valid
+    assert "المادة (9)" in warnings[0]
+
+
+def test_streaming_validator_handles_split_citations():
+    checker = StreamingCitationValidator({"المادة (12)"})
+    answer = "تنص المادة 12 على الحق، بينما المادة 120 لا وجود لها. وتؤكد المادة 12 ذلك"
+    events = []
+    for i in range(0, len(answer), 3):
+        events.extend(checker.feed(answer[i:i + 3]))
+    events.extend(checker.flush())
+
+    assert [e["citation"] for e in events] == ["المادة (120)"]
+    assert answer[events[0]["position"]:].startswith("المادة 120")
+    assert checker.checked == 2
+
+
+def test_engine_emits_citation_events_out_of_band(monkeypatch):
+    engine = rag_engine.IntelligentLegalRAG()
+
+    async def classify_intent(query, history=None):
+        return {"category": "GENERAL_QUESTION", "confidence": 0.9}
+
+    async def generate(query, history, summary, category, documents=None, deadline=None, pinned_documents=None):
+        yield "جواب "
+        yield {"type": "citation_warning", "citation": "المادة (9)"}
+        yield "نهائي"
+
+    monkeypatch.setattr(engine.classifier, "classify_intent", classify_intent)
+    monkeypatch.setattr(engine, "_generate_answer", generate)
+
+    async def scenario():
+        events = []
+        text = "".join([c async for c in engine.ask_question_with_context_streaming("سؤال", [], on_event=events.append)])
+        assert text == "جواب نهائي"
+        assert events == [{"type": "citation_warning", "citation": "المادة (9)"}]
+
+    asyncio.run(scenario())
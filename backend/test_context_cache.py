@@ -0,0 +1,120 @@
+"""
+Conversation context cache tests (follow-up hits, stale windows, invalidation, shared store)
+Run: python -m pytest test_context_cache.py -q
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every table on Base
+from app.api.chat import _open_user_turn
+from app.database import Base
+from app.models.user import User
+from app.services import chat_service
+from app.services.chat_service import ChatService
+from app.services.context_cache import ContextCache
+from app.storage.session_store import MemorySessionStore, SqliteSessionStore
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = ContextCache(MemorySessionStore(), window=10)
+    monkeypatch.setattr(chat_service, "context_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'ctx.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user_id(db):
+    user = User(email="ctx@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def _message_reads(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    # Context reads scan a conversation's messages (the PK refresh of a new message is not one)
+    return lambda: [sql for sql in statements if "FROM messages" in sql and "ORDER BY" in sql]
+
+
+def test_follow_up_turn_is_served_from_the_cache(db, engine, user_id, cache):
+    first = _open_user_turn(db, user_id, None, "ما مدة فترة التجربة؟")
+    ChatService.add_messages(db, [{
+        "id": "a1", "conversation_id": first["conversation_id"], "role": "assistant",
+        "content": "تسعون يوماً",
+        "created_at": datetime.fromisoformat(first["user_message"]["timestamp"]) + timedelta(seconds=1)
+    }])
+
+    reads = _message_reads(engine)
+    second = _open_user_turn(db, user_id, first["conversation_id"], "وهل يمكن تمديدها؟")
+
+    # The new question goes to the prompt separately, not in the history
+    assert [m["content"] for m in second["context"]] == ["ما مدة فترة التجربة؟", "تسعون يوماً"]
+    assert reads() == [] and cache.hits == 1
+
+
+def test_window_written_by_another_worker_is_a_miss_not_stale_context(db, user_id, cache):
+    conversation = ChatService.create_conversation(db, user_id, "t")
+    ChatService.add_message(db, conversation.id, "user", "q1")
+    assert ChatService.get_conversation_context(db, conversation.id) == [{"role": "user", "content": "q1"}]
+
+    # Another worker appends without touching this worker's cache
+    monkey_cache = ContextCache(MemorySessionStore(), window=10)
+    chat_service.context_cache, original = monkey_cache, chat_service.context_cache
+    ChatService.add_message(db, conversation.id, "assistant", "a1")
+    chat_service.context_cache = original
+
+    context = ChatService.get_conversation_context(db, conversation.id)
+    assert [m["content"] for m in context] == ["q1", "a1"] and cache.misses == 2
+
+
+def test_window_is_bounded_and_follows_new_messages(db, user_id, cache):
+    conversation = ChatService.create_conversation(db, user_id, "t")
+    for i in range(12):
+        ChatService.add_message(db, conversation.id, "user", f"m{i}")
+    ChatService.get_conversation_context(db, conversation.id)  # fills the window
+    ChatService.add_message(db, conversation.id, "assistant", "m12")
+
+    context = ChatService.get_conversation_context(db, conversation.id, message_count=13)
+    assert [m["content"] for m in context] == [f"m{i}" for i in range(3, 13)] and cache.hits == 1
+
+
+def test_title_change_and_archive_invalidate(db, user_id, cache):
+    conversation = ChatService.create_conversation(db, user_id, "t")
+    ChatService.add_message(db, conversation.id, "user", "q")
+    ChatService.get_conversation_context(db, conversation.id)
+    assert cache.store.get(conversation.id) is not None
+
+    ChatService.update_conversation_title(db, conversation.id, "جديد")
+    assert cache.store.get(conversation.id) is None
+    ChatService.get_conversation_context(db, conversation.id)
+    ChatService.archive_conversation(db, conversation.id, user_id)
+    assert cache.store.get(conversation.id) is None
+
+
+def test_sqlite_backed_cache_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "context.db")
+    worker_a, worker_b = ContextCache(SqliteSessionStore(path)), ContextCache(SqliteSessionStore(path))
+    worker_a.put("c1", 2, [{"role": "user", "content": "q"}, {"role": "assistant", "content": "a"}])
+    worker_b.append("c1", 3, [{"role": "user", "content": "q2"}])
+
+    assert [m["content"] for m in worker_a.get("c1", 3, 10)] == ["q", "a", "q2"]
+    assert worker_a.get("c1", 4, 10) is None
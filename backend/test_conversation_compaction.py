@@ -0,0 +1,133 @@
+"""
+Conversation history compaction tests
+Run: python -m pytest test_conversation_compaction.py -q
+"""
+
+import asyncio
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import rag_engine
+from app.database import Base
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+from app.services import chat_service
+from app.services.chat_service import ChatService
+from app.api.chat import _open_user_turn
+
+
+class FakeSummarizer:
+    """Stands in for the RAG engine - records what would be summarized"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def summarize_conversation(self, previous_summary, new_messages):
+        self.calls.append((previous_summary, new_messages))
+        return f"{previous_summary or ''}|{len(new_messages)}"
+
+
+def _history(count: int, size: int = 10000):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i}:" + "ن" * size}
+        for i in range(count)
+    ]
+
+
+def test_prompt_history_is_bounded_with_summary():
+    engine = rag_engine.get_rag_engine()
+    messages = engine.build_history_messages(_history(30), "ملخص سابق")
+
+    assert messages[0]["role"] == "system"
+    assert "ملخص سابق" in messages[0]["content"]
+    assert len(messages) == 1 + rag_engine.UNSUMMARIZED_HISTORY_MESSAGES
+    assert all(len(m["content"]) <= rag_engine.HISTORY_MESSAGE_CHAR_LIMIT + 3 for m in messages[1:])
+    # Most recent message is kept last
+    assert messages[-1]["content"].startswith("29:")
+
+
+def test_prompt_history_without_summary_keeps_clipped_window():
+    engine = rag_engine.get_rag_engine()
+    messages = engine.build_history_messages(_history(30))
+
+    assert len(messages) == rag_engine.UNSUMMARIZED_HISTORY_MESSAGES
+    assert all(len(m["content"]) <= rag_engine.HISTORY_MESSAGE_CHAR_LIMIT + 3 for m in messages)
+
+
+def test_guest_summary_folds_all_but_last_turns(monkeypatch):
+    fake = FakeSummarizer()
+    monkeypatch.setattr(chat_service, "get_rag_engine", lambda: fake)
+    session = {"conversation_history": _history(10, size=5)}
+
+    asyncio.run(ChatService.refresh_guest_summary(session))
+    assert session["summarized_count"] == 6
+    assert len(fake.calls[0][1]) == 6
+
+    # Nothing new to fold
+    asyncio.run(ChatService.refresh_guest_summary(session))
+    assert len(fake.calls) == 1
+
+
+def test_conversation_summary_is_persisted(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    fake = FakeSummarizer()
+    monkeypatch.setattr(chat_service, "SessionLocal", TestSession)
+    monkeypatch.setattr(chat_service, "get_rag_engine", lambda: fake)
+
+    db = TestSession()
+    db.add(User(id="u1", email="u1@example.com", full_name="Test", hashed_password="x"))
+    db.add(Conversation(id="c1", user_id="u1", title="t"))
+    db.commit()
+    for i, msg in enumerate(_history(8, size=5)):
+        ChatService.add_message(db, "c1", msg["role"], msg["content"])
+    db.close()
+
+    asyncio.run(ChatService.refresh_conversation_summary("c1"))
+
+    db = TestSession()
+    conversation = db.query(Conversation).filter(Conversation.id == "c1").first()
+    assert conversation.summarized_message_count == 8 - rag_engine.VERBATIM_HISTORY_MESSAGES
+    assert conversation.context_summary == "|4"
+    assert db.query(Message).count() == 8
+    db.close()
+
+
+def test_every_message_is_summarized_or_verbatim_across_turns(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chat.db'}")
+    Base.metadata.create_all(bind=engine)
+    TestSession = sessionmaker(bind=engine)
+    monkeypatch.setattr(chat_service, "SessionLocal", TestSession)
+    monkeypatch.setattr(chat_service, "get_rag_engine", lambda: FakeSummarizer())
+
+    db = TestSession()
+    db.add(User(id="u2", email="u2@example.com", full_name="Test", hashed_password="x"))
+    db.add(Conversation(id="c2", user_id="u2", title="t"))
+    db.commit()
+    for msg in _history(8, size=5):
+        ChatService.add_message(db, "c2", msg["role"], msg["content"])
+
+    def turn(question):
+        context = _open_user_turn(db, "u2", "c2", question)["context"]
+        ChatService.add_message(db, "c2", "assistant", "جواب")
+        return [int(m["content"].split(":")[0]) if ":" in m["content"] else m["content"] for m in context]
+
+    def summarized():
+        db.expire_all()
+        return db.query(Conversation).filter(Conversation.id == "c2").first().summarized_message_count
+
+    asyncio.run(ChatService.refresh_conversation_summary("c2"))
+    assert summarized() == 4
+    # Turn 1: messages 4-7 verbatim, the question itself is not repeated
+    assert turn("8:سؤال") == [4, 5, 6, 7]
+
+    asyncio.run(ChatService.refresh_conversation_summary("c2"))
+    assert summarized() == 6
+    # Turn 2: picks up right where the summary stops (message 6)
+    assert turn("10:سؤال") == [6, 7, 8, "جواب"]
+
+    # Summary lagging behind: the verbatim window grows to cover the gap
+    assert turn("12:سؤال") == [6, 7, 8, "جواب", 10, "جواب"]
+    db.close()
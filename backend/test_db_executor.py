@@ -0,0 +1,83 @@
+"""
+Database offload tests (run_db keeps the event loop free)
+Run: python -m pytest test_db_executor.py -q
+"""
+
+import asyncio
+import threading
+import time
+
+from app.core import db_executor
+from app.core.db_executor import run_db
+from app.core.tracing import MetricsRegistry, metrics
+
+
+def test_run_db_runs_in_a_worker_thread_and_returns_the_result():
+    def query(a, b=0):
+        return threading.get_ident(), a + b
+
+    async def scenario():
+        return threading.get_ident(), await run_db(query, 2, b=3)
+
+    loop_thread, (worker_thread, value) = asyncio.run(scenario())
+    assert value == 5 and worker_thread != loop_thread
+    assert metrics.summary()["db"]["count"] >= 1
+
+
+def test_blocking_db_work_does_not_stall_other_streams(monkeypatch):
+    monkeypatch.setattr(db_executor, "_limiter", None)
+
+    async def ticker(stop: asyncio.Event):
+        worst = 0.0
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            worst = max(worst, time.perf_counter() - started - 0.01)
+        return worst
+
+    async def scenario():
+        stop = asyncio.Event()
+        probe = asyncio.create_task(ticker(stop))
+        await asyncio.gather(*(run_db(time.sleep, 0.05) for _ in range(4)))
+        stop.set()
+        return await probe
+
+    assert asyncio.run(scenario()) < 0.04
+
+
+def test_sqlite_limiter_serializes_database_work(monkeypatch):
+    monkeypatch.setenv("DB_THREADS", "1")
+    monkeypatch.setattr(db_executor, "_limiter", None)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+
+    async def scenario():
+        await asyncio.gather(*(run_db(work) for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert peak[0] == 1
+
+
+def test_event_loop_lag_probe_records_blocking(monkeypatch):
+    from app.core import tracing
+
+    registry = MetricsRegistry()
+    monkeypatch.setattr(tracing, "metrics", registry)
+
+    async def scenario():
+        probe = asyncio.create_task(tracing.monitor_event_loop_lag(0.01))
+        await asyncio.sleep(0.02)
+        time.sleep(0.05)  # a blocking call on the loop
+        await asyncio.sleep(0.02)
+        probe.cancel()
+
+    asyncio.run(scenario())
+    assert registry.summary()["event_loop_lag"]["p99_ms"] >= 30
@@ -0,0 +1,101 @@
+"""
+Request deadline / stage skipping tests
+Run: python -m pytest test_deadline.py -q
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import rag_engine
+from app.core.deadline import Deadline
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_allows_until_budget_minus_reserve_is_too_small():
+    clock = FakeClock()
+    deadline = Deadline(budget_seconds=5.0, reserve_seconds=2.0, clock=clock)
+    assert deadline.allows("decomposition")  # 3.0s free, costs 1.5s
+
+    clock.now += 2.0
+    assert not deadline.allows("decomposition")
+    assert not deadline.allows("decomposition")
+    assert deadline.allows("scoring")
+    assert deadline.skipped_names() == ["decomposition"]
+    assert deadline.skipped_stages[0]["reason"] == "budget"
+
+
+def test_run_optional_cancels_slow_stage():
+    async def scenario():
+        deadline = Deadline(budget_seconds=0.25, reserve_seconds=0.2)
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(5)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        result = await deadline.run_optional("decomposition", slow, ["fallback"], expected_cost=0.01)
+        assert result == ["fallback"]
+        assert cancelled.is_set()
+        assert deadline.skipped_stages[0]["reason"] == "timeout"
+
+    asyncio.run(scenario())
+
+
+def test_retriever_falls_back_to_plain_vector_top_k(tmp_path, monkeypatch):
+    async def create(model, input):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0])])
+
+    retriever = rag_engine.DocumentRetriever(
+        SqliteVectorStore(str(tmp_path / "vectors.db")),
+        SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    )
+    retriever.adaptive_top_k = False
+
+    async def decompose(query):
+        raise AssertionError("decomposition should be skipped")
+
+    monkeypatch.setattr(retriever, "decompose_query_to_concepts", decompose)
+
+    async def scenario():
+        await retriever.storage.store_chunks([
+            Chunk(id=f"c{i}", title=f"نظام {i}", content="نص", embedding=[1.0, i * 0.1]) for i in range(6)
+        ])
+        deadline = Deadline(budget_seconds=0.5, reserve_seconds=1.0)
+        docs = await retriever.get_relevant_documents("سؤال", top_k=3, user_intent="GENERAL_QUESTION", deadline=deadline)
+
+        assert [d.id for d in docs] == ["c0", "c1", "c2"]
+        assert deadline.skipped_names() == ["decomposition", "scoring"]
+
+    asyncio.run(scenario())
+
+
+def test_engine_reports_skipped_navigation(monkeypatch):
+    engine = rag_engine.IntelligentLegalRAG()
+    long_chunk = Chunk(id="big", title="نظام العمل", content=" ".join(f"المادة {i} نص" for i in range(1, 8)))
+
+    async def stream(messages, category):
+        yield "جواب"
+
+    monkeypatch.setattr(engine, "_stream_ai_response", stream)
+
+    async def scenario():
+        deadline = Deadline(budget_seconds=0.0)
+        items = [item async for item in engine._generate_answer(
+            "سؤال", [], None, "GENERAL_QUESTION", documents=[long_chunk], deadline=deadline
+        )]
+        assert {"type": "stage_skipped", "stage": "article_navigation", "reason": "budget", "remaining_ms": 0} in items
+        assert "".join(item for item in items if isinstance(item, str)) == "جواب"
+
+    asyncio.run(scenario())
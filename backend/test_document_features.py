@@ -0,0 +1,75 @@
+"""
+Static document feature tests (ingestion-time kind/authority/style + vectorized scoring)
+Run: python -m pytest test_document_features.py -q
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.retrieval.document_features import (
+    classify_doc_kind, compute_static_features, composite_scores,
+    feature_columns, normalize_similarities, style_match_scores
+)
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+
+
+STATUTE_TEXT = "المادة 77: يجوز لصاحب العمل إنهاء العقد وفق نظام العمل الصادر بالمرسوم الملكي رقم م/51"
+MEMO_TEXT = "نفند ادعاءات المدعي نقطة بنقطة ونطلب رد الدعوى لعدم الاختصاص"
+
+
+def test_doc_kind_from_title_and_content():
+    assert classify_doc_kind("نظام العمل - المادة 77") == "statute"
+    assert classify_doc_kind("مذكرة دفاع في قضية عمالية") == "memo"
+    assert classify_doc_kind("دفع بعدم الاختصاص") == "case"
+    assert classify_doc_kind("وثيقة", content_type="legislation") == "statute"
+    assert classify_doc_kind("وثيقة") == "other"
+
+
+def test_statutes_get_high_citation_value():
+    statute = compute_static_features("نظام العمل", STATUTE_TEXT)
+    memo = compute_static_features("مذكرة دفاع", MEMO_TEXT)
+    assert statute.doc_kind == "statute"
+    assert statute.citation_value >= 0.7
+    assert memo.doc_kind == "memo"
+    assert memo.citation_value < 0.2
+
+
+def test_vectorized_scoring():
+    relevance = normalize_similarities([0.80, 0.90, 0.85])
+    assert np.allclose(relevance, [0.0, 1.0, 0.5])
+    assert normalize_similarities([0.8, 0.8]).tolist() == [1.0, 1.0]
+
+    style = style_match_scores(["memo", "memo", "statute"], ["MEMO_AGGRESSIVE", "MEMO_DEFENSIVE", None], "MEMO_AGGRESSIVE")
+    assert np.allclose(style, [1.0, 0.6, 0.2])
+
+    scores = composite_scores(relevance, style * 0, style)
+    assert scores.argmax() == 1
+
+
+def test_features_fall_back_for_unannotated_chunks():
+    chunk = Chunk(id="c1", title="نظام العمل", content=STATUTE_TEXT)
+    features = feature_columns([chunk])
+    assert features["doc_kind"] == ["statute"]
+    assert chunk.citation_value == features["citation_value"][0]
+
+
+def test_features_round_trip_through_sqlite(tmp_path):
+    async def scenario():
+        store = SqliteVectorStore(str(tmp_path / "vectors.db"))
+        await store.initialize()
+        chunk = Chunk(
+            id="memo_1", title="مذكرة دفاع", content=MEMO_TEXT, embedding=[1.0, 0.0],
+            doc_kind="memo", authority_score=0.5, citation_value=0.075, doc_style="MEMO_AGGRESSIVE",
+            article_citations=["المادة (5)"]
+        )
+        assert await store.store_chunks([chunk])
+
+        [result] = await store.search_similar([1.0, 0.0], top_k=1)
+        assert result.chunk.doc_kind == "memo"
+        assert result.chunk.doc_style == "MEMO_AGGRESSIVE"
+        assert result.chunk.article_citations == ["المادة (5)"]
+        assert (await store.get_chunk_by_id("memo_1")).citation_value == 0.075
+
+    asyncio.run(scenario())
@@ -0,0 +1,113 @@
+"""
+Hierarchical (law/chapter -> chunk) retrieval tests
+Run: python -m pytest test_hierarchical_index.py -q
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.retrieval.hierarchical_index import HierarchicalIndex, group_key
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+
+
+def clustered_corpus(laws=100, chunks_per_law=20, dims=64, seed=7):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(laws, dims))
+    entries = []
+    for law in range(laws):
+        for i in range(chunks_per_law):
+            vector = centers[law] + 0.3 * rng.normal(size=dims)
+            entries.append((f"law{law}_chunk{i}", vector, (f"نظام {law}", None)))
+    return centers, entries
+
+
+def test_group_key_uses_law_title_and_chapter():
+    metadata = {"law_title": "نظام العمل", "legal_structure": {"chapter_context": "الباب الأول"}}
+    assert group_key("نظام العمل - الباب الأول > المادة 1", metadata) == ("نظام العمل", "الباب الأول")
+    assert group_key("نظام المرور - المادة 3", {}) == ("نظام المرور", None)
+
+
+def test_two_stage_search_scores_a_fraction_and_matches_flat():
+    centers, entries = clustered_corpus()
+    index = HierarchicalIndex.build(entries)
+    query = centers[42] + 0.1
+
+    ranked, stats = index.search(query, top_k=10, max_groups=4)
+
+    assert stats.groups_scored == 100
+    assert stats.candidates_scored == 80
+    assert stats.total_chunks / stats.candidates_scored >= 20
+    assert all(chunk_id.startswith("law42_") for chunk_id, _ in ranked)
+
+    matrix = index.matrix
+    flat = matrix @ (query / np.linalg.norm(query))
+    flat_top = [index.ids[i] for i in np.argsort(-flat)[:10]]
+    assert [chunk_id for chunk_id, _ in ranked] == flat_top
+
+
+def test_small_groups_are_expanded_until_top_k_is_reachable():
+    _, entries = clustered_corpus(laws=10, chunks_per_law=2)
+    ranked, stats = HierarchicalIndex.build(entries).search(entries[0][1], top_k=7, max_groups=1)
+    assert len(ranked) == 7
+    assert stats.groups_selected == 4
+
+
+def test_store_search_hierarchical_and_invalidation(tmp_path):
+    async def scenario():
+        store = SqliteVectorStore(str(tmp_path / "vectors.db"))
+        labor = [1.0, 0.0, 0.0]
+        traffic = [0.0, 1.0, 0.0]
+        await store.store_chunks([
+            Chunk(id="l1", title="نظام العمل - المادة 1", content="أ", embedding=labor),
+            Chunk(id="l2", title="نظام العمل - المادة 2", content="ب", embedding=[0.9, 0.1, 0.0]),
+            Chunk(id="t1", title="نظام المرور - المادة 1", content="ج", embedding=traffic),
+        ])
+
+        results = await store.search_hierarchical([1.0, 0.05, 0.0], top_k=2, max_groups=1)
+        assert [r.chunk.id for r in results] == ["l1", "l2"]
+        assert results[0].similarity_score > results[1].similarity_score
+
+        await store.store_chunks([Chunk(id="t2", title="نظام المرور - المادة 2", content="د", embedding=[0.0, 0.0, 1.0])])
+        results = await store.search_hierarchical([0.0, 0.0, 1.0], top_k=1, max_groups=1)
+        assert [r.chunk.id for r in results] == ["t2"]
+
+    asyncio.run(scenario())
+
+
+def test_store_picks_up_writes_from_other_processes(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "vectors.db")
+        store = SqliteVectorStore(path)
+        await store.store_chunks([Chunk(id="l1", title="نظام العمل - المادة 1", content="أ", embedding=[1.0, 0.0, 0.0])])
+        builds = []
+        build = store._build_hierarchy
+
+        async def counting_build(db):
+            builds.append(1)
+            return await build(db)
+
+        store._build_hierarchy = counting_build
+
+        # Concurrent cold searches share one rebuild
+        await asyncio.gather(*[store.search_hierarchical([1.0, 0.0, 0.0], top_k=1) for _ in range(5)])
+        assert len(builds) == 1
+
+        # Another process (ingestion script, worker) adds a chunk
+        other = SqliteVectorStore(path)
+        await other.store_chunks([Chunk(id="t1", title="نظام المرور - المادة 1", content="ج", embedding=[0.0, 1.0, 0.0])])
+
+        # Within the TTL the cached index is reused; after it the version check notices the write
+        results = await store.search_hierarchical([0.0, 1.0, 0.0], top_k=1, max_groups=1)
+        assert [r.chunk.id for r in results] == ["l1"]
+        store.hierarchy_ttl = 0
+        results = await store.search_hierarchical([0.0, 1.0, 0.0], top_k=1, max_groups=1)
+        assert [r.chunk.id for r in results] == ["t1"]
+        assert len(builds) == 2
+
+        # Unchanged data: the check runs, the matrix is not rebuilt
+        await store.search_hierarchical([0.0, 1.0, 0.0], top_k=1)
+        assert len(builds) == 2
+
+    asyncio.run(scenario())
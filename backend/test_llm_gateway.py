@@ -0,0 +1,187 @@
+"""
+LLM gateway tests (fake client, no network)
+Run: python -m pytest test_llm_gateway.py -q
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import openai
+
+from app.core.llm_gateway import LLMGateway, ModelLimits, TokenBucket
+
+
+def _rate_limit_error() -> openai.RateLimitError:
+    request = httpx.Request("POST", "http://stub/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+def _completion(text: str):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=5, completion_tokens=3),
+    )
+
+
+class FakeStream:
+    def __init__(self, parts):
+        self._parts = list(parts)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self._parts:
+            raise StopAsyncIteration
+        part = self._parts.pop(0)
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+
+class FakeClient:
+    """Scriptable AsyncOpenAI stand-in"""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.embeddings = SimpleNamespace(create=self._create)
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            return await self.behaviour(self.calls, kwargs)
+        finally:
+            self.active -= 1
+
+
+def _gateway(client, **kwargs):
+    return LLMGateway(client, base_delay=0.01, max_delay=0.02, **kwargs)
+
+
+def test_retries_rate_limits_then_succeeds():
+    async def behaviour(call, kwargs):
+        if call < 3:
+            raise _rate_limit_error()
+        return _completion("ok")
+
+    async def scenario():
+        client = FakeClient(behaviour)
+        gateway = _gateway(client)
+        response = await gateway.chat.completions.create(model="m", messages=[{"role": "user", "content": "س"}])
+        assert response.choices[0].message.content == "ok"
+        metrics = gateway.get_metrics()["m"]
+        assert client.calls == 3
+        assert metrics["retries"] == 2
+        assert metrics["errors"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_gives_up_after_max_retries():
+    async def behaviour(call, kwargs):
+        raise _rate_limit_error()
+
+    async def scenario():
+        gateway = _gateway(FakeClient(behaviour), max_retries=1)
+        try:
+            await gateway.chat.completions.create(model="m", messages=[])
+        except openai.RateLimitError:
+            pass
+        else:
+            raise AssertionError("expected RateLimitError")
+        assert gateway.get_metrics()["m"]["errors"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_per_model_concurrency_cap():
+    async def behaviour(call, kwargs):
+        await asyncio.sleep(0.02)
+        return _completion("ok")
+
+    async def scenario():
+        client = FakeClient(behaviour)
+        gateway = _gateway(client, default_limits=ModelLimits(max_concurrency=2))
+        await asyncio.gather(*[
+            gateway.chat.completions.create(model="m", messages=[]) for _ in range(8)
+        ])
+        assert client.peak == 2
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_throttles():
+    async def scenario():
+        bucket = TokenBucket(per_minute=6000)  # 100 tokens / second
+        await bucket.acquire(6000)
+        started = time.monotonic()
+        await bucket.acquire(10)
+        assert time.monotonic() - started >= 0.08
+
+    asyncio.run(scenario())
+
+
+def test_hedges_slow_call_after_p95():
+    async def behaviour(call, kwargs):
+        await asyncio.sleep(1.0 if call == 1 else 0.01)
+        return _completion(f"call-{call}")
+
+    async def scenario():
+        gateway = _gateway(FakeClient(behaviour), hedge_enabled=True, hedge_min_samples=5)
+        state = gateway._state("m")
+        state.metrics.latencies_ms.extend([20.0] * 10)
+
+        started = time.monotonic()
+        response = await gateway.chat.completions.create(model="m", messages=[])
+        assert response.choices[0].message.content == "call-2"
+        assert time.monotonic() - started < 0.5
+        assert gateway.get_metrics()["m"]["hedged"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_hedge_takes_its_own_slot_or_is_skipped():
+    async def behaviour(call, kwargs):
+        await asyncio.sleep(0.3 if call == 1 else 0.01)
+        return _completion(f"call-{call}")
+
+    async def scenario(max_concurrency):
+        client = FakeClient(behaviour)
+        gateway = _gateway(client, hedge_enabled=True, hedge_min_samples=5,
+                           default_limits=ModelLimits(max_concurrency=max_concurrency))
+        gateway._state("m").metrics.latencies_ms.extend([20.0] * 10)
+
+        response = await gateway.chat.completions.create(model="m", messages=[])
+        return response.choices[0].message.content, client.peak, gateway.get_metrics()["m"]
+
+    # Single slot held by the slow call: no hedge, the cap is never exceeded
+    content, peak, metrics = asyncio.run(scenario(1))
+    assert content == "call-1" and peak == 1
+    assert metrics["hedged"] == 0 and metrics["hedges_skipped"] == 1
+
+    content, peak, metrics = asyncio.run(scenario(2))
+    assert content == "call-2" and peak == 2 and metrics["hedged"] == 1
+
+
+def test_stream_holds_slot_until_consumed():
+    async def behaviour(call, kwargs):
+        return FakeStream(["مرحبا", " ", "بك"])
+
+    async def scenario():
+        gateway = _gateway(FakeClient(behaviour), default_limits=ModelLimits(max_concurrency=1))
+        stream = await gateway.chat.completions.create(model="m", messages=[], stream=True)
+        assert gateway._state("m").semaphore.locked()
+
+        parts = [chunk.choices[0].delta.content async for chunk in stream]
+        assert "".join(parts) == "مرحبا بك"
+        assert not gateway._state("m").semaphore.locked()
+        assert gateway.get_metrics()["m"]["first_token_p50_ms"] is not None
+
+    asyncio.run(scenario())
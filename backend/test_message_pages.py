@@ -0,0 +1,90 @@
+"""
+Message page tests (newest page by default, before/after cursors, composite indexes)
+Run: python -m pytest test_message_pages.py -q
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every table on Base
+from app.api.chat import _message_page
+from app.database import Base
+from app.models.conversation import Message
+from app.models.user import User
+from app.services.chat_service import ChatService
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pages.db'}")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def conversation(db):
+    user = User(email="pages@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    conversation = ChatService.create_conversation(db, user.id, "long")
+    start = datetime(2026, 10, 1, 9, 0)
+    for i in range(12):
+        # m4..m7 share a timestamp: the id breaks the tie
+        at = start + timedelta(minutes=4 if 4 <= i <= 7 else i)
+        db.add(Message(conversation_id=conversation.id, role="user", content=f"m{i}", created_at=at))
+    db.commit()
+    return conversation
+
+
+def _contents(page):
+    return [message["content"] for message in page["messages"]]
+
+
+def test_default_page_is_the_newest_in_chronological_order(db, conversation):
+    page = _message_page(db, conversation.user_id, conversation.id, 3, None, None)
+    assert _contents(page) == ["m9", "m10", "m11"]
+    assert page["has_older"] and not page["has_newer"]
+
+
+def test_before_cursor_walks_back_through_ties_without_gaps(db, conversation):
+    seen, before = [], None
+    while True:
+        page = _message_page(db, conversation.user_id, conversation.id, 5, before, None)
+        seen = [message["id"] for message in page["messages"]] + seen
+        if not page["has_older"]:
+            break
+        before = page["messages"][0]["id"]
+
+    assert len(seen) == len(set(seen)) == 12
+    ordered = ChatService.get_conversation_messages(db, conversation.id, 100)
+    assert seen == [message.id for message in ordered]
+
+
+def test_after_cursor_returns_newer_messages(db, conversation):
+    oldest = _message_page(db, conversation.user_id, conversation.id, 100, None, None)["messages"][0]["id"]
+    page = _message_page(db, conversation.user_id, conversation.id, 2, None, oldest)
+    assert _contents(page) == ["m1", "m2"] and page["has_newer"] and page["has_older"]
+
+
+def test_foreign_conversation_and_unknown_cursor(db, conversation):
+    assert _message_page(db, "someone-else", conversation.id, 5, None, None) is None
+    with pytest.raises(ValueError):
+        _message_page(db, conversation.user_id, conversation.id, 5, "no-such-message", None)
+
+
+def test_queries_use_the_composite_indexes(db, conversation):
+    message_plan = " ".join(str(row) for row in db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM messages WHERE conversation_id = :c ORDER BY created_at DESC LIMIT 10"
+    ), {"c": conversation.id}))
+    list_plan = " ".join(str(row) for row in db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM conversations WHERE user_id = :u AND is_active = 1 "
+        "ORDER BY updated_at DESC LIMIT 20"
+    ), {"u": conversation.user_id}))
+
+    assert "ix_messages_conversation_created" in message_plan and "TEMP B-TREE" not in message_plan
+    assert "ix_conversations_user_active_updated" in list_plan and "TEMP B-TREE" not in list_plan
@@ -0,0 +1,149 @@
+"""
+Provider failover tests against two local OpenAI-compatible stub servers
+Run: python -m pytest test_provider_failover.py -q
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import pytest
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+from app.core.llm_gateway import LLMGateway
+from app.core.provider_router import LLMProvider, ProviderRouter
+
+
+def _stub_app(name: str, state: dict) -> FastAPI:
+    """Minimal /v1/chat/completions stub; behaviour controlled via `state`"""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        state["requests"] += 1
+        state["max_tokens"] = (await request.json()).get("max_tokens")
+        mode = state["mode"]
+        if mode == "429":
+            return JSONResponse({"error": {"message": "rate limited"}}, status_code=429)
+        if mode == "500":
+            return JSONResponse({"error": {"message": "boom"}}, status_code=500)
+
+        async def events():
+            if mode == "slow":
+                await asyncio.sleep(2)
+            for part in [f"{name}:", " مرحبا"]:
+                chunk = {
+                    "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                    "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def stubs():
+    servers, states = [], {}
+    for name in ("primary", "secondary"):
+        states[name] = {"mode": "ok", "requests": 0}
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(_stub_app(name, states[name]), host="127.0.0.1", port=port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.01)
+        servers.append(server)
+        states[name]["url"] = f"http://127.0.0.1:{port}/v1"
+    yield states
+    for server in servers:
+        server.should_exit = True
+
+
+def _router(stubs, first_token_timeout: float = 1.0, secondary_max_output_tokens=None) -> ProviderRouter:
+    providers = [
+        LLMProvider(
+            name=name,
+            gateway=LLMGateway(AsyncOpenAI(api_key="sk-stub", base_url=stubs[name]["url"], max_retries=0)),
+            chat_model="stub-model",
+            classification_model="stub-model",
+            max_output_tokens=secondary_max_output_tokens if name == "secondary" else None,
+        )
+        for name in ("primary", "secondary")
+    ]
+    return ProviderRouter(providers, first_token_timeout=first_token_timeout, base_cooldown=30)
+
+
+def _reset(stubs, primary="ok", secondary="ok"):
+    stubs["primary"].update(mode=primary, requests=0)
+    stubs["secondary"].update(mode=secondary, requests=0)
+
+
+async def _collect(router) -> str:
+    return "".join([part async for part in router.stream_chat([{"role": "user", "content": "سؤال"}])])
+
+
+def test_healthy_primary_is_used(stubs):
+    _reset(stubs)
+    router = _router(stubs)
+    assert asyncio.run(_collect(router)) == "primary: مرحبا"
+    assert stubs["secondary"]["requests"] == 0
+
+
+def test_rate_limited_primary_fails_over_and_is_remembered(stubs):
+    _reset(stubs, primary="429")
+    router = _router(stubs)
+
+    async def scenario():
+        first = await _collect(router)
+        second = await _collect(router)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == "secondary: مرحبا"
+    # Primary is in cooldown, so the second request goes straight to the secondary
+    assert stubs["primary"]["requests"] == 1
+    assert router.failovers == 1
+    assert not router.get_status()["providers"][0]["healthy"]
+
+
+def test_slow_first_token_fails_over(stubs):
+    _reset(stubs, primary="slow")
+    router = _router(stubs, first_token_timeout=0.5)
+
+    started = time.monotonic()
+    assert asyncio.run(_collect(router)) == "secondary: مرحبا"
+    assert time.monotonic() - started < 1.5
+    assert "FirstTokenTimeout" in router.get_status()["providers"][0]["last_error"]
+
+
+def test_max_tokens_is_clamped_to_the_failover_model_limit(stubs):
+    _reset(stubs, primary="429")
+    router = _router(stubs, secondary_max_output_tokens=8192)
+
+    async def scenario():
+        stream = router.stream_chat([{"role": "user", "content": "سؤال"}], max_tokens=15000)
+        return "".join([part async for part in stream])
+
+    assert asyncio.run(scenario()) == "secondary: مرحبا"
+    assert stubs["primary"]["max_tokens"] == 15000
+    assert stubs["secondary"]["max_tokens"] == 8192
+
+
+def test_all_providers_failing_raises(stubs):
+    _reset(stubs, primary="500", secondary="429")
+    router = _router(stubs)
+    with pytest.raises(Exception):
+        asyncio.run(_collect(router))
@@ -0,0 +1,94 @@
+"""
+Quota engine tests (check-and-consume, cooldown, idle expiry, shared SQLite counters)
+Run: python -m pytest test_quota_engine.py -q
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core import quota_engine
+from app.core.quota_engine import MemoryQuotaEngine, QuotaPolicy, SqliteQuotaEngine
+from app.services.guest_service import GuestService
+from app.storage.session_store import MemorySessionStore
+
+POLICY = QuotaPolicy(limit=3, cooldown_seconds=600, idle_seconds=60)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_engine(request, tmp_path):
+    def make(clock):
+        if request.param == "sqlite":
+            return SqliteQuotaEngine(str(tmp_path / "quotas.db"), clock=clock)
+        return MemoryQuotaEngine(clock=clock)
+    return make
+
+
+def test_limit_then_cooldown_then_fresh_cycle(make_engine):
+    clock = FakeClock()
+    engine = make_engine(clock)
+    decisions = [engine.consume("k", POLICY) for _ in range(4)]
+
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert decisions[2].reset_at is not None and decisions[3].used == 3
+    assert not engine.peek("k", POLICY).allowed
+
+    clock.now += 601
+    assert engine.peek("k", POLICY).used == 0
+    fresh = engine.consume("k", POLICY)
+    assert fresh.allowed and fresh.used == 1 and fresh.reset_at is None
+
+
+def test_idle_counter_lapses_but_cooldown_outlives_idle_window(make_engine):
+    clock = FakeClock()
+    engine = make_engine(clock)
+    engine.consume("idle", POLICY)
+    for _ in range(3):
+        engine.consume("limited", POLICY)
+
+    clock.now += 120
+    assert engine.peek("idle", POLICY).used == 0
+    assert not engine.peek("limited", POLICY).allowed
+    assert engine.sweep() == 1
+
+
+def test_refund_lifts_the_cooldown(make_engine):
+    engine = make_engine(FakeClock())
+    for _ in range(3):
+        engine.consume("k", POLICY)
+
+    refunded = engine.refund("k", POLICY)
+    assert refunded.allowed and refunded.used == 2 and refunded.reset_at is None
+    assert engine.consume("k", POLICY).allowed
+
+
+def test_workers_sharing_sqlite_never_overgrant(tmp_path):
+    path = str(tmp_path / "quotas.db")
+    workers = [SqliteQuotaEngine(path) for _ in range(4)]
+    policy = QuotaPolicy(limit=7, cooldown_seconds=600)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: workers[i % 4].consume("guest:race", policy).allowed, range(40)))
+
+    assert sum(results) == 7
+    assert not SqliteQuotaEngine(path).peek("guest:race", policy).allowed
+
+
+def test_guest_quota_is_independent_of_session_eviction(monkeypatch, tmp_path):
+    monkeypatch.setattr(quota_engine, "_engine", SqliteQuotaEngine(str(tmp_path / "quotas.db")))
+    monkeypatch.setattr(GuestService, "store", MemorySessionStore(max_sessions=1))
+    for _ in range(7):
+        assert GuestService.claim_guest_question("limited").allowed
+
+    GuestService.get_guest_session("someone-else")  # evicts "limited" from the store
+    quota = GuestService.claim_guest_question("limited")
+    assert not quota.allowed and quota.reset_at is not None
+    assert GuestService.guest_quota("limited").remaining == 0
@@ -0,0 +1,149 @@
+"""
+Request coalescing tests
+Run: python -m pytest test_request_coalescing.py -q
+"""
+
+import asyncio
+
+import pytest
+
+import rag_engine
+from app.core.request_coalescer import GenerationCancelled, StreamBroadcaster, StreamCoalescer, normalize_query
+
+
+async def _slow_source(parts, delay=0.01, log=None):
+    try:
+        for part in parts:
+            await asyncio.sleep(delay)
+            if log is not None:
+                log.append(part)
+            yield part
+    finally:
+        if log is not None:
+            log.append("closed")
+
+
+def test_normalize_query_ignores_diacritics_and_punctuation():
+    assert normalize_query("ما هِيَ عقوبة  التهرّب الضريبي؟") == normalize_query("ما هي عقوبه التهرب الضريبي")
+    assert normalize_query("أريد مقاضاة شركتي") == normalize_query("اريد مقاضاه شركتي!")
+
+
+def test_late_joiner_replays_buffered_prefix():
+    async def scenario():
+        produced = []
+        broadcaster = StreamBroadcaster(_slow_source(["أ", "ب", "ج", "د"], log=produced))
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            return "".join([chunk async for chunk in broadcaster.subscribe()])
+
+        early, late = await asyncio.gather(consume(0), consume(0.025))
+        assert early == late == "أبجد"
+        assert produced == ["أ", "ب", "ج", "د", "closed"]
+
+    asyncio.run(scenario())
+
+
+def test_coalescer_runs_factory_once_per_key():
+    async def scenario():
+        coalescer = StreamCoalescer()
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return _slow_source(["x", "y"])
+
+        async def ask():
+            return "".join([c async for c in coalescer.stream(("q", "GENERAL_QUESTION"), factory)])
+
+        results = await asyncio.gather(*[ask() for _ in range(5)])
+        assert results == ["xy"] * 5
+        assert len(calls) == 1
+        assert coalescer.get_stats() == {"in_flight": 0, "leaders": 1, "joiners": 4}
+
+    asyncio.run(scenario())
+
+
+def test_last_subscriber_leaving_cancels_generation():
+    async def scenario():
+        produced = []
+        broadcaster = StreamBroadcaster(_slow_source(["a"] * 100, log=produced))
+        async for _ in broadcaster.subscribe():
+            break
+        await asyncio.sleep(0.05)
+        assert broadcaster.done
+        assert produced[-1] == "closed"
+        assert len(produced) < 20
+
+    asyncio.run(scenario())
+
+
+def test_engine_coalesces_context_free_questions_only(monkeypatch):
+    engine = rag_engine.IntelligentLegalRAG()
+    calls = {"classify": 0, "generate": 0}
+
+    async def classify_intent(query, history=None):
+        calls["classify"] += 1
+        await asyncio.sleep(0.02)
+        return {"category": "GENERAL_QUESTION", "confidence": 0.9}
+
+    async def generate(query, history, summary, category, documents=None, deadline=None, pinned_documents=None):
+        calls["generate"] += 1
+        for part in ["جواب", " ", "واحد"]:
+            await asyncio.sleep(0.01)
+            yield part
+
+    monkeypatch.setattr(engine.classifier, "classify_intent", classify_intent)
+    monkeypatch.setattr(engine, "_generate_answer", generate)
+
+    async def ask(query, history):
+        return "".join([c async for c in engine.ask_question_with_context_streaming(query, history)])
+
+    async def scenario():
+        answers = await asyncio.gather(ask("ما هي عقوبة التهرب؟", []), ask("ما هي عقوبة التهرب", []))
+        assert answers == ["جواب واحد"] * 2
+        assert calls == {"classify": 1, "generate": 1}
+
+        history = [{"role": "user", "content": "سؤال سابق"}]
+        await asyncio.gather(ask("ما هي عقوبة التهرب؟", history), ask("ما هي عقوبة التهرب؟", history))
+        assert calls == {"classify": 3, "generate": 3}
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_broadcaster_is_forgotten_and_not_joined():
+    async def scenario():
+        coalescer = StreamCoalescer()
+        key = ("q", "GENERAL_QUESTION")
+        calls = []
+
+        def factory():
+            calls.append(1)
+            return _slow_source(["a"] * 100)
+
+        stream = coalescer.stream(key, factory)
+        await stream.__anext__()
+        await stream.aclose()  # last subscriber leaves -> leader cancelled
+
+        # Asked again before the cancelled task has ended: a fresh generation, not the dying one
+        assert "".join([c async for c in coalescer.stream(key, lambda: _slow_source(["b"]))]) == "b"
+        await asyncio.sleep(0.05)
+        assert coalescer._inflight == {}
+        assert coalescer.get_stats()["leaders"] == 2 and coalescer.get_stats()["joiners"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_subscriber_of_cancelled_generation_gets_an_error_not_a_partial_answer():
+    async def scenario():
+        broadcaster = StreamBroadcaster(_slow_source(["a"] * 100))
+        first = broadcaster.subscribe()
+        await first.__anext__()
+        await first.aclose()
+        assert not broadcaster.joinable
+
+        with pytest.raises(GenerationCancelled):
+            async for _ in broadcaster.subscribe():
+                pass
+
+    asyncio.run(scenario())
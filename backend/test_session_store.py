@@ -0,0 +1,103 @@
+"""
+Guest session store tests (LRU / TTL / byte budget, shared SQLite store)
+Run: python -m pytest test_session_store.py -q
+"""
+
+import asyncio
+from datetime import datetime
+
+from app.services import chat_service, guest_service
+from app.services.chat_service import ChatService
+from app.services.guest_service import GuestService
+from app.storage.session_store import MemorySessionStore, SqliteSessionStore, render_prometheus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _session(messages: int = 0, size: int = 10):
+    return {
+        "last_activity": None,
+        "conversation_history": [{"role": "user", "content": "س" * size} for _ in range(messages)],
+    }
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_sessions=2)
+    store.put("a", _session())
+    store.put("b", _session())
+    assert store.get("a") is not None  # "a" is now most recent
+    store.put("c", _session())
+
+    assert store.get("b") is None and store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"]["lru"] == 1
+
+
+def test_memory_store_enforces_byte_budget():
+    store = MemorySessionStore(max_bytes=3000)
+    for i in range(5):
+        store.put(f"s{i}", _session(messages=2, size=200))
+
+    stats = store.stats()
+    assert stats["bytes"] <= 3000 and stats["evictions"]["bytes"] > 0
+    assert store.get("s4") is not None and store.get("s0") is None
+
+
+def test_memory_store_ttl_and_sweep():
+    clock = FakeClock()
+    store = MemorySessionStore(ttl_seconds=60, clock=clock)
+    store.put("short", _session())
+    store.put("long", _session(), ttl_seconds=600)
+
+    clock.now += 120
+    assert store.sweep() == 1
+    assert store.get("short") is None and store.get("long") is not None
+    assert store.stats()["evictions"]["ttl"] == 1 and store.stats()["sessions"] == 1
+
+
+def test_sqlite_store_is_shared_and_keeps_datetimes(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    worker_a, worker_b = SqliteSessionStore(path), SqliteSessionStore(path)
+    seen = datetime(2025, 8, 14, 17, 30)
+    worker_a.put("guest", {**_session(messages=1), "last_activity": seen})
+
+    loaded = worker_b.get("guest")
+    assert loaded["last_activity"] == seen and loaded["conversation_history"][0]["role"] == "user"
+    assert worker_b.stats()["sessions"] == 1
+
+
+def test_sqlite_store_expires_and_caps_sessions(tmp_path):
+    clock = FakeClock()
+    store = SqliteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=60, max_sessions=2, clock=clock)
+    store.put("old", _session())
+    clock.now += 30
+    for name in ("x", "y", "z"):
+        clock.now += 1
+        store.put(name, _session())
+
+    assert store.sweep() == 2  # "old" beyond the cap, then the oldest remaining
+    assert store.get("x") is None and store.get("z") is not None
+    clock.now += 120
+    assert store.get("z") is None  # expired even before the sweep
+    assert store.sweep() == 2
+    assert 'reason="lru"} 2' in render_prometheus(store.stats())
+
+
+def test_guest_summary_is_saved_through_a_copying_store(monkeypatch, tmp_path):
+    class FakeSummarizer:
+        async def summarize_conversation(self, previous_summary, new_messages):
+            return f"summary of {len(new_messages)}"
+
+    monkeypatch.setattr(GuestService, "store", SqliteSessionStore(str(tmp_path / "sessions.db")))
+    monkeypatch.setattr(chat_service, "get_rag_engine", lambda: FakeSummarizer())
+    for i in range(10):
+        GuestService.add_message_to_history("g", "user" if i % 2 == 0 else "assistant", f"m{i}")
+
+    asyncio.run(ChatService.refresh_guest_summary(GuestService.get_guest_session("g")))
+    stored = GuestService.get_guest_session("g")
+    assert stored["context_summary"] == "summary of 6" and stored["summarized_count"] == 6
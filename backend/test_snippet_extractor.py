@@ -0,0 +1,86 @@
+"""
+Query-aware snippet extraction tests
+Run: python -m pytest test_snippet_extractor.py -q
+"""
+
+import asyncio
+
+import numpy as np
+
+from app.retrieval.snippet_extractor import (
+    split_sentence_spans,
+    select_best_window,
+    extract_snippet,
+    normalize_rows,
+)
+from app.storage.sqlite_store import SqliteVectorStore
+from app.storage.vector_store import Chunk
+
+
+def _legal_text() -> str:
+    filler = "يلتزم صاحب العمل بتوفير بيئة عمل آمنة للعمال وفقاً للأنظمة المعمول بها. " * 8
+    return (
+        "المادة الأولى: " + filler + "\n"
+        "المادة الثانية: " + filler + "\n"
+        "المادة الثالثة: يستحق العامل مكافأة نهاية الخدمة عن كل سنة من سنوات عمله.\n"
+        "المادة الرابعة: " + filler
+    )
+
+
+def test_spans_cover_articles_and_respect_limits():
+    text = _legal_text()
+    spans = split_sentence_spans(text)
+
+    assert spans, "expected at least one span"
+    assert all(0 <= start < end <= len(text) for start, end in spans)
+    assert all(end - start <= 600 for start, end in spans)
+    # Spans are ordered and non-overlapping
+    assert all(a[1] <= b[0] for a, b in zip(spans, spans[1:]))
+    # Every article header starts its own span
+    starts = {text[start:end].lstrip()[:20] for start, end in spans}
+    assert any(s.startswith("المادة الثالثة") for s in starts)
+
+
+def test_best_window_contains_target_sentence():
+    text = _legal_text()
+    spans = split_sentence_spans(text)
+    target = next(i for i, (s, e) in enumerate(spans) if "مكافأة نهاية الخدمة" in text[s:e])
+
+    rng = np.random.default_rng(7)
+    embeddings = normalize_rows(rng.normal(size=(len(spans), 16)))
+    query = embeddings[target] * 3.0
+
+    start, end = select_best_window(embeddings, spans, query, max_chars=400)
+    assert end - start <= 400
+    assert start <= spans[target][0] and spans[target][1] <= end
+
+
+def test_extract_snippet_falls_back_without_index():
+    text = _legal_text()
+    assert extract_snippet(text, None, None, [0.1] * 16) is None
+    # Short chunks are used whole
+    assert extract_snippet("المادة الأولى: نص قصير.", np.ones((1, 4)), [[0, 10]], [1, 0, 0, 0]) is None
+
+
+def test_sqlite_store_round_trips_sentence_index(tmp_path):
+    async def scenario():
+        store = SqliteVectorStore(str(tmp_path / "vectors.db"))
+        sentence_embeddings = np.eye(3, 4).tolist()
+        chunk = Chunk(
+            id="doc_1",
+            content="جملة أولى. جملة ثانية. جملة ثالثة.",
+            title="نظام العمل",
+            embedding=[1.0, 0.0, 0.0, 0.0],
+            metadata={},
+            sentence_spans=[[0, 10], [10, 22], [22, 34]],
+            sentence_embeddings=sentence_embeddings,
+        )
+        assert await store.store_chunks([chunk])
+
+        results = await store.search_similar([1.0, 0.0, 0.0, 0.0], top_k=1)
+        loaded = results[0].chunk
+        assert loaded.sentence_spans == chunk.sentence_spans
+        assert loaded.sentence_embeddings.shape == (3, 4)
+        assert np.allclose(loaded.sentence_embeddings, sentence_embeddings, atol=1e-3)
+
+    asyncio.run(scenario())
@@ -0,0 +1,129 @@
+"""
+SSE framer tests (coalescing window and byte budget, frame shape, stalled streams)
+Run: python -m pytest test_sse_framer.py -q
+"""
+
+import asyncio
+import json
+
+from app.core.sse_framer import SSEFramer, StreamTotals, coalesce, render_prometheus
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def parse(frame):
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    return json.loads(frame[len("data: "):-2])
+
+
+def test_first_delta_is_sent_immediately_then_deltas_coalesce_within_the_window():
+    clock = FakeClock()
+    framer = SSEFramer(window_ms=40, max_bytes=10_000, clock=clock)
+
+    assert parse(framer.add("نص")) == {"type": "chunk", "content": "نص", "chunk_id": 1}
+    assert framer.add(" النظام") is None
+    clock.now = 0.02
+    assert framer.add(" الأساسي") is None
+    clock.now = 0.05
+    frame = framer.add(" للحكم")
+
+    assert parse(frame) == {"type": "chunk", "content": " النظام الأساسي للحكم", "chunk_id": 2}
+    assert framer.stats()["deltas"] == 4
+    assert framer.stats()["chunk_frames"] == 2
+
+
+def test_byte_budget_flushes_before_the_window():
+    framer = SSEFramer(window_ms=1000, max_bytes=8, clock=FakeClock())
+    framer.add("a")
+
+    assert framer.add("bcd") is None
+    assert parse(framer.add("efghi"))["content"] == "bcdefghi"
+
+
+def test_chunk_frames_escape_text_and_keep_utf8_raw():
+    framer = SSEFramer(clock=FakeClock())
+    frame = framer.add('قال "المادة"\n\\')
+
+    assert parse(frame)["content"] == 'قال "المادة"\n\\'
+    assert "\\u" not in frame
+    assert framer.bytes == len(frame.encode("utf-8"))
+
+
+def test_flush_and_remaining_track_the_buffer():
+    clock = FakeClock()
+    framer = SSEFramer(window_ms=40, clock=clock)
+    framer.add("a")
+
+    assert framer.remaining() is None and framer.flush() is None
+    framer.add("b")
+    clock.now = 0.01
+    assert abs(framer.remaining() - 0.03) < 1e-9
+    assert parse(framer.flush())["content"] == "b"
+    assert framer.remaining() is None
+
+
+def test_event_frames_are_counted():
+    framer = SSEFramer()
+    framer.event({"type": "metadata", "id": "x"})
+    framer.done()
+
+    assert framer.stats()["frames"] == 2
+    assert framer.stats()["chunk_frames"] == 0
+
+
+def test_coalesce_flushes_a_stalled_window():
+    framer = SSEFramer(window_ms=20)
+
+    async def engine():
+        yield "first"
+        yield "second"
+        await asyncio.sleep(0.2)
+        yield "third"
+
+    async def scenario():
+        sent = []
+        async for item in coalesce(engine(), framer):
+            frame = framer.flush() if item is None else framer.add(item)
+            if frame:
+                sent.append(parse(frame)["content"])
+        frame = framer.flush()
+        if frame:
+            sent.append(parse(frame)["content"])
+        return sent
+
+    # "second" goes out when its window expires, not when "third" arrives
+    assert asyncio.run(scenario()) == ["first", "second", "third"]
+
+
+def test_coalesce_passes_items_through_when_nothing_is_buffered():
+    framer = SSEFramer()
+
+    async def engine():
+        for i in range(3):
+            yield i
+
+    async def scenario():
+        return [item async for item in coalesce(engine(), framer)]
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+
+
+def test_totals_and_prometheus():
+    totals = StreamTotals()
+    framer = SSEFramer(clock=FakeClock())
+    framer.add("a")
+    framer.add("b")
+    framer.event({"type": "complete"})
+    totals.add(framer.stats())
+
+    body = render_prometheus(totals.snapshot())
+    assert "legal_chat_sse_streams_total 1" in body
+    assert 'legal_chat_sse_frames_total{kind="chunk"} 1' in body
+    assert 'legal_chat_sse_frames_total{kind="other"} 1' in body
+    assert "legal_chat_sse_deltas_total 2" in body
@@ -0,0 +1,244 @@
+"""
+Stream cancellation tests (disconnect polling, upstream close, truncated answers, savings metrics)
+Run: python -m pytest test_stream_cancellation.py -q
+"""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+
+import pytest
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from openai import AsyncOpenAI
+
+from app.api import chat
+from app.core.llm_gateway import LLMGateway
+from app.core.provider_router import LLMProvider, ProviderRouter
+from app.core.stream_cancellation import CancellationStats, DisconnectWatch, render_prometheus
+from app.services.guest_service import GuestService
+
+UPSTREAM_CHUNKS = 200
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disconnect_watch_polls_at_most_once_per_interval():
+    clock = FakeClock()
+    calls = []
+
+    async def is_disconnected():
+        calls.append(clock.now)
+        return clock.now >= 1.0
+
+    watch = DisconnectWatch(is_disconnected, interval_ms=250, clock=clock)
+
+    async def scenario():
+        results = []
+        for now in (0.0, 0.1, 0.3, 0.5, 1.0, 1.1):
+            clock.now = now
+            results.append(await watch.gone())
+        return results
+
+    assert asyncio.run(scenario()) == [False, False, False, False, True, True]
+    assert calls == [0.0, 0.3, 1.0]
+
+
+def test_disconnect_watch_without_a_request_never_fires():
+    assert asyncio.run(DisconnectWatch(None).gone()) is False
+
+
+def test_savings_are_estimated_from_completed_answers():
+    stats = CancellationStats()
+    stats.answer_chars, stats.chars_per_second = 1800.0, 90.0
+
+    saved = stats.record_cancelled(900)
+    assert saved["tokens"] == 500  # 900 chars left at 1.8 chars/token
+    assert saved["seconds"] == pytest.approx(10.0)
+
+    # A cancelled stream longer than the average saves nothing
+    assert stats.record_cancelled(5000)["tokens"] == 0
+
+    stats.record_completed(2800, 10.0)
+    assert stats.answer_chars == pytest.approx(1900.0)
+    assert stats.chars_per_second == pytest.approx(109.0)
+
+    body = render_prometheus(stats.snapshot())
+    assert "legal_chat_streams_cancelled_total 2" in body
+    assert 'legal_chat_cancelled_tokens_total{kind="saved_estimate"} 500' in body
+    assert "legal_chat_cancelled_seconds_saved_total 10.000" in body
+
+
+# ===== UPSTREAM CLOSE =====
+
+def _stub_app(state: dict) -> FastAPI:
+    """OpenAI-compatible stub that streams slowly and records when its client leaves"""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions():
+        async def events():
+            try:
+                for i in range(UPSTREAM_CHUNKS):
+                    chunk = {
+                        "id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                        "choices": [{"index": 0, "delta": {"content": f"t{i} "}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    state["sent"] = i + 1
+                    await asyncio.sleep(0.01)
+                yield "data: [DONE]\n\n"
+            finally:
+                state["finished_at"] = time.monotonic()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def stub():
+    state = {"sent": 0, "finished_at": None}
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(_stub_app(state), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    state["url"] = f"http://127.0.0.1:{port}/v1"
+    yield state
+    server.should_exit = True
+
+
+def test_closing_the_stream_closes_the_upstream_response(stub):
+    gateway = LLMGateway(AsyncOpenAI(api_key="sk-stub", base_url=stub["url"], max_retries=0))
+    router = ProviderRouter([LLMProvider(
+        name="stub", gateway=gateway, chat_model="stub-model", classification_model="stub-model"
+    )])
+
+    async def scenario():
+        stream = router.stream_chat([{"role": "user", "content": "سؤال"}])
+        received = [await stream.__anext__() for _ in range(3)]
+        closed_at = time.monotonic()
+        await stream.aclose()
+        for _ in range(100):
+            if stub["finished_at"]:
+                break
+            await asyncio.sleep(0.01)
+        return received, closed_at
+
+    received, closed_at = asyncio.run(scenario())
+    assert received == ["t0 ", "t1 ", "t2 "]
+    # The provider saw the disconnect right away instead of streaming to the end
+    assert stub["finished_at"] is not None and stub["finished_at"] - closed_at < 1.0
+    assert stub["sent"] < UPSTREAM_CHUNKS
+    # The concurrency slot was released and the stream accounted for
+    assert gateway.get_metrics()["stub-model"]["stream_p50_ms"] is not None
+
+
+# ===== STREAMING ENDPOINT =====
+
+class FakeEngine:
+    """Streams numbered tokens until closed; `emitted` counts what it produced"""
+
+    def __init__(self, tokens: int = 100, delay: float = 0.02):
+        self.tokens = tokens
+        self.delay = delay
+        self.emitted = 0
+        self.closed = False
+
+    async def ask_question_with_context_streaming(self, query, context, summary=None, on_event=None):
+        try:
+            for i in range(self.tokens):
+                await asyncio.sleep(self.delay)
+                self.emitted += 1
+                yield f"كلمة{i} "
+        finally:
+            self.closed = True
+
+
+def _stream(engine, monkeypatch, is_disconnected=None):
+    monkeypatch.setattr(chat, "get_rag_engine", lambda: engine)
+    session_id = f"guest_{uuid.uuid4()}"
+    return session_id, chat._generate_streaming_response(
+        None, None, session_id, None, "ما هي شروط العقد؟", "guest", is_disconnected=is_disconnected
+    )
+
+
+def _frames(raw):
+    return [json.loads(frame[len("data: "):]) for frame in raw if frame.strip() != "data: [DONE]"]
+
+
+def test_disconnect_stops_generation_and_keeps_the_partial_answer(monkeypatch):
+    engine = FakeEngine()
+
+    async def is_disconnected():
+        return engine.emitted >= 5
+
+    session_id, response = _stream(engine, monkeypatch, is_disconnected)
+    cancelled_before = chat.cancellation_stats.snapshot()["cancelled"]
+
+    async def scenario():
+        return [frame async for frame in response]
+
+    frames = _frames(asyncio.run(scenario()))
+
+    assert engine.closed and engine.emitted < engine.tokens
+    assert all(frame["type"] != "complete" for frame in frames)
+    answer = GuestService.get_guest_session(session_id)["conversation_history"][-1]
+    assert answer["role"] == "assistant" and answer["is_truncated"] is True
+    assert answer["content"].startswith("كلمة0 كلمة1")
+    assert chat.cancellation_stats.snapshot()["cancelled"] == cancelled_before + 1
+
+
+def test_closed_response_stops_generation_and_keeps_the_partial_answer(monkeypatch):
+    engine = FakeEngine()
+    session_id, response = _stream(engine, monkeypatch)
+
+    async def scenario():
+        received = []
+        async for frame in response:
+            received.append(frame)
+            if frame.startswith('data: {"type": "chunk"') and len(received) >= 3:
+                break
+        # Starlette closing the body iterator after the client left
+        await response.aclose()
+        await asyncio.sleep(0.05)
+        return received
+
+    asyncio.run(scenario())
+
+    assert engine.closed and engine.emitted < engine.tokens
+    answer = GuestService.get_guest_session(session_id)["conversation_history"][-1]
+    assert answer["role"] == "assistant" and answer["is_truncated"] is True
+
+
+def test_connected_client_gets_the_whole_answer(monkeypatch):
+    engine = FakeEngine(tokens=10, delay=0.001)
+
+    async def is_disconnected():
+        return False
+
+    session_id, response = _stream(engine, monkeypatch, is_disconnected)
+
+    async def scenario():
+        return [frame async for frame in response]
+
+    frames = _frames(asyncio.run(scenario()))
+
+    assert frames[-1]["type"] == "complete"
+    assert frames[-1]["ai_message"]["is_truncated"] is False
+    assert "".join(f["content"] for f in frames if f["type"] == "chunk") == "".join(f"كلمة{i} " for i in range(10))
+    answer = GuestService.get_guest_session(session_id)["conversation_history"][-1]
+    assert "is_truncated" not in answer
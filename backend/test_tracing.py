@@ -0,0 +1,89 @@
+"""
+Stage tracing / latency histogram tests
+Run: python -m pytest test_tracing.py -q
+"""
+
+import asyncio
+
+import rag_engine
+from app.core.tracing import MetricsRegistry, current_trace, emit, metrics, observe, span, start_trace
+
+
+def test_spans_follow_asyncio_tasks_into_the_request_trace():
+    async def child():
+        async with span("embedding", model="ada"):
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        trace = start_trace("chat.message")
+        with span("retrieval") as retrieval:
+            await asyncio.gather(asyncio.create_task(child()), asyncio.create_task(child()))
+            retrieval.set(chunks=3)
+        return trace.to_dict()
+
+    result = asyncio.run(scenario())
+    stages = [s["stage"] for s in result["spans"]]
+    assert stages.count("embedding") == 2 and "retrieval" in stages
+    retrieval = next(s for s in result["spans"] if s["stage"] == "retrieval")
+    # asyncio.sleep can wake a hair early (loop clock resolution) - leave slack below 10ms
+    assert retrieval["duration_ms"] >= 9 and retrieval["attributes"] == {"chunks": 3}
+
+
+def test_no_trace_outside_a_request_still_feeds_histograms():
+    registry_count = metrics.summary().get("unit_test_stage", {}).get("count", 0)
+    assert current_trace() is None
+    with span("unit_test_stage"):
+        pass
+    assert metrics.summary()["unit_test_stage"]["count"] == registry_count + 1
+
+
+def test_quantiles_and_prometheus_exposition():
+    registry = MetricsRegistry()
+    for ms in range(1, 101):
+        registry.observe("classification", ms / 1000)
+
+    summary = registry.summary()["classification"]
+    assert (summary["count"], summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (100, 51.0, 96.0, 100.0)
+
+    text = registry.render_prometheus()
+    assert "# TYPE legal_chat_stage_duration_seconds histogram" in text
+    assert 'legal_chat_stage_duration_seconds_bucket{stage="classification",le="0.05"} 50' in text
+    assert 'legal_chat_stage_duration_seconds_bucket{stage="classification",le="+Inf"} 100' in text
+    assert 'legal_chat_stage_latency_seconds{stage="classification",quantile="0.99"} 0.100000' in text
+
+
+def test_emit_writes_one_metric_family():
+    body = emit("legal_chat_things_total", "counter", "Things, by kind", [
+        ({}, 3),
+        ({"kind": 'a "quoted"\\name'}, "1.500"),
+    ])
+    assert body == (
+        "# HELP legal_chat_things_total Things, by kind\n"
+        "# TYPE legal_chat_things_total counter\n"
+        "legal_chat_things_total 3\n"
+        'legal_chat_things_total{kind="a \\"quoted\\"\\\\name"} 1.500\n'
+    )
+
+
+def test_engine_stages_appear_in_trace(monkeypatch):
+    engine = rag_engine.IntelligentLegalRAG()
+
+    async def classify_intent(query, history=None):
+        await asyncio.sleep(0.005)
+        return {"category": "GENERAL_QUESTION"}
+
+    async def generate(query, history, summary, category, documents=None, deadline=None, pinned_documents=None):
+        observe("llm_first_token", 0.2)
+        yield "جواب"
+
+    monkeypatch.setattr(engine.classifier, "classify_intent", classify_intent)
+    monkeypatch.setattr(engine, "_generate_answer", generate)
+
+    async def scenario():
+        trace = start_trace("chat.message")
+        _ = [c async for c in engine.ask_question_with_context_streaming("سؤال عن العقد", [])]
+        return [s["stage"] for s in trace.to_dict()["spans"]]
+
+    stages = asyncio.run(scenario())
+    assert stages.index("article_lookup") < stages.index("classification")
+    assert "llm_first_token" in stages
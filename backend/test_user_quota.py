@@ -0,0 +1,98 @@
+"""
+Signed-in user quota tests (single-statement claim / reset / refund on the users row)
+Run: python -m pytest test_user_quota.py -q
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every table on Base
+from app.database import Base
+from app.models.user import User
+from app.services.cooldown_service import CooldownService
+
+LIMIT = CooldownService.SIGNED_IN_QUESTION_LIMIT
+
+
+@pytest.fixture
+def make_session(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'quota.db'}", connect_args={"check_same_thread": False, "timeout": 10}
+    )
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def _user(db, tier="free") -> User:
+    user = User(email=f"{tier}@example.com", hashed_password="x", subscription_tier=tier)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_claims_until_limit_then_cooldown(make_session):
+    db = make_session()
+    user = _user(db)
+    decisions = [CooldownService.claim_question(db, user) for _ in range(LIMIT + 1)]
+
+    assert all(d.allowed for d in decisions[:LIMIT]) and not decisions[-1].allowed
+    assert decisions[LIMIT - 1].reset_at is not None and decisions[-1].reset_at == decisions[LIMIT - 1].reset_at
+    db.refresh(user)
+    assert user.questions_used_current_cycle == LIMIT and user.questions_used_this_month == LIMIT
+    assert not CooldownService.can_ask_question(db, user)[0]
+
+
+def test_lapsed_cooldown_resets_in_the_same_statement(make_session):
+    db = make_session()
+    user = _user(db)
+    user.questions_used_current_cycle = LIMIT
+    user.cycle_reset_time = datetime.utcnow() - timedelta(minutes=1)
+    db.commit()
+
+    decision = CooldownService.claim_question(db, user)
+    assert decision.allowed and decision.used == 1 and decision.reset_at is None
+    db.refresh(user)
+    assert user.cycle_reset_time is None and user.questions_used_this_month == 1
+
+
+def test_refund_lifts_the_cooldown_and_uncounts_the_question(make_session):
+    db = make_session()
+    user = _user(db)
+    for _ in range(LIMIT):
+        CooldownService.claim_question(db, user)
+
+    refunded = CooldownService.refund_question(db, user)
+    assert refunded.allowed and refunded.used == LIMIT - 1 and refunded.reset_at is None
+    db.refresh(user)
+    assert user.questions_used_this_month == LIMIT - 1
+    assert CooldownService.claim_question(db, user).allowed
+
+
+def test_unlimited_tier_is_counted_but_never_limited(make_session):
+    db = make_session()
+    user = _user(db, tier="admin")
+    assert all(CooldownService.claim_question(db, user).allowed for _ in range(LIMIT + 5))
+    db.refresh(user)
+    assert user.questions_used_current_cycle == LIMIT + 5 and user.cycle_reset_time is None
+
+
+def test_concurrent_claims_never_overgrant(make_session):
+    db = make_session()
+    user_id = _user(db).id
+
+    def claim(_):
+        session = make_session()
+        try:
+            return CooldownService.claim_question(session, session.get(User, user_id)).allowed
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        granted = sum(pool.map(claim, range(LIMIT + 10)))
+
+    assert granted == LIMIT
+    assert db.get(User, user_id).questions_used_current_cycle == LIMIT
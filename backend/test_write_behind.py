@@ -0,0 +1,131 @@
+"""
+Write-behind queue tests (batching, settle, retry, dead letters, drain on close)
+Run: python -m pytest test_write_behind.py -q
+"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401 - registers every table on Base
+from app.core.write_behind import WriteBehindQueue, render_prometheus
+from app.database import Base
+from app.models.conversation import Conversation, Message
+from app.models.user import User
+from app.services import chat_service
+from app.services.chat_service import ChatService
+
+
+class RecordingWriter:
+    def __init__(self, failures: int = 0):
+        self.batches = []
+        self.failures = failures
+
+    def __call__(self, items):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append(list(items))
+
+
+def test_items_enqueued_together_are_written_in_one_batch():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, "t", max_delay=0.01)
+
+    async def scenario():
+        futures = [queue.enqueue(i, key="c1") for i in range(5)]
+        return await asyncio.gather(*futures)
+
+    assert asyncio.run(scenario()) == [True] * 5
+    assert writer.batches == [[0, 1, 2, 3, 4]]
+
+
+def test_batches_are_capped_and_settle_waits_for_the_key():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, "t", batch_size=2, max_delay=0.01)
+
+    async def scenario():
+        for i in range(5):
+            queue.enqueue(i, key="c1" if i < 4 else "c2")
+        await queue.settle("c1")
+        settled = [item for batch in writer.batches for item in batch]
+        await queue.close()
+        return settled
+
+    assert asyncio.run(scenario())[:4] == [0, 1, 2, 3]
+    assert [len(batch) for batch in writer.batches] == [2, 2, 1]
+
+
+def test_failed_batch_is_retried():
+    writer = RecordingWriter(failures=2)
+    queue = WriteBehindQueue(writer, "t", max_delay=0, retry_delay=0.001)
+
+    async def scenario():
+        return await queue.enqueue("answer", key="c1")
+
+    assert asyncio.run(scenario()) is True
+    assert writer.batches == [["answer"]] and queue.counters["retries"] == 2
+
+
+def test_batch_that_keeps_failing_goes_to_the_dead_letter_file(tmp_path):
+    path = tmp_path / "failed.jsonl"
+    queue = WriteBehindQueue(
+        RecordingWriter(failures=10), "t", max_delay=0, max_attempts=3, retry_delay=0.001, dead_letter_path=str(path)
+    )
+
+    async def scenario():
+        return await queue.enqueue({"content": "جواب"}, key="c1")
+
+    assert asyncio.run(scenario()) is False
+    record = json.loads(path.read_text(encoding="utf-8"))
+    assert record["item"] == {"content": "جواب"} and "locked" in record["error"]
+    assert 'outcome="dead_lettered"} 1' in render_prometheus([queue])
+
+
+def test_close_drains_everything_still_queued():
+    writer = RecordingWriter()
+    queue = WriteBehindQueue(writer, "t", max_delay=10)
+
+    async def scenario():
+        for i in range(3):
+            queue.enqueue(i)
+        await queue.close()
+
+    asyncio.run(scenario())
+    assert writer.batches == [[0, 1, 2]] and queue.depth == 0
+
+
+@pytest.fixture
+def db_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wb.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(chat_service, "SessionLocal", factory)
+    monkeypatch.setattr(ChatService, "schedule_summary_refresh", staticmethod(lambda **kwargs: None))
+    return factory
+
+
+def test_queued_answers_persist_with_listing_data(db_factory, monkeypatch):
+    monkeypatch.setattr(chat_service, "message_queue", WriteBehindQueue(chat_service._persist_messages, "messages"))
+    db = db_factory()
+    user = User(email="wb@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    conversation = ChatService.create_conversation(db, user.id, "t")
+    ChatService.add_message(db, conversation.id, "user", "سؤال")
+
+    async def scenario():
+        first = ChatService.queue_assistant_message(conversation.id, "جواب أول", 120)
+        second = ChatService.queue_assistant_message(conversation.id, "جواب ثان", 80)
+        await chat_service.message_queue.settle(conversation.id)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    db.expire_all()
+    stored = db.query(Message).filter(Message.conversation_id == conversation.id, Message.role == "assistant").all()
+    assert {message.id for message in stored} == {first["id"], second["id"]}
+    refreshed = db.get(Conversation, conversation.id)
+    assert refreshed.message_count == 3 and refreshed.last_message_preview == "جواب ثان"